@@ -1,6 +1,37 @@
+import logging
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+logger = logging.getLogger(__name__)
+
+
+def create_postgres_search_indexes(sender, using='default', **kwargs):
+    """
+    Cria o índice trigram da busca da memória de produtos (apenas PostgreSQL).
+
+    Fica fora das migrations porque depende da extensão pg_trgm, que não
+    existe no SQLite usado em desenvolvimento.
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS memoria_busca_trgm_idx "
+                "ON api_rememberedproduct USING gin (search_text gin_trgm_ops)"
+            )
+    except Exception as e:
+        logger.warning(f"Não foi possível criar o índice trigram da memória de produtos: {e}")
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        post_migrate.connect(create_postgres_search_indexes, sender=self)
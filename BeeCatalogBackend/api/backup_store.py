@@ -0,0 +1,289 @@
+# api/backup_store.py
+
+import os
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('records', 'blobs')
+
+
+class BackupStore:
+    """
+    Backup local da memória de produtos em um arquivo SQLite (modo WAL).
+
+    Substitui o antigo arquivo JSON por produto: as gravações entram em uma
+    fila e uma thread em segundo plano as aplica em lotes, em uma única
+    transação por lote, então as tasks não esperam pelo disco. Leituras
+    consultam primeiro as gravações ainda na fila e depois o índice da
+    chave primária do SQLite (mantido em memória pelo cache de páginas e
+    pelo mmap). Periodicamente a thread faz checkpoint do WAL e devolve ao
+    sistema as páginas livres (compactação).
+
+    O WAL permite que processos web e workers Celery leiam e gravem o mesmo
+    arquivo ao mesmo tempo; as chaves são as da memória (hash md5), sem
+    colisões por truncamento de nome de arquivo.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 0.5,
+                 compaction_interval: int = 3600):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compaction_interval = compaction_interval
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._local = threading.local()
+        self._pending: Dict[Tuple[str, str], Tuple[int, Optional[str]]] = {}
+        self._pending_lock = threading.Lock()
+        self._sequence = 0
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._last_compaction = time.monotonic()
+
+        self._create_schema()
+        atexit.register(self.flush)
+
+    # Conexões
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA mmap_size=268435456")  # 256MB
+        connection.execute("PRAGMA cache_size=-65536")  # 64MB
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        self._check_fork()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self):
+        connection = self._connect()
+        try:
+            # auto_vacuum só tem efeito antes da criação das tabelas
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            for table in TABLES:
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL"
+                    ") WITHOUT ROWID"
+                )
+        finally:
+            connection.close()
+
+    def _check_fork(self):
+        # Após um fork (workers Celery) conexões e thread do processo pai não valem mais
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._writer = None
+            self._queue = queue.Queue()
+            with self._pending_lock:
+                self._pending.clear()
+
+    # Gravação em segundo plano
+
+    def _enqueue(self, operation: Tuple):
+        self._check_fork()
+        self._ensure_writer()
+        self._queue.put(operation)
+
+    def _ensure_writer(self):
+        if self._writer and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._write_loop, name='memory-backup-writer', daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        # A fila é a do processo que criou a thread (_check_fork troca self._queue)
+        work_queue = self._queue
+        connection = self._connect()
+        while True:
+            try:
+                operation = work_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_compact(connection)
+                continue
+
+            # Agrupar o que chegar até o tamanho do lote (uma transação por lote)
+            batch = [operation]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(work_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._apply(connection, batch)
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote no backup local da memória: {e}")
+            finally:
+                self._release_pending(batch)
+                for _ in batch:
+                    work_queue.task_done()
+
+    def _apply(self, connection: sqlite3.Connection, batch: List[Tuple]):
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for action, table, key, _, data in batch:
+                if action == 'put':
+                    connection.execute(
+                        f"INSERT INTO {table} (key, data, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        (key, data, now)
+                    )
+                elif action == 'delete':
+                    connection.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+                elif action == 'clear':
+                    connection.execute(f"DELETE FROM {table}")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _release_pending(self, batch: List[Tuple]):
+        # Só remove a sobreposição se nenhuma gravação mais nova da chave entrou na fila
+        with self._pending_lock:
+            for _, table, key, sequence, _ in batch:
+                if key is None:
+                    continue
+                entry = self._pending.get((table, key))
+                if entry and entry[0] == sequence:
+                    del self._pending[(table, key)]
+
+    def _track(self, table: str, key: Optional[str], data: Optional[str]) -> int:
+        with self._pending_lock:
+            self._sequence += 1
+            if key is not None:
+                self._pending[(table, key)] = (self._sequence, data)
+            return self._sequence
+
+    def _maybe_compact(self, connection: sqlite3.Connection):
+        if time.monotonic() - self._last_compaction < self.compaction_interval:
+            return
+        self._last_compaction = time.monotonic()
+        try:
+            self._compact(connection)
+        except Exception as e:
+            logger.warning(f"Erro ao compactar backup local da memória: {e}")
+
+    def _compact(self, connection: sqlite3.Connection):
+        connection.execute("PRAGMA incremental_vacuum")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.debug("Backup local da memória compactado")
+
+    # API pública
+
+    def put_many(self, table: str, items: Dict[str, Any]):
+        """
+        Agenda a gravação dos itens (chave -> valor serializável em JSON).
+        """
+        for key, value in items.items():
+            data = json.dumps(value, ensure_ascii=False)
+            sequence = self._track(table, key, data)
+            self._enqueue(('put', table, key, sequence, data))
+
+    def delete(self, table: str, *keys: str):
+        for key in keys:
+            sequence = self._track(table, key, None)
+            self._enqueue(('delete', table, key, sequence, None))
+
+    def clear(self, table: str):
+        with self._pending_lock:
+            for pending_key in [pending_key for pending_key in self._pending if pending_key[0] == table]:
+                del self._pending[pending_key]
+        self._enqueue(('clear', table, None, 0, None))
+        self.flush()
+
+    def get(self, table: str, key: str) -> Optional[Any]:
+        return self.get_many(table, [key]).get(key)
+
+    def get_many(self, table: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Lê vários itens: gravações ainda na fila primeiro, depois o SQLite.
+        """
+        self._check_fork()
+        found: Dict[str, Any] = {}
+        missing = []
+        with self._pending_lock:
+            for key in keys:
+                entry = self._pending.get((table, key))
+                if entry is None:
+                    missing.append(key)
+                elif entry[1] is not None:
+                    found[key] = json.loads(entry[1])
+
+        connection = self._connection()
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for key, data in connection.execute(
+                f"SELECT key, data FROM {table} WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = json.loads(data)
+        return found
+
+    def iter_batches(self, table: str, batch_size: int = 500,
+                     after_key: Optional[str] = None) -> Iterator[List[Tuple[str, Any]]]:
+        """
+        Percorre a tabela em ordem de chave, em lotes (paginação keyset).
+        """
+        self.flush()
+        connection = self._connection()
+        while True:
+            rows = connection.execute(
+                f"SELECT key, data FROM {table} WHERE key > ? ORDER BY key LIMIT ?",
+                (after_key or '', batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            after_key = rows[-1][0]
+            yield [(key, json.loads(data)) for key, data in rows]
+
+    def keys(self, table: str) -> Iterator[str]:
+        self.flush()
+        for (key,) in self._connection().execute(f"SELECT key FROM {table}"):
+            yield key
+
+    def count(self, table: str) -> int:
+        self.flush()
+        return self._connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def flush(self, timeout: Optional[float] = None):
+        """
+        Aguarda a gravação de tudo o que já está na fila.
+        """
+        if self._pid != os.getpid() or not self._writer or not self._writer.is_alive():
+            return
+        if timeout is None:
+            self._queue.join()
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def compact(self):
+        """
+        Compacta o arquivo imediatamente (checkpoint do WAL e páginas livres).
+        """
+        self.flush()
+        self._compact(self._connection())
@@ -0,0 +1,45 @@
+# api/bloom_filter.py
+
+import math
+import hashlib
+from typing import Iterable, Iterator
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom para testes de pertinência sem I/O.
+
+    Responde "definitivamente ausente" ou "talvez presente": falsos positivos
+    são possíveis (na taxa configurada), falsos negativos não.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing (Kirsch-Mitzenmacher) a partir de um único digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def is_saturated(self) -> bool:
+        return self.count > self.capacity
@@ -3,10 +3,13 @@
 import json
 import hashlib
 import logging
-from typing import Any, Dict, Optional, Union
+from typing import Any, Callable, Dict, Optional, Union
 from django.core.cache import cache
 from django.conf import settings
-import redis
+from .local_cache import LocalCache
+from .redis_utils import unlink_by_pattern
+from .redis_shards import get_redis_client
+from .semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +23,21 @@ class AICache:
         self.cache_prefix = 'ai_response'
         self.default_timeout = 2592000  # 30 dias
         
+        # Cache L1 em memória do processo, na frente do cache Django/Redis
+        self.local_cache = LocalCache(self.cache_prefix)
+        
         # Conectar diretamente ao Redis para operações avançadas apenas em produção
         self.redis_client = None
         if not settings.DEBUG:
             try:
-                redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
-                self.redis_client = redis.from_url(redis_url)
+                # Particionado entre AI_CACHE_REDIS_URLS quando configurado
+                self.redis_client = get_redis_client('AI_CACHE_REDIS_URLS', 'AI_CACHE_REDIS_PREVIOUS_URLS')
             except Exception as e:
                 logger.warning(f"Não foi possível conectar ao Redis: {e}")
                 self.redis_client = None
+        
+        # Camada opcional de similaridade para anúncios gerados (AI_SEMANTIC_CACHE_ENABLED)
+        self.semantic = SemanticCache(self)
     
     def _generate_cache_key(self, prompt: str, context: Union[str, Dict, list]) -> str:
         """
@@ -53,10 +62,17 @@ class AICache:
         try:
             cache_key = self._generate_cache_key(prompt, context)
             
-            # Tentar primeiro o cache Django
+            # Tentar primeiro o cache L1 do processo
+            local_data = self.local_cache.get(cache_key)
+            if local_data is not None:
+                logger.debug(f"Cache hit (L1): {cache_key[:16]}...")
+                return local_data
+            
+            # Tentar o cache Django
             cached_data = cache.get(cache_key)
             if cached_data:
                 logger.info(f"Cache hit (Django): {cache_key[:16]}...")
+                self.local_cache.set(cache_key, cached_data)
                 return cached_data
             
             # Se não encontrar, tentar Redis diretamente
@@ -66,8 +82,9 @@ class AICache:
                     try:
                         result = json.loads(cached_data.decode('utf-8'))
                         logger.info(f"Cache hit (Redis): {cache_key[:16]}...")
-                        # Replicar no cache Django para próximas consultas
+                        # Replicar no cache Django e no L1 para próximas consultas
                         cache.set(cache_key, result, timeout=300)  # 5 min no Django cache
+                        self.local_cache.set(cache_key, result)
                         return result
                     except json.JSONDecodeError:
                         logger.warning(f"Erro ao decodificar cache Redis: {cache_key[:16]}...")
@@ -90,6 +107,10 @@ class AICache:
             # Armazenar no cache Django (mais rápido para consultas frequentes)
             cache.set(cache_key, response, timeout=min(timeout, 3600))  # Max 1h no Django
             
+            # Atualizar o cache L1 (invalidando a cópia dos outros processos)
+            self.local_cache.invalidate(cache_key)
+            self.local_cache.set(cache_key, response, timeout=min(timeout, self.local_cache.default_timeout))
+            
             # Armazenar no Redis (persistência longa)
             if self.redis_client:
                 try:
@@ -113,6 +134,9 @@ class AICache:
         try:
             cache_key = self._generate_cache_key(prompt, context)
             
+            # Remover do cache L1
+            self.local_cache.invalidate(cache_key)
+            
             # Remover do cache Django
             cache.delete(cache_key)
             
@@ -127,22 +151,31 @@ class AICache:
             logger.error(f"Erro ao deletar do cache: {e}")
             return False
     
-    def clear_all(self) -> bool:
+    def clear_all(self, progress_callback: Optional[Callable[[int], None]] = None) -> bool:
         """
         Limpa todo o cache de IA.
+        
+        As chaves do Redis são removidas com SCAN + UNLINK em lotes, sem
+        bloquear o servidor; use clear_ai_cache_task para rodar em segundo plano.
+        
+        Args:
+            progress_callback: Chamada com o total de chaves removidas após cada lote
         """
         try:
+            # Limpar cache L1 de todos os processos
+            self.local_cache.invalidate_all()
+            self.semantic.reset()
+            
             # Limpar cache Django com padrão
             if hasattr(cache, 'delete_pattern'):
                 cache.delete_pattern(f"{self.cache_prefix}:*")
             
             # Limpar Redis com padrão
             if self.redis_client:
-                pattern = f"{self.cache_prefix}:*"
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
-                    logger.info(f"Cleared {len(keys)} AI cache entries from Redis")
+                removed = unlink_by_pattern(
+                    self.redis_client, f"{self.cache_prefix}:*", progress_callback=progress_callback
+                )
+                logger.info(f"Cleared {removed} AI cache entries from Redis")
             
             logger.info("AI cache cleared successfully")
             return True
@@ -159,6 +192,8 @@ class AICache:
             'redis_connected': self.redis_client is not None,
             'cache_prefix': self.cache_prefix,
             'default_timeout': self.default_timeout,
+            'local_cache': self.local_cache.get_stats(),
+            'semantic_cache': self.semantic.get_stats(),
         }
         
         if self.redis_client:
@@ -0,0 +1,391 @@
+# api/content_blobs.py
+
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from redis.exceptions import WatchError
+from .models import GeneratedContentBlob, RememberedProduct
+from .redis_shards import ShardedRedis
+from .redis_utils import unlink_by_pattern
+
+if TYPE_CHECKING:
+    from .product_memory import ProductMemory
+
+logger = logging.getLogger(__name__)
+
+
+class ContentBlobStore:
+    """
+    Armazena o conteúdo gerado pela IA uma única vez, endereçado pelo hash.
+
+    Os registros da memória guardam apenas `generated_content_ref` (o hash)
+    no Redis, no banco e no backup local; o blob fica no banco
+    (GeneratedContentBlob), no Redis e na tabela de blobs do backup local. As referências
+    são contadas a cada gravação/remoção (no banco, ou em um hash do Redis
+    no modo legado, junto com o horário da última alteração de cada hash) e
+    collect_garbage() remove os blobs sem referências.
+    """
+
+    ref_field = 'generated_content_ref'
+    # Campo do hash de referências (modo legado) com o horário da última alteração do blob
+    touched_suffix = ':touched'
+    gc_watch_retries = 5
+
+    def __init__(self, memory: 'ProductMemory'):
+        self.memory = memory
+        self.key_prefix = f"{memory.memory_prefix}_blob"
+        self.refs_key = f"{memory.memory_prefix}_blob_refs"
+        # Arquivos do formato antigo, migrados por ProductMemory.migrate_legacy_backups
+        self.legacy_blob_dir = os.path.join(settings.BASE_DIR, "memory", "conteudos")
+
+    def _blob_key(self, content_hash: str) -> str:
+        return f"{self.key_prefix}:{content_hash}"
+
+    def _touched_field(self, content_hash: str) -> str:
+        return f"{content_hash}{self.touched_suffix}"
+
+    def content_hash(self, content: Dict[str, Any]) -> str:
+        canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def split(self, record: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Separa o conteúdo gerado do registro.
+
+        Returns:
+            Tupla (registro com a referência, hash do conteúdo, conteúdo);
+            registros sem conteúdo gerado são devolvidos sem alteração
+        """
+        content = record.get('generated_content')
+        if not content:
+            return record, None, None
+        content_hash = self.content_hash(content)
+        stored = {field: value for field, value in record.items() if field != 'generated_content'}
+        stored[self.ref_field] = content_hash
+        return stored, content_hash, content
+
+    def reference_of(self, record: Optional[Dict[str, Any]]) -> Optional[str]:
+        return record.get(self.ref_field) if record else None
+
+    def reference_deltas(self, previous: Dict[str, Dict[str, Any]],
+                         current: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Variação da contagem de referências entre as versões gravadas.
+
+        Args:
+            previous: Registros gravados antes da operação (chave -> registro com referência)
+            current: Registros gravados depois (None para removidos)
+        """
+        deltas: Dict[str, int] = {}
+        for memory_key in set(previous) | set(current):
+            old_hash = self.reference_of(previous.get(memory_key))
+            new_hash = self.reference_of(current.get(memory_key))
+            if old_hash == new_hash:
+                continue
+            if new_hash:
+                deltas[new_hash] = deltas.get(new_hash, 0) + 1
+            if old_hash:
+                deltas[old_hash] = deltas.get(old_hash, 0) - 1
+        return {content_hash: delta for content_hash, delta in deltas.items() if delta}
+
+    def store(self, blobs: Dict[str, Dict[str, Any]]):
+        """
+        Grava os blobs que ainda não existem em cada camada.
+
+        No banco, um blob existente só tem updated_at renovado: isso o protege
+        da coleta de lixo enquanto a referência nova é contada.
+        """
+        if not blobs:
+            return
+
+        if self.memory.db_enabled:
+            try:
+                now = timezone.now()
+                GeneratedContentBlob.objects.bulk_create(
+                    [
+                        GeneratedContentBlob(content_hash=content_hash, content=content, updated_at=now)
+                        for content_hash, content in blobs.items()
+                    ],
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['content_hash'],
+                    update_fields=['updated_at']
+                )
+            except Exception as e:
+                logger.error(f"Erro ao salvar conteúdo gerado no banco de dados: {e}")
+
+        self._cache_in_redis(blobs, refresh=True)
+
+        try:
+            backup_store = self.memory.backup_store
+            existing = backup_store.get_many('blobs', list(blobs))
+            backup_store.put_many('blobs', {
+                content_hash: content for content_hash, content in blobs.items() if content_hash not in existing
+            })
+        except Exception as e:
+            logger.warning(f"Erro ao salvar backup do conteúdo gerado: {e}")
+
+    def _cache_in_redis(self, blobs: Dict[str, Dict[str, Any]], refresh: bool = False):
+        redis_client = self.memory.redis_client
+        if not redis_client or not blobs:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for content_hash, content in blobs.items():
+                blob_key = self._blob_key(content_hash)
+                pipeline.set(blob_key, json.dumps(content, ensure_ascii=False),
+                             ex=self.memory.default_timeout, nx=True)
+                if refresh:
+                    # Blob compartilhado vive enquanto algum produto continuar sendo gravado
+                    pipeline.expire(blob_key, self.memory.default_timeout)
+            if refresh and not self.memory.db_enabled:
+                # Protege o blob da coleta de lixo até a nova referência ser contada
+                now = time.time()
+                pipeline.hset(self.refs_key, mapping={self._touched_field(content_hash): now for content_hash in blobs})
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Erro ao salvar conteúdo gerado no Redis: {e}")
+
+    def adjust_references(self, deltas: Dict[str, int]):
+        """
+        Aplica a variação das contagens de referências.
+        """
+        if not deltas:
+            return
+
+        if self.memory.db_enabled:
+            hashes_by_delta: Dict[int, List[str]] = {}
+            for content_hash, delta in deltas.items():
+                hashes_by_delta.setdefault(delta, []).append(content_hash)
+            try:
+                now = timezone.now()
+                for delta, hashes in hashes_by_delta.items():
+                    GeneratedContentBlob.objects.filter(content_hash__in=hashes).update(
+                        ref_count=F('ref_count') + delta, updated_at=now
+                    )
+            except Exception as e:
+                logger.error(f"Erro ao atualizar referências do conteúdo gerado: {e}")
+            return
+
+        redis_client = self.memory.redis_client
+        if redis_client:
+            try:
+                now = time.time()
+                pipeline = redis_client.pipeline(transaction=True)
+                for content_hash, delta in deltas.items():
+                    pipeline.hincrby(self.refs_key, content_hash, delta)
+                pipeline.hset(self.refs_key, mapping={self._touched_field(content_hash): now for content_hash in deltas})
+                pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Erro ao atualizar referências do conteúdo gerado no Redis: {e}")
+
+    def fetch(self, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Lê os blobs pelo hash: Redis em um MGET, depois banco e arquivos para
+        os que faltarem (replicados de volta no Redis).
+        """
+        missing = list(set(hashes))
+        found: Dict[str, Dict[str, Any]] = {}
+        if not missing:
+            return found
+
+        redis_client = self.memory.redis_client
+        if redis_client:
+            try:
+                values = redis_client.mget([self._blob_key(content_hash) for content_hash in missing])
+                for content_hash, value in zip(missing, values):
+                    if value:
+                        found[content_hash] = json.loads(value.decode('utf-8'))
+            except Exception as e:
+                logger.warning(f"Erro ao ler conteúdo gerado do Redis: {e}")
+            missing = [content_hash for content_hash in missing if content_hash not in found]
+
+        recovered: Dict[str, Dict[str, Any]] = {}
+        if missing and self.memory.db_enabled:
+            try:
+                rows = GeneratedContentBlob.objects.filter(content_hash__in=missing).values_list('content_hash', 'content')
+                recovered.update(rows)
+            except Exception as e:
+                logger.warning(f"Erro ao ler conteúdo gerado do banco de dados: {e}")
+            missing = [content_hash for content_hash in missing if content_hash not in recovered]
+
+        if missing:
+            try:
+                recovered.update(self.memory.backup_store.get_many('blobs', missing))
+            except Exception as e:
+                logger.warning(f"Erro ao ler backup do conteúdo gerado: {e}")
+            for content_hash in missing:
+                if content_hash not in recovered:
+                    logger.warning(f"Conteúdo gerado {content_hash[:12]}... não encontrado")
+
+        self._cache_in_redis(recovered)
+        found.update(recovered)
+        return found
+
+    def resolve(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Substitui as referências dos registros pelo conteúdo gerado, com uma
+        única leitura de blobs para o lote inteiro.
+        """
+        hashes = {record[self.ref_field] for record in records if record and self.ref_field in record}
+        if not hashes:
+            return records
+
+        blobs = self.fetch(hashes)
+        resolved = []
+        for record in records:
+            if record and self.ref_field in record:
+                content_hash = record[self.ref_field]
+                record = {field: value for field, value in record.items() if field != self.ref_field}
+                record['generated_content'] = blobs.get(content_hash, {})
+            resolved.append(record)
+        return resolved
+
+    def resolve_map(self, records: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return dict(zip(records, self.resolve(list(records.values()))))
+
+    def count(self) -> int:
+        if self.memory.db_enabled:
+            return GeneratedContentBlob.objects.count()
+        return self.memory.backup_store.count('blobs')
+
+    def clear(self):
+        """
+        Remove todos os blobs (usado ao limpar toda a memória).
+        """
+        if self.memory.redis_client:
+            unlink_by_pattern(self.memory.redis_client, f"{self.key_prefix}:*")
+            self.memory.redis_client.unlink(self.refs_key)
+        if self.memory.db_enabled:
+            GeneratedContentBlob.objects.all().delete()
+        self.memory.backup_store.clear('blobs')
+
+    def _remove_blobs(self, hashes: List[str]):
+        if self.memory.redis_client:
+            self.memory.redis_client.unlink(*[self._blob_key(content_hash) for content_hash in hashes])
+        self.memory.backup_store.delete('blobs', *hashes)
+
+    def collect_garbage(self, grace_period: Optional[int] = None, batch_size: int = 500) -> int:
+        """
+        Remove os blobs sem referências de todas as camadas.
+
+        Só são removidos blobs com contagem zerada e sem alteração há mais de
+        grace_period segundos. No banco, também é preciso que nenhum produto
+        os referencie (protege contra desvios da contagem); no modo legado, a
+        contagem e o horário ficam no hash de referências do Redis e são
+        conferidos de novo em uma transação (WATCH) antes da remoção.
+
+        Args:
+            grace_period: Segundos desde a última alteração (padrão: PRODUCT_MEMORY_BLOB_GC_GRACE)
+            batch_size: Blobs removidos por lote
+
+        Returns:
+            Número de blobs removidos
+        """
+        if grace_period is None:
+            grace_period = getattr(settings, 'PRODUCT_MEMORY_BLOB_GC_GRACE', 3600)
+        removed = 0
+
+        if self.memory.db_enabled:
+            cutoff = timezone.now() - timedelta(seconds=grace_period)
+            unreferenced = GeneratedContentBlob.objects.filter(
+                ref_count__lte=0, updated_at__lt=cutoff
+            ).exclude(
+                content_hash__in=RememberedProduct.objects.exclude(content_hash='').values('content_hash')
+            )
+            while True:
+                hashes = list(unreferenced.values_list('content_hash', flat=True)[:batch_size])
+                if not hashes:
+                    break
+                unreferenced.filter(content_hash__in=hashes).delete()
+                self._remove_blobs(hashes)
+                removed += len(hashes)
+
+        elif self.memory.redis_client:
+            cutoff = time.time() - grace_period
+            refs = {
+                field.decode('utf-8'): value
+                for field, value in self.memory.redis_client.hgetall(self.refs_key).items()
+            }
+            hashes = [
+                content_hash for content_hash, count in refs.items()
+                if not content_hash.endswith(self.touched_suffix) and int(count) <= 0
+                and float(refs.get(self._touched_field(content_hash), 0)) < cutoff
+            ]
+            for start in range(0, len(hashes), batch_size):
+                removed += self._collect_redis_batch(hashes[start:start + batch_size], cutoff)
+
+        logger.info(f"Coleta de lixo do conteúdo gerado: {removed} blobs removidos")
+        return removed
+
+    def _collect_redis_batch(self, hashes: List[str], cutoff: float) -> int:
+        """
+        Remove um lote de blobs sem referências no modo legado.
+
+        A contagem e o horário de cada hash são relidos sob WATCH e as
+        entradas saem do hash de referências em MULTI/EXEC: uma gravação
+        concorrente invalida a transação, que é refeita com os valores novos.
+        Hashes sem horário (gravados antes do registro de alterações)
+        recebem o horário atual e esperam a próxima coleta.
+        """
+        redis_client = self.memory.redis_client
+        # WATCH vale para um único nó: o do hash de referências
+        refs_client = redis_client.client_for(self.refs_key) if isinstance(redis_client, ShardedRedis) else redis_client
+        fields = [field for content_hash in hashes for field in (content_hash, self._touched_field(content_hash))]
+
+        # Conteúdo lido antes da remoção, para restaurar blobs referenciados de novo no meio da coleta
+        contents = dict(zip(hashes, redis_client.mget([self._blob_key(content_hash) for content_hash in hashes])))
+
+        with refs_client.pipeline(transaction=True) as pipeline:
+            for _ in range(self.gc_watch_retries):
+                try:
+                    pipeline.watch(self.refs_key)
+                    values = pipeline.hmget(self.refs_key, fields)
+                    collectable, untimed = [], []
+                    for content_hash, count, touched in zip(hashes, values[0::2], values[1::2]):
+                        if count is None or int(count) > 0:
+                            continue
+                        if touched is None:
+                            untimed.append(content_hash)
+                        elif float(touched) < cutoff:
+                            collectable.append(content_hash)
+                    pipeline.multi()
+                    if collectable:
+                        pipeline.hdel(self.refs_key, *[
+                            field for content_hash in collectable
+                            for field in (content_hash, self._touched_field(content_hash))
+                        ])
+                    if untimed:
+                        now = time.time()
+                        pipeline.hset(self.refs_key, mapping={self._touched_field(content_hash): now for content_hash in untimed})
+                    pipeline.execute()
+                    break
+                except WatchError:
+                    continue
+            else:
+                logger.warning("Hash de referências alterado durante a coleta de lixo; lote adiado para a próxima execução")
+                return 0
+
+        if not collectable:
+            return 0
+        redis_client.unlink(*[self._blob_key(content_hash) for content_hash in collectable])
+
+        # Uma gravação entre a transação e o UNLINK volta a referenciar o blob
+        counts = refs_client.hmget(self.refs_key, collectable)
+        revived = {content_hash for content_hash, count in zip(collectable, counts) if count is not None and int(count) > 0}
+        if revived:
+            self._cache_in_redis({
+                content_hash: json.loads(contents[content_hash].decode('utf-8'))
+                for content_hash in revived if contents.get(content_hash)
+            })
+        removed = [content_hash for content_hash in collectable if content_hash not in revived]
+        if removed:
+            self.memory.backup_store.delete('blobs', *removed)
+        return len(removed)
@@ -3,7 +3,6 @@
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
 
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -33,8 +32,11 @@ class CatalogHistoryView(View):
         
         Query Parameters:
         - page: Número da página (padrão: 1)
+        - cursor: Cursor opaco (next_cursor/prev_cursor); vazio para a primeira
+          página. Quando presente, a paginação é por cursor e ignora page
         - limit: Itens por página (padrão: 20, máximo: 100)
-        - search: Busca por nome do produto
+        - search: Busca por nome, SKU ou título gerado (resultados por relevância)
+        - search_mode: substring (padrão) ou prefix
         - status: Filtro por status (validated, pending, all)
         - date_from: Data inicial (YYYY-MM-DD)
         - date_to: Data final (YYYY-MM-DD)
@@ -47,27 +49,76 @@ class CatalogHistoryView(View):
             
             # Parâmetros de filtro
             search = request.GET.get('search', '').strip()
+            search_mode = request.GET.get('search_mode', 'substring')
             status_filter = request.GET.get('status', 'all')
             date_from = request.GET.get('date_from')
             date_to = request.GET.get('date_to')
             origin_filter = request.GET.get('origin', 'all')
             
-            # Obter todos os produtos da memória
-            all_products = self._get_enhanced_product_list()
+            filters_applied = {
+                'search': search,
+                'search_mode': search_mode,
+                'status': status_filter,
+                'date_from': date_from,
+                'date_to': date_to,
+                'origin': origin_filter
+            }
             
-            # Aplicar filtros
-            filtered_products = self._apply_filters(
-                all_products, search, status_filter, date_from, date_to, origin_filter
-            )
+            # Paginação por cursor: custo constante em qualquer profundidade
+            cursor = request.GET.get('cursor')
+            if cursor is not None:
+                try:
+                    result = product_memory.query_products_page(
+                        cursor=cursor,
+                        limit=limit,
+                        search=search,
+                        status=status_filter,
+                        origin=origin_filter,
+                        date_from=date_from or '',
+                        date_to=date_to or '',
+                        search_mode=search_mode,
+                        summary=True
+                    )
+                except ValueError as e:
+                    return JsonResponse({
+                        'success': False,
+                        'error': str(e)
+                    }, status=400)
+                
+                return JsonResponse({
+                    'success': True,
+                    'data': {
+                        'products': result['records'],
+                        'pagination': {
+                            'next_cursor': result['next_cursor'],
+                            'prev_cursor': result['prev_cursor'],
+                            'total_items': result['total_items'],
+                            'items_per_page': limit,
+                            'has_next': result['next_cursor'] is not None,
+                            'has_previous': result['prev_cursor'] is not None
+                        },
+                        'statistics': product_memory.get_statistics(),
+                        'filters_applied': filters_applied
+                    }
+                })
             
-            # Paginação
-            total_items = len(filtered_products)
-            start_index = (page - 1) * limit
-            end_index = start_index + limit
-            paginated_products = filtered_products[start_index:end_index]
+            # Consulta indexada: apenas a página pedida é lida, já enriquecida nas colunas
+            page = max(page, 1)
+            paginated_products, total_items = product_memory.query_products(
+                search=search,
+                status=status_filter,
+                origin=origin_filter,
+                date_from=date_from or '',
+                date_to=date_to or '',
+                offset=(page - 1) * limit,
+                limit=limit,
+                search_mode=search_mode,
+                summary=True
+            )
+            end_index = page * limit
             
             # Estatísticas
-            stats = self._get_history_statistics(all_products)
+            stats = product_memory.get_statistics()
             
             return JsonResponse({
                 'success': True,
@@ -82,13 +133,7 @@ class CatalogHistoryView(View):
                         'has_previous': page > 1
                     },
                     'statistics': stats,
-                    'filters_applied': {
-                        'search': search,
-                        'status': status_filter,
-                        'date_from': date_from,
-                        'date_to': date_to,
-                        'origin': origin_filter
-                    }
+                    'filters_applied': filters_applied
                 }
             })
             
@@ -99,229 +144,6 @@ class CatalogHistoryView(View):
                 'error': 'Erro interno do servidor',
                 'details': str(e)
             }, status=500)
-    
-    def _get_enhanced_product_list(self) -> List[Dict[str, Any]]:
-        """
-        Obtém lista completa de produtos com informações enriquecidas.
-        """
-        try:
-            products = []
-            
-            # Obter produtos da memória
-            memory_products = product_memory.list_products(limit=10000)  # Limite alto para pegar todos
-            
-            for product in memory_products:
-                try:
-                    # Obter dados completos do produto
-                    full_data = product_memory.get_product_data(product.get('identifier', ''))
-                    
-                    if full_data:
-                        enhanced_product = self._enhance_product_data(full_data)
-                        products.append(enhanced_product)
-                        
-                except Exception as e:
-                    logger.warning(f"Erro ao processar produto {product.get('identifier')}: {e}")
-                    continue
-            
-            # Ordenar por data de criação (mais recente primeiro)
-            products.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            
-            return products
-            
-        except Exception as e:
-            logger.error(f"Erro ao obter lista de produtos: {e}")
-            return []
-    
-    def _enhance_product_data(self, product_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Enriquece os dados do produto com informações adicionais para o histórico.
-        """
-        try:
-            original_data = product_data.get('original_data', {})
-            generated_content = product_data.get('generated_content', {})
-            
-            # Determinar origem
-            origin = self._determine_origin(original_data)
-            
-            # Determinar status (por enquanto, todos são considerados validados)
-            status = 'validated'  # Pode ser expandido futuramente
-            
-            # Extrair informações principais
-            product_name = (
-                generated_content.get('titulo') or 
-                original_data.get('title') or 
-                original_data.get('nome') or 
-                product_data.get('product_identifier', 'Produto sem nome')
-            )
-            
-            return {
-                'id': product_data.get('product_identifier'),
-                'name': product_name,
-                'sku': original_data.get('sku') or original_data.get('SKU'),
-                'created_at': product_data.get('created_at'),
-                'updated_at': product_data.get('updated_at'),
-                'origin': origin,
-                'status': status,
-                'has_title': bool(generated_content.get('titulo')),
-                'has_description': bool(generated_content.get('descricao_produto')),
-                'has_bullet_points': bool(generated_content.get('bullet_points')),
-                'has_keywords': bool(generated_content.get('palavras_chave')),
-                'original_data_keys': list(original_data.keys()) if original_data else [],
-                'generated_content_keys': list(generated_content.keys()) if generated_content else [],
-                'data_quality_score': self._calculate_data_quality(original_data, generated_content)
-            }
-            
-        except Exception as e:
-            logger.error(f"Erro ao enriquecer dados do produto: {e}")
-            return {
-                'id': product_data.get('product_identifier', 'unknown'),
-                'name': 'Erro ao processar produto',
-                'status': 'error',
-                'created_at': product_data.get('created_at'),
-                'origin': 'unknown'
-            }
-    
-    def _determine_origin(self, original_data: Dict[str, Any]) -> str:
-        """
-        Determina a origem do produto baseado nos dados originais.
-        """
-        if not original_data:
-            return 'unknown'
-        
-        # Se tem muitos campos estruturados, provavelmente veio de planilha
-        structured_fields = ['sku', 'SKU', 'title', 'price', 'categoria', 'marca']
-        if sum(1 for field in structured_fields if field in original_data) >= 3:
-            return 'spreadsheet'
-        
-        # Se tem URL, provavelmente veio de extração de link
-        if 'url' in original_data or 'link' in original_data:
-            return 'link_extraction'
-        
-        # Caso contrário, assume entrada manual
-        return 'manual'
-    
-    def _calculate_data_quality(self, original_data: Dict[str, Any], generated_content: Dict[str, Any]) -> float:
-        """
-        Calcula um score de qualidade dos dados (0-100).
-        """
-        try:
-            score = 0
-            
-            # Pontos por dados originais
-            if original_data:
-                score += min(len(original_data) * 5, 30)  # Máximo 30 pontos
-            
-            # Pontos por conteúdo gerado
-            if generated_content:
-                if generated_content.get('titulo'):
-                    score += 20
-                if generated_content.get('descricao_produto'):
-                    score += 25
-                if generated_content.get('bullet_points'):
-                    score += 15
-                if generated_content.get('palavras_chave'):
-                    score += 10
-            
-            return min(score, 100)
-            
-        except Exception:
-            return 0
-    
-    def _apply_filters(self, products: List[Dict[str, Any]], search: str, status_filter: str, 
-                      date_from: str, date_to: str, origin_filter: str) -> List[Dict[str, Any]]:
-        """
-        Aplica filtros à lista de produtos.
-        """
-        filtered = products
-        
-        # Filtro de busca por nome
-        if search:
-            search_lower = search.lower()
-            filtered = [
-                p for p in filtered 
-                if search_lower in p.get('name', '').lower() or 
-                   search_lower in str(p.get('sku', '')).lower()
-            ]
-        
-        # Filtro por status
-        if status_filter != 'all':
-            filtered = [p for p in filtered if p.get('status') == status_filter]
-        
-        # Filtro por origem
-        if origin_filter != 'all':
-            filtered = [p for p in filtered if p.get('origin') == origin_filter]
-        
-        # Filtros de data
-        if date_from:
-            try:
-                date_from_obj = datetime.fromisoformat(date_from)
-                filtered = [
-                    p for p in filtered 
-                    if p.get('created_at') and 
-                       datetime.fromisoformat(p['created_at'].replace('Z', '+00:00').split('+')[0]) >= date_from_obj
-                ]
-            except Exception as e:
-                logger.warning(f"Erro ao aplicar filtro date_from: {e}")
-        
-        if date_to:
-            try:
-                date_to_obj = datetime.fromisoformat(date_to)
-                filtered = [
-                    p for p in filtered 
-                    if p.get('created_at') and 
-                       datetime.fromisoformat(p['created_at'].replace('Z', '+00:00').split('+')[0]) <= date_to_obj
-                ]
-            except Exception as e:
-                logger.warning(f"Erro ao aplicar filtro date_to: {e}")
-        
-        return filtered
-    
-    def _get_history_statistics(self, products: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """
-        Calcula estatísticas do histórico.
-        """
-        try:
-            total = len(products)
-            
-            if total == 0:
-                return {
-                    'total_products': 0,
-                    'by_status': {},
-                    'by_origin': {},
-                    'average_quality_score': 0
-                }
-            
-            # Estatísticas por status
-            by_status = {}
-            for product in products:
-                status = product.get('status', 'unknown')
-                by_status[status] = by_status.get(status, 0) + 1
-            
-            # Estatísticas por origem
-            by_origin = {}
-            for product in products:
-                origin = product.get('origin', 'unknown')
-                by_origin[origin] = by_origin.get(origin, 0) + 1
-            
-            # Score médio de qualidade
-            quality_scores = [p.get('data_quality_score', 0) for p in products]
-            avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
-            
-            return {
-                'total_products': total,
-                'by_status': by_status,
-                'by_origin': by_origin,
-                'average_quality_score': round(avg_quality, 1)
-            }
-            
-        except Exception as e:
-            logger.error(f"Erro ao calcular estatísticas: {e}")
-            return {
-                'total_products': len(products),
-                'by_status': {},
-                'by_origin': {},
-                'average_quality_score': 0
-            }
 
 
 class ValidateMemoryView(View):
@@ -342,26 +164,15 @@ class ValidateMemoryView(View):
         """
         try:
             # Verificar se o produto existe
-            product_data = product_memory.get_product_data(product_id)
-            
-            if not product_data:
+            if not product_memory.has_product(product_id):
                 return JsonResponse({
                     'success': False,
                     'error': 'Produto não encontrado na memória'
                 }, status=404)
             
-            # Marcar como validado (adicionar flag de validação)
-            product_data['validated'] = True
-            product_data['validated_at'] = datetime.now().isoformat()
-            product_data['updated_at'] = datetime.now().isoformat()
-            
-            # Salvar de volta na memória
-            success = product_memory.save_product_data(
-                product_id,
-                product_data.get('original_data', {}),
-                product_data.get('generated_content', {}),
-                force_update=True
-            )
+            # Marcar como validado em todas as camadas da memória
+            success = product_memory.validate_product(product_id)
+            product_data = product_memory.get_product_data(product_id) or {}
             
             if success:
                 return JsonResponse({
@@ -369,7 +180,7 @@ class ValidateMemoryView(View):
                     'message': f'Produto {product_id} validado com sucesso',
                     'data': {
                         'product_id': product_id,
-                        'validated_at': product_data['validated_at']
+                        'validated_at': product_data.get('validated_at')
                     }
                 })
             else:
@@ -451,10 +262,8 @@ class MemoryStatsView(View):
             # Estatísticas básicas da memória
             memory_stats = get_memory_statistics()
             
-            # Estatísticas específicas do histórico
-            history_view = CatalogHistoryView()
-            all_products = history_view._get_enhanced_product_list()
-            history_stats = history_view._get_history_statistics(all_products)
+            # Estatísticas específicas do histórico (agregadas no banco)
+            history_stats = product_memory.get_statistics()
             
             return JsonResponse({
                 'success': True,
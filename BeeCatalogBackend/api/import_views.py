@@ -8,9 +8,9 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.conf import settings
 from .spreadsheet_importer import spreadsheet_importer
+from .tasks import import_spreadsheet_task
 
 logger = logging.getLogger(__name__)
 
@@ -40,11 +40,8 @@ class SpreadsheetPreviewView(View):
                     'message': f'Formato não suportado. Use: {", ".join(spreadsheet_importer.supported_formats)}'
                 }, status=400)
             
-            # Salvar arquivo temporariamente
-            temp_path = default_storage.save(
-                f'temp_imports/{uploaded_file.name}',
-                ContentFile(uploaded_file.read())
-            )
+            # Salvar arquivo temporariamente (gravado em blocos, sem ler o arquivo inteiro na memória)
+            temp_path = default_storage.save(f'temp_imports/{uploaded_file.name}', uploaded_file)
             
             try:
                 # Fazer preview
@@ -96,7 +93,7 @@ class SpreadsheetImportView(View):
             uploaded_file = request.FILES['file']
             sheet_name = request.POST.get('sheet_name')
             force_update = request.POST.get('force_update', 'false').lower() == 'true'
-            batch_size = int(request.POST.get('batch_size', 100))
+            batch_size = int(request.POST.get('batch_size', 500))
             
             # Validar tipo de arquivo
             if not any(uploaded_file.name.lower().endswith(ext) for ext in spreadsheet_importer.supported_formats):
@@ -105,31 +102,32 @@ class SpreadsheetImportView(View):
                     'message': f'Formato não suportado. Use: {", ".join(spreadsheet_importer.supported_formats)}'
                 }, status=400)
             
-            # Salvar arquivo temporariamente
-            temp_path = default_storage.save(
-                f'temp_imports/{uploaded_file.name}',
-                ContentFile(uploaded_file.read())
+            # Salvar arquivo temporariamente (gravado em blocos, sem ler o arquivo inteiro na memória)
+            temp_path = default_storage.save(f'temp_imports/{uploaded_file.name}', uploaded_file)
+            
+            # A importação roda na fila 'import'; o progresso é consultado em task-status/<job_id>/
+            # e o arquivo temporário é removido pela tarefa
+            task = import_spreadsheet_task.delay(
+                default_storage.path(temp_path),
+                sheet_name=sheet_name,
+                force_update=force_update,
+                batch_size=batch_size
             )
             
-            try:
-                # Fazer importação
-                import_stats = spreadsheet_importer.import_to_memory(
-                    file_path=default_storage.path(temp_path),
-                    sheet_name=sheet_name,
-                    force_update=force_update,
-                    batch_size=batch_size
-                )
-                
-                return JsonResponse({
-                    'status': 'success',
+            response = {
+                'status': 'success',
+                'message': 'Importação da planilha iniciada',
+                'job_id': task.id
+            }
+            if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+                # Modo síncrono (desenvolvimento): a tarefa já terminou
+                import_stats = task.result
+                response.update({
                     'data': import_stats,
-                    'message': f'Importação concluída: {import_stats["imported"]} produtos importados, {import_stats["updated"]} atualizados'
+                    'message': f'Importação concluída: {import_stats["imported"]} produtos importados, {import_stats["updated"]} atualizados, {import_stats["unchanged"]} inalterados'
                 })
-                
-            finally:
-                # Limpar arquivo temporário
-                if default_storage.exists(temp_path):
-                    default_storage.delete(temp_path)
+            
+            return JsonResponse(response, status=202)
             
         except Exception as e:
             logger.error(f"Erro na importação da planilha: {e}")
@@ -156,11 +154,8 @@ class SpreadsheetColumnsView(View):
             uploaded_file = request.FILES['file']
             sheet_name = request.POST.get('sheet_name')
             
-            # Salvar arquivo temporariamente
-            temp_path = default_storage.save(
-                f'temp_imports/{uploaded_file.name}',
-                ContentFile(uploaded_file.read())
-            )
+            # Salvar arquivo temporariamente (gravado em blocos, sem ler o arquivo inteiro na memória)
+            temp_path = default_storage.save(f'temp_imports/{uploaded_file.name}', uploaded_file)
             
             try:
                 # Ler apenas o cabeçalho
@@ -252,7 +247,7 @@ class ImportHistoryView(View):
                             'Use nomes de colunas em português ou inglês',
                             'Certifique-se de que pelo menos uma coluna de identificação (SKU, título) está presente',
                             'Dados em branco serão ignorados',
-                            'Use force_update=true para sobrescrever dados existentes'
+                            'Produtos inalterados não são regravados; use force_update=true para sobrescrever produtos de outra origem'
                         ]
                     }
                 }
@@ -0,0 +1,291 @@
+# api/local_cache.py
+
+import json
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from django.conf import settings
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class CacheInvalidationBus:
+    """
+    Barramento de invalidação do cache L1 entre processos via Redis pub/sub.
+
+    Cada escrita ou remoção publica as chaves afetadas no canal; os demais
+    processos (web e workers Celery) removem essas chaves do seu cache local.
+    Mensagens publicadas pelo próprio processo são ignoradas.
+    """
+
+    channel = 'beecatalog:l1_invalidation'
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._caches: Dict[str, 'LocalCache'] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._thread = None
+        self._subscribed = False
+        self._redis_client = None
+        self._redis_enabled = not settings.DEBUG
+
+        if self._redis_enabled:
+            try:
+                redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+                self._redis_client = redis.from_url(redis_url)
+            except Exception as e:
+                logger.warning(f"Não foi possível conectar ao Redis para invalidação do cache L1: {e}")
+                self._redis_client = None
+
+    def register(self, local_cache: 'LocalCache'):
+        self._caches[local_cache.name] = local_cache
+
+    def is_healthy(self) -> bool:
+        """
+        Indica se o cache L1 pode ser usado com segurança.
+
+        Sem Redis (desenvolvimento) há um único processo e o L1 é sempre
+        consistente. Com Redis, o L1 só é servido enquanto a assinatura do
+        canal de invalidação estiver ativa.
+        """
+        if not self._redis_enabled:
+            return True
+        self._ensure_listener()
+        return self._subscribed
+
+    def publish(self, cache_name: str, keys: Optional[Iterable[str]] = None, clear: bool = False):
+        if not self._redis_client:
+            return
+        message = {
+            'origin': self.node_id,
+            'cache': cache_name,
+            'keys': list(keys or []),
+            'clear': clear
+        }
+        try:
+            self._redis_client.publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Erro ao publicar invalidação do cache L1: {e}")
+
+    def _ensure_listener(self):
+        # Após um fork (workers Celery) a thread do processo pai não existe mais
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.node_id = uuid.uuid4().hex
+            self._thread = None
+            self._subscribed = False
+            for local_cache in self._caches.values():
+                local_cache.clear()
+
+        if not self._redis_client or (self._thread and self._thread.is_alive()):
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._listen, name='l1-cache-invalidation', daemon=True
+            )
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._subscribed = True
+                logger.debug("Assinatura do canal de invalidação do cache L1 ativa")
+
+                for message in pubsub.listen():
+                    self._handle_message(message)
+
+            except Exception as e:
+                logger.warning(f"Canal de invalidação do cache L1 interrompido: {e}")
+            finally:
+                # Mensagens podem ter sido perdidas: descartar o conteúdo local
+                self._subscribed = False
+                for local_cache in self._caches.values():
+                    local_cache.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(1)
+
+    def _handle_message(self, message: Dict[str, Any]):
+        try:
+            payload = json.loads(message['data'])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if payload.get('origin') == self.node_id:
+            return
+
+        local_cache = self._caches.get(payload.get('cache'))
+        if not local_cache:
+            return
+
+        local_cache.handle_remote_invalidation(payload.get('keys', []), clear=payload.get('clear', False))
+
+
+invalidation_bus = CacheInvalidationBus()
+
+
+class LocalCache:
+    """
+    Cache L1 em memória do processo, com expiração (TTL) e política LRU.
+
+    Fica na frente do cache Django/Redis para que consultas repetidas dentro
+    de um mesmo job não saiam do processo. É limitado por número de entradas
+    e por bytes; os valores são guardados serializados em JSON, o que mede o
+    tamanho real e impede que chamadores alterem a cópia em cache.
+    """
+
+    def __init__(self, name: str, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, default_timeout: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries or getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 5000)
+        self.max_bytes = max_bytes or getattr(settings, 'LOCAL_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        self.default_timeout = default_timeout or getattr(settings, 'LOCAL_CACHE_TIMEOUT', 300)
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._invalidation_listeners: List[Callable[[List[str]], None]] = []
+
+        invalidation_bus.register(self)
+
+    def add_invalidation_listener(self, callback: Callable[[List[str]], None]):
+        """
+        Registra uma função chamada com as chaves invalidadas por outros processos.
+        """
+        self._invalidation_listeners.append(callback)
+
+    def handle_remote_invalidation(self, keys: List[str], clear: bool = False):
+        if clear:
+            self.clear()
+        else:
+            for key in keys:
+                self.delete(key)
+
+        for callback in self._invalidation_listeners:
+            try:
+                callback(keys)
+            except Exception as e:
+                logger.warning(f"Erro ao processar invalidação remota do cache L1: {e}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Recupera um valor do cache local, ou None se ausente/expirado.
+        """
+        if not invalidation_bus.is_healthy():
+            self.misses += 1
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, serialized = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return json.loads(serialized)
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        """
+        Armazena um valor apenas neste processo.
+        """
+        if not invalidation_bus.is_healthy():
+            return False
+
+        try:
+            serialized = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        except (TypeError, ValueError):
+            return False
+
+        size = len(serialized)
+        if size > self.max_bytes:
+            return False
+
+        expires_at = time.monotonic() + (timeout or self.default_timeout)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (expires_at, serialized)
+            self._current_bytes += size
+
+            while len(self._entries) > self.max_entries or self._current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+        return True
+
+    def delete(self, key: str):
+        """
+        Remove a chave apenas deste processo.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def invalidate(self, *keys: str):
+        """
+        Remove as chaves localmente e em todos os outros processos.
+        """
+        for key in keys:
+            self.delete(key)
+        self.invalidations += len(keys)
+        invalidation_bus.publish(self.name, keys=keys)
+
+    def invalidate_all(self):
+        self.clear()
+        self.invalidations += 1
+        invalidation_bus.publish(self.name, clear=True)
+
+    def _remove(self, key: str):
+        _, serialized = self._entries.pop(key)
+        self._current_bytes -= len(serialized)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total_lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._current_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total_lookups, 3) if total_lookups else 0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'invalidation_channel_active': invalidation_bus.is_healthy()
+        }
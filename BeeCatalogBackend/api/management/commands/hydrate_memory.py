@@ -0,0 +1,82 @@
+# api/management/commands/hydrate_memory.py
+
+from django.core.management.base import BaseCommand, CommandError
+from api.memory_hydration import hydrate_memory, needs_hydration
+
+
+class Command(BaseCommand):
+    help = 'Recarrega no Redis a memória de produtos a partir do backup local ou do banco'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            choices=['auto', 'backup', 'database'],
+            default='auto',
+            help='Origem dos registros: backup local, banco ou auto (banco quando habilitado)'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Registros por lote/pipeline do Redis (padrão: 500)'
+        )
+
+        parser.add_argument(
+            '--rate-limit',
+            type=int,
+            default=0,
+            help='Máximo de registros por segundo (padrão: 0, sem limite)'
+        )
+
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignora o checkpoint da execução anterior e recomeça do início'
+        )
+
+        parser.add_argument(
+            '--if-needed',
+            action='store_true',
+            help='Só hidrata se o Redis tiver perdido a memória (marcador ausente)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size deve ser maior que zero')
+
+        if options['if_needed'] and not needs_hydration():
+            self.stdout.write(self.style.SUCCESS('Memória já hidratada no Redis; nada a fazer.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('\n=== Hidratação da Memória no Redis ===\n'))
+
+        try:
+            result = hydrate_memory(
+                source=options['source'],
+                batch_size=options['batch_size'],
+                rate_limit=options['rate_limit'],
+                resume=not options['restart'],
+                progress_callback=self.show_progress
+            )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nInterrompido; execute novamente para continuar do checkpoint.'))
+            return
+        except Exception as e:
+            raise CommandError(f'Erro ao hidratar memória: {e}')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído ({result['source']}): {result['loaded']} carregados, "
+            f"{result['skipped']} já existentes, {result['processed']} processados"
+        ))
+
+    def show_progress(self, progress):
+        total = progress['total'] or 1
+        percent = min(progress['processed'] / total * 100, 100)
+        self.stdout.write(
+            f"\r{progress['processed']}/{progress['total']} ({percent:.1f}%) - "
+            f"{progress['loaded']} carregados, {progress['skipped']} já existentes",
+            ending=''
+        )
+        self.stdout.flush()
@@ -23,6 +23,24 @@ class Command(BaseCommand):
             help='Nome da planilha (para arquivos Excel)'
         )
         
+        parser.add_argument(
+            '--all-sheets',
+            action='store_true',
+            help='Importar todas as planilhas do arquivo Excel, em paralelo'
+        )
+        
+        parser.add_argument(
+            '--sheets',
+            type=str,
+            help='Planilhas a importar em paralelo, separadas por vírgula (para arquivos Excel)'
+        )
+        
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processos simultâneos na importação de várias planilhas (padrão: uma por planilha, até o número de CPUs)'
+        )
+        
         parser.add_argument(
             '--preview',
             action='store_true',
@@ -32,14 +50,14 @@ class Command(BaseCommand):
         parser.add_argument(
             '--force-update',
             action='store_true',
-            help='Forçar atualização de produtos existentes'
+            help='Forçar atualização de produtos alterados vindos de outra origem (produtos inalterados nunca são regravados)'
         )
         
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=100,
-            help='Tamanho do lote para processamento (padrão: 100)'
+            default=500,
+            help='Tamanho do lote para processamento (padrão: 500)'
         )
         
         parser.add_argument(
@@ -70,6 +88,7 @@ class Command(BaseCommand):
         sample_size = options['sample_size']
         show_columns = options['columns']
         show_stats = options['stats']
+        selected_sheets = [name.strip() for name in (options.get('sheets') or '').split(',') if name.strip()]
         
         # Verificar se arquivo existe
         if not os.path.exists(file_path):
@@ -93,13 +112,24 @@ class Command(BaseCommand):
                 sheet_names = spreadsheet_importer.get_sheet_names(file_path)
                 self.stdout.write(f'\nPlanilhas disponíveis: {", ".join(sheet_names)}')
                 
-                if not sheet_name and len(sheet_names) > 1:
+                if options['all_sheets']:
+                    selected_sheets = sheet_names
+                
+                if selected_sheets:
+                    missing = [name for name in selected_sheets if name not in sheet_names]
+                    if missing:
+                        raise CommandError(f'Planilha(s) não encontrada(s): {", ".join(missing)}')
+                    sheet_name = selected_sheets[0]
+                elif not sheet_name and len(sheet_names) > 1:
                     self.stdout.write(
                         self.style.WARNING(
-                            f'Múltiplas planilhas encontradas. Usando a primeira: {sheet_names[0]}'
+                            f'Múltiplas planilhas encontradas. Usando a primeira: {sheet_names[0]} '
+                            f'(use --all-sheets ou --sheets para importar várias)'
                         )
                     )
                     sheet_name = sheet_names[0]
+            elif selected_sheets or options['all_sheets']:
+                raise CommandError('--all-sheets e --sheets só se aplicam a arquivos Excel')
             
             # Mostrar informações das colunas
             if show_columns:
@@ -124,38 +154,16 @@ class Command(BaseCommand):
             
             # Preview dos dados
             if preview_only:
-                self.stdout.write(self.style.SUCCESS('\n=== PREVIEW DOS DADOS ==='))
-                preview_data = spreadsheet_importer.preview_import(
-                    file_path, sheet_name, sample_size
-                )
-                
-                self.stdout.write(f'Arquivo: {file_path}')
-                if sheet_name:
-                    self.stdout.write(f'Planilha: {sheet_name}')
-                self.stdout.write(f'Total de linhas: {preview_data["total_rows"]}')
-                self.stdout.write(f'Linhas válidas: {preview_data["valid_rows"]}')
-                self.stdout.write(f'Produtos identificados: {preview_data["identified_products"]}')
-                
-                if preview_data['sample_products']:
-                    self.stdout.write('\nAmostra de produtos:')
-                    for i, product in enumerate(preview_data['sample_products'], 1):
-                        self.stdout.write(f'\n  Produto {i}:')
-                        for key, value in product.items():
-                            if value:
-                                display_value = str(value)[:100] + '...' if len(str(value)) > 100 else str(value)
-                                self.stdout.write(f'    {key}: {display_value}')
-                
-                if preview_data['errors']:
-                    self.stdout.write(self.style.WARNING('\nErros encontrados:'))
-                    for error in preview_data['errors'][:5]:  # Mostrar apenas os primeiros 5
-                        self.stdout.write(f'  {error}')
-                
+                for preview_sheet in selected_sheets or [sheet_name]:
+                    self._display_preview(file_path, preview_sheet, sample_size)
                 return
             
             # Importação real
             self.stdout.write(self.style.SUCCESS('\n=== INICIANDO IMPORTAÇÃO ==='))
             self.stdout.write(f'Arquivo: {file_path}')
-            if sheet_name:
+            if len(selected_sheets) > 1:
+                self.stdout.write(f'Planilhas: {", ".join(selected_sheets)}')
+            elif sheet_name:
                 self.stdout.write(f'Planilha: {sheet_name}')
             self.stdout.write(f'Forçar atualização: {"Sim" if force_update else "Não"}')
             self.stdout.write(f'Tamanho do lote: {batch_size}')
@@ -168,20 +176,33 @@ class Command(BaseCommand):
                     return
             
             # Executar importação
-            import_stats = spreadsheet_importer.import_to_memory(
-                file_path=file_path,
-                sheet_name=sheet_name,
-                force_update=force_update,
-                batch_size=batch_size
-            )
+            if len(selected_sheets) > 1:
+                import_stats = spreadsheet_importer.import_sheets(
+                    file_path=file_path,
+                    sheet_names=selected_sheets,
+                    force_update=force_update,
+                    batch_size=batch_size,
+                    workers=options.get('workers'),
+                    sheet_callback=self._display_sheet_result
+                )
+            else:
+                import_stats = spreadsheet_importer.import_to_memory(
+                    file_path=file_path,
+                    sheet_name=sheet_name,
+                    force_update=force_update,
+                    batch_size=batch_size
+                )
             
             # Mostrar resultados
             self.stdout.write(self.style.SUCCESS('\n=== IMPORTAÇÃO CONCLUÍDA ==='))
             self.stdout.write(f'Produtos importados: {import_stats["imported"]}')
             self.stdout.write(f'Produtos atualizados: {import_stats["updated"]}')
+            self.stdout.write(f'Produtos inalterados: {import_stats["unchanged"]}')
             self.stdout.write(f'Produtos ignorados: {import_stats["skipped"]}')
             self.stdout.write(f'Erros: {import_stats["errors"]}')
             self.stdout.write(f'Total processado: {import_stats["total_processed"]}')
+            if import_stats.get('failed_sheets'):
+                self.stdout.write(self.style.ERROR(f'Planilhas com falha: {", ".join(import_stats["failed_sheets"])}'))
             
             if import_stats['error_details']:
                 self.stdout.write(self.style.WARNING('\nDetalhes dos erros:'))
@@ -197,6 +218,44 @@ class Command(BaseCommand):
         except Exception as e:
             raise CommandError(f'Erro durante a importação: {e}')
     
+    def _display_preview(self, file_path, sheet_name, sample_size):
+        """Mostra o preview de uma planilha."""
+        self.stdout.write(self.style.SUCCESS('\n=== PREVIEW DOS DADOS ==='))
+        preview_data = spreadsheet_importer.preview_import(
+            file_path, sheet_name, sample_size
+        )
+        
+        self.stdout.write(f'Arquivo: {file_path}')
+        if sheet_name:
+            self.stdout.write(f'Planilha: {sheet_name}')
+        self.stdout.write(f'Total de linhas: {preview_data["total_rows"]}')
+        self.stdout.write(f'Linhas válidas: {preview_data["valid_rows"]}')
+        self.stdout.write(f'Produtos identificados: {preview_data["identified_products"]}')
+        
+        if preview_data['sample_products']:
+            self.stdout.write('\nAmostra de produtos:')
+            for i, product in enumerate(preview_data['sample_products'], 1):
+                self.stdout.write(f'\n  Produto {i}:')
+                for key, value in product.items():
+                    if value:
+                        display_value = str(value)[:100] + '...' if len(str(value)) > 100 else str(value)
+                        self.stdout.write(f'    {key}: {display_value}')
+        
+        if preview_data['errors']:
+            self.stdout.write(self.style.WARNING('\nErros encontrados:'))
+            for error in preview_data['errors'][:5]:  # Mostrar apenas os primeiros 5
+                self.stdout.write(f'  {error}')
+    
+    def _display_sheet_result(self, sheet_name, sheet_stats):
+        """Mostra o resultado de cada planilha à medida que termina."""
+        if 'error' in sheet_stats:
+            self.stdout.write(self.style.ERROR(f'  Planilha {sheet_name}: falhou ({sheet_stats["error"]})'))
+            return
+        self.stdout.write(
+            f'  Planilha {sheet_name}: {sheet_stats["imported"]} importados, {sheet_stats["updated"]} atualizados, '
+            f'{sheet_stats["unchanged"]} inalterados, {sheet_stats["errors"]} erros'
+        )
+    
     def _display_stats(self, stats):
         """Exibe estatísticas da memória de forma formatada."""
         self.stdout.write(f'Total de produtos na memória: {stats["total_products"]}')
@@ -7,6 +7,8 @@ from api.memory_utils import (
     clear_product_memory,
     delete_product_from_memory,
     export_memory_data,
+    iter_memory_export,
+    export_memory_parquet,
     extract_product_identifier
 )
 from api.product_memory import product_memory
@@ -17,7 +19,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             'action',
-            choices=['stats', 'clear', 'list', 'export', 'delete', 'health'],
+            choices=['stats', 'clear', 'list', 'export', 'delete', 'health', 'gc', 'migrate-backups'],
             help='Ação a ser executada'
         )
         
@@ -37,7 +39,13 @@ class Command(BaseCommand):
         parser.add_argument(
             '--output-file',
             type=str,
-            help='Arquivo de saída para export (formato JSON)'
+            help='Arquivo de saída para export (JSON; .ndjson, .ndjson.gz ou .parquet gravam em streaming)'
+        )
+        
+        parser.add_argument(
+            '--format',
+            choices=['json', 'ndjson', 'parquet'],
+            help='Formato do export em arquivo (padrão: pela extensão do arquivo)'
         )
         
         parser.add_argument(
@@ -57,11 +65,15 @@ class Command(BaseCommand):
             elif action == 'list':
                 self.list_products(options['limit'])
             elif action == 'export':
-                self.export_data(options['limit'], options['output_file'])
+                self.export_data(options['limit'], options['output_file'], options['format'])
             elif action == 'delete':
                 self.delete_product(options['product_id'], options['confirm'])
             elif action == 'health':
                 self.health_check()
+            elif action == 'gc':
+                self.collect_garbage()
+            elif action == 'migrate-backups':
+                self.migrate_backups()
                 
         except Exception as e:
             raise CommandError(f'Erro ao executar comando: {e}')
@@ -70,11 +82,15 @@ class Command(BaseCommand):
         """Mostra estatísticas da memória."""
         self.stdout.write(self.style.SUCCESS('\n=== Estatísticas da Memória Inteligente ===\n'))
         
-        stats = get_memory_statistics()
+        stats = get_memory_statistics(detailed=True)
         
         self.stdout.write(f"Redis conectado: {stats.get('redis_connected', False)}")
         self.stdout.write(f"Produtos no Redis: {stats.get('redis_products', 0)}")
+        self.stdout.write(f"Produtos no banco de dados: {stats.get('database_products', 0)}")
         self.stdout.write(f"Backups locais: {stats.get('local_backups', 0)}")
+        if stats.get('legacy_backup_files'):
+            self.stdout.write(f"Arquivos de backup antigos (não migrados): {stats['legacy_backup_files']}")
+        self.stdout.write(f"Blobs de conteúdo gerado: {stats.get('content_blobs', 0)}")
         self.stdout.write(f"Diretório de memória: {stats.get('memory_dir', 'N/A')}")
         
         if 'redis_memory_usage' in stats:
@@ -86,6 +102,21 @@ class Command(BaseCommand):
         if 'newest_entry' in stats:
             self.stdout.write(f"Entrada mais recente: {stats['newest_entry']}")
 
+    def collect_garbage(self):
+        """Remove blobs de conteúdo gerado sem referências."""
+        self.stdout.write('Coletando blobs de conteúdo gerado sem referências...')
+        removed = product_memory.blob_store.collect_garbage()
+        self.stdout.write(self.style.SUCCESS(f'{removed} blob(s) removido(s)'))
+
+    def migrate_backups(self):
+        """Migra os arquivos JSON de backup antigos para o backup SQLite."""
+        self.stdout.write('Migrando arquivos de backup antigos...')
+        migrated = product_memory.migrate_legacy_backups(
+            progress_callback=lambda total: self.stdout.write(f'\r  {total} arquivos migrados', ending='')
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'{migrated} arquivo(s) migrado(s) para {product_memory.backup_store.path}'))
+
     def clear_memory(self, confirm):
         """Limpa toda a memória."""
         if not confirm:
@@ -117,9 +148,18 @@ class Command(BaseCommand):
         
         self.stdout.write(f'\nTotal: {len(products)} produtos')
 
-    def export_data(self, limit, output_file):
+    def export_data(self, limit, output_file, export_format=None):
         """Exporta dados da memória."""
-        self.stdout.write(f'Exportando dados (limite: {limit})...')
+        self.stdout.write(f'Exportando dados (limite: {limit or "todos"})...')
+        
+        if output_file and not export_format:
+            export_format = 'ndjson' if '.ndjson' in output_file else 'parquet' if output_file.endswith('.parquet') else 'json'
+        if output_file and export_format == 'ndjson':
+            self.export_ndjson(limit, output_file)
+            return
+        if output_file and export_format == 'parquet':
+            self.export_parquet(limit, output_file)
+            return
         
         data = export_memory_data(limit=limit)
         
@@ -134,10 +174,11 @@ class Command(BaseCommand):
             # Mostrar no terminal (limitado)
             self.stdout.write(self.style.SUCCESS(f'\n=== Dados Exportados ({len(data)} produtos) ===\n'))
             
-            for product_id, product_data in list(data.items())[:10]:  # Mostrar apenas os primeiros 10
-                self.stdout.write(f"ID: {product_id}")
-                if 'title' in product_data:
-                    self.stdout.write(f"  Título: {product_data['title'][:50]}...")
+            for product_data in data[:10]:  # Mostrar apenas os primeiros 10
+                self.stdout.write(f"ID: {product_data.get('product_identifier')}")
+                title = (product_data.get('generated_content') or {}).get('titulo')
+                if title:
+                    self.stdout.write(f"  Título: {str(title)[:50]}...")
                 if 'created_at' in product_data:
                     self.stdout.write(f"  Criado em: {product_data['created_at']}")
                 self.stdout.write('')
@@ -146,6 +187,27 @@ class Command(BaseCommand):
                 self.stdout.write(f'... e mais {len(data) - 10} produtos.')
                 self.stdout.write('\nUse --output-file para exportar todos os dados.')
 
+    def export_ndjson(self, limit, output_file):
+        """Grava o export em NDJSON (gzip se terminar em .gz) sem carregar tudo na memória."""
+        compress = output_file.endswith('.gz')
+        written = 0
+        try:
+            with open(output_file, 'wb') as f:
+                for chunk in iter_memory_export(limit=limit or None, compress=compress):
+                    f.write(chunk)
+                    written += len(chunk)
+            self.stdout.write(self.style.SUCCESS(f'Dados exportados para: {output_file} ({written} bytes)'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Erro ao salvar arquivo: {e}'))
+
+    def export_parquet(self, limit, output_file):
+        """Grava o export em Parquet (schema fixo, um row group por lote)."""
+        try:
+            exported = export_memory_parquet(output_file, limit=limit or None)
+            self.stdout.write(self.style.SUCCESS(f'Dados exportados para: {output_file} ({exported} produtos)'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Erro ao salvar arquivo: {e}'))
+
     def delete_product(self, product_id, confirm):
         """Remove um produto específico da memória."""
         if not product_id:
@@ -172,7 +234,7 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('\n=== Health Check da Memória Inteligente ===\n'))
         
         try:
-            stats = get_memory_statistics()
+            stats = get_memory_statistics(detailed=True)
             
             # Verificar Redis
             redis_status = '✓ Conectado' if stats.get('redis_connected', False) else '✗ Desconectado'
@@ -0,0 +1,50 @@
+# api/management/commands/reshard_redis.py
+
+from django.core.management.base import BaseCommand, CommandError
+from api.product_memory import product_memory
+from api.cache_utils import ai_cache
+from api.redis_shards import ShardedRedis
+
+
+class Command(BaseCommand):
+    help = 'Move as chaves da memória de produtos e do cache da IA para os nós Redis atuais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            choices=['memory', 'ai', 'all'],
+            default='all',
+            help='Conjunto de chaves a redistribuir (padrão: all)'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Chaves por lote (padrão: 500)'
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        if options['target'] in ('memory', 'all'):
+            targets.append(('memória de produtos', product_memory.redis_client, f"{product_memory.memory_prefix}*"))
+        if options['target'] in ('ai', 'all'):
+            targets.append(('cache da IA', ai_cache.redis_client, f"{ai_cache.cache_prefix}:*"))
+
+        for label, redis_client, pattern in targets:
+            if not isinstance(redis_client, ShardedRedis):
+                self.stdout.write(self.style.WARNING(f'{label}: Redis não particionado, nada a mover'))
+                continue
+
+            self.stdout.write(f'{label}: redistribuindo chaves {pattern}...')
+            try:
+                moved = redis_client.reshard(
+                    pattern,
+                    batch_size=options['batch_size'],
+                    progress_callback=lambda total: self.stdout.write(f'\r  {total} chaves movidas', ending='')
+                )
+            except Exception as e:
+                raise CommandError(f'Erro ao redistribuir {label}: {e}')
+
+            self.stdout.write('')
+            self.stdout.write(self.style.SUCCESS(f'{label}: {moved} chaves movidas'))
@@ -0,0 +1,219 @@
+# api/memory_hydration.py
+
+import os
+import json
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from .models import RememberedProduct
+from .product_memory import product_memory
+
+logger = logging.getLogger(__name__)
+
+# Marcador gravado no Redis ao fim de uma hidratação completa; some junto com
+# o restante das chaves em um flush/failover, sinalizando que é preciso hidratar
+HYDRATED_MARKER_KEY = f"{product_memory.memory_prefix}_hidratado"
+HYDRATION_LOCK_KEY = f"{product_memory.memory_prefix}_hidratacao_lock"
+CHECKPOINT_PATH = os.path.join(settings.BASE_DIR, "memory", "hidratacao_checkpoint.json")
+
+
+def _load_checkpoint(source: str) -> Dict[str, Any]:
+    try:
+        with open(CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('source') == source:
+            return checkpoint
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Checkpoint de hidratação inválido, recomeçando do início: {e}")
+    return {}
+
+
+def _save_checkpoint(checkpoint: Dict[str, Any]):
+    temp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(temp_path, CHECKPOINT_PATH)
+
+
+def _clear_checkpoint():
+    try:
+        os.remove(CHECKPOINT_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def _iter_backup_batches(checkpoint: Dict[str, Any], batch_size: int):
+    """
+    Lê os registros do backup local em ordem de chave. A posição é a chave
+    do último registro do lote.
+    """
+    for rows in product_memory.backup_store.iter_batches('records', batch_size, after_key=checkpoint.get('position')):
+        yield [record for _, record in rows if record.get('product_identifier')], len(rows), rows[-1][0]
+
+
+def _iter_database_batches(checkpoint: Dict[str, Any], batch_size: int):
+    """
+    Lê os registros do banco em páginas keyset (created_at, identificador).
+    """
+    queryset = RememberedProduct.objects.order_by('-created_at', '-product_identifier')
+    position = checkpoint.get('position')
+    if position:
+        position = (product_memory._parse_timestamp(position[0]), position[1])
+
+    while True:
+        page = queryset.filter(product_memory._keyset_condition(*position, 'lt')) if position else queryset
+        rows = list(page.values_list('created_at', 'product_identifier', 'payload')[:batch_size])
+        if not rows:
+            return
+        position = rows[-1][:2]
+        yield [payload for _, _, payload in rows], len(rows), [position[0].isoformat(), position[1]]
+
+
+def _count_source(source: str) -> int:
+    if source == 'database':
+        return RememberedProduct.objects.count()
+    return product_memory.backup_store.count('records')
+
+
+def _load_batch(redis_client, records: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Grava um lote no Redis em um único pipeline e atualiza os índices locais.
+
+    Usa SET NX EX (SETEX que não sobrescreve): uma chave regravada pela
+    aplicação durante a hidratação é mais nova que o backup e é preservada.
+
+    Returns:
+        Tupla (carregados, já existentes)
+    """
+    keyed_records = {
+        product_memory._generate_product_key(record['product_identifier']): record
+        for record in records
+    }
+    if not keyed_records:
+        return 0, 0
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for memory_key, record in keyed_records.items():
+        pipeline.set(memory_key, json.dumps(record, ensure_ascii=False), ex=product_memory.default_timeout, nx=True)
+    results = pipeline.execute()
+
+    # Filtro de Bloom deste processo; os demais o reconstroem no intervalo configurado
+    product_memory._add_membership(*keyed_records)
+
+    loaded = sum(1 for result in results if result)
+    return loaded, len(results) - loaded
+
+
+def needs_hydration() -> bool:
+    """
+    Indica se o Redis perdeu a memória de produtos (marcador de hidratação ausente).
+    """
+    redis_client = product_memory.redis_client
+    if not redis_client:
+        return False
+    try:
+        return not redis_client.exists(HYDRATED_MARKER_KEY)
+    except Exception as e:
+        logger.warning(f"Erro ao verificar marcador de hidratação: {e}")
+        return False
+
+
+def hydrate_memory(source: str = 'auto', batch_size: int = 500, rate_limit: int = 0, resume: bool = True,
+                   progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Recarrega no Redis a memória de produtos a partir da camada durável.
+
+    Em vez de repovoar o Redis um erro de leitura por vez, percorre os
+    registros em lotes e grava cada lote com um pipeline. A posição é
+    salva em um checkpoint após cada lote, então uma execução interrompida
+    continua de onde parou.
+
+    Args:
+        source: 'backup' (backup local), 'database' ou 'auto' (banco quando habilitado)
+        batch_size: Registros por lote (tamanho do pipeline)
+        rate_limit: Máximo de registros por segundo (0 para sem limite)
+        resume: Continua do checkpoint da execução anterior, se houver
+        progress_callback: Chamada com o progresso após cada lote
+
+    Returns:
+        Resumo da hidratação (processados, carregados, já existentes)
+    """
+    redis_client = product_memory.redis_client
+    if not redis_client:
+        raise RuntimeError('Redis não configurado: não há o que hidratar')
+
+    if source == 'auto':
+        source = 'database' if product_memory.db_enabled else 'backup'
+    if source not in ('backup', 'database'):
+        raise ValueError(f"Fonte de hidratação inválida: {source}")
+
+    checkpoint = _load_checkpoint(source) if resume else {}
+    if not checkpoint:
+        _clear_checkpoint()
+    progress = {
+        'source': source,
+        'total': _count_source(source),
+        'processed': checkpoint.get('processed', 0),
+        'loaded': checkpoint.get('loaded', 0),
+        'skipped': checkpoint.get('skipped', 0)
+    }
+    if checkpoint:
+        logger.info(f"Retomando hidratação da memória ({source}) após {progress['processed']} registros")
+
+    if source == 'database':
+        batches = _iter_database_batches(checkpoint, batch_size)
+    else:
+        batches = _iter_backup_batches(checkpoint, batch_size)
+
+    started_at = time.monotonic()
+    processed_this_run = 0
+    for records, batch_count, position in batches:
+        loaded, skipped = _load_batch(redis_client, records)
+        progress['processed'] += batch_count
+        progress['loaded'] += loaded
+        progress['skipped'] += skipped
+        _save_checkpoint({**progress, 'position': position})
+
+        if progress_callback:
+            progress_callback(dict(progress))
+
+        # Limite de vazão: não passar de rate_limit registros por segundo
+        processed_this_run += batch_count
+        if rate_limit > 0:
+            delay = processed_this_run / rate_limit - (time.monotonic() - started_at)
+            if delay > 0:
+                time.sleep(delay)
+
+    # Contadores das estatísticas também se perderam com o Redis
+    product_memory.reconcile_statistics()
+    redis_client.set(HYDRATED_MARKER_KEY, int(time.time()))
+    _clear_checkpoint()
+
+    logger.info(
+        f"Hidratação da memória concluída ({source}): {progress['loaded']} carregados, "
+        f"{progress['skipped']} já existentes em {progress['processed']} processados"
+    )
+    return progress
+
+
+def hydrate_memory_if_needed(**kwargs) -> Optional[Dict[str, Any]]:
+    """
+    Hidrata o Redis apenas se ele perdeu a memória, com uma trava para que
+    um único processo faça o trabalho quando vários iniciam ao mesmo tempo.
+
+    Returns:
+        Resumo da hidratação, ou None se não foi necessária
+    """
+    redis_client = product_memory.redis_client
+    if not needs_hydration():
+        return None
+    if not redis_client.set(HYDRATION_LOCK_KEY, os.getpid(), nx=True, ex=3600):
+        logger.info("Hidratação da memória já em andamento em outro processo")
+        return None
+    try:
+        return hydrate_memory(**kwargs)
+    finally:
+        redis_client.delete(HYDRATION_LOCK_KEY)
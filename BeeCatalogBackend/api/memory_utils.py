@@ -1,7 +1,11 @@
 # api/memory_utils.py
 
+import json
+import zlib
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
 from .product_memory import product_memory
 
 logger = logging.getLogger(__name__)
@@ -295,25 +299,21 @@ def batch_check_products_in_memory(products_data: List[Dict[str, Any]]) -> Dict[
         logger.error(f"Erro ao verificar produtos em lote na memória: {e}")
         return {}
 
-def get_memory_statistics() -> Dict[str, Any]:
+def get_memory_statistics(detailed: bool = False) -> Dict[str, Any]:
     """
     Retorna estatísticas da memória de produtos.
     
+    Args:
+        detailed: Se True, inclui a contagem de produtos por camada de armazenamento
+    
     Returns:
         Dicionário com estatísticas
     """
     try:
-        stats = product_memory.get_memory_stats()
+        stats = product_memory.get_memory_stats(detailed=detailed)
         
-        # Adicionar estatísticas extras
-        products_list = product_memory.list_products(limit=1000)
-        
-        stats.update({
-            'total_products_sample': len(products_list),
-            'products_with_title': sum(1 for p in products_list if p.get('has_title')),
-            'products_with_description': sum(1 for p in products_list if p.get('has_description')),
-            'products_with_bullet_points': sum(1 for p in products_list if p.get('has_bullet_points'))
-        })
+        # Totais mantidos incrementalmente (leitura O(1) dos contadores)
+        stats.update(product_memory.get_statistics())
         
         return stats
         
@@ -355,6 +355,9 @@ def export_memory_data(limit: int = 1000) -> List[Dict[str, Any]]:
     """
     Exporta dados da memória para análise ou backup.
     
+    Para exportações grandes prefira iter_memory_export, que não materializa
+    a lista inteira.
+    
     Args:
         limit: Número máximo de produtos a exportar
     
@@ -362,19 +365,143 @@ def export_memory_data(limit: int = 1000) -> List[Dict[str, Any]]:
         Lista de produtos com dados completos
     """
     try:
-        products_summary = product_memory.list_products(limit=limit)
         detailed_products = []
-        
-        for product_summary in products_summary:
-            identifier = product_summary.get('identifier')
-            if identifier:
-                full_data = product_memory.get_product_data(identifier)
-                if full_data:
-                    detailed_products.append(full_data)
+        for batch in product_memory.iter_record_batches(limit=limit):
+            detailed_products.extend(batch)
         
         logger.info(f"Exportados {len(detailed_products)} produtos da memória")
         return detailed_products
         
     except Exception as e:
         logger.error(f"Erro ao exportar dados da memória: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def iter_memory_export(limit: Optional[int] = None, compress: bool = False,
+                       batch_size: int = 500) -> Iterator[bytes]:
+    """
+    Gera a exportação da memória em NDJSON (um produto por linha).
+    
+    Os registros são lidos em lotes e cada lote vira um bloco de saída, então
+    o uso de memória é constante e o primeiro bloco sai logo após o primeiro
+    lote, mesmo em exportações completas.
+    
+    Args:
+        limit: Número máximo de produtos (None para todos)
+        compress: Se True, gera gzip incremental
+        batch_size: Número de registros lidos por lote
+    
+    Yields:
+        Blocos de bytes da exportação
+    """
+    # wbits=31: formato gzip (cabeçalho + CRC) em vez de zlib puro
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    exported = 0
+    
+    for batch in product_memory.iter_record_batches(batch_size=batch_size, limit=limit):
+        chunk = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch).encode('utf-8')
+        exported += len(batch)
+        if compressor:
+            # Sync flush: o cliente recebe cada lote sem esperar o fim do arquivo
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            yield chunk
+    
+    if compressor:
+        yield compressor.flush()
+    
+    logger.info(f"Exportados {exported} produtos da memória (NDJSON)")
+
+# Colunas dos dados do produto na exportação Parquet: os campos padrão da
+# importação de planilhas, então o arquivo exportado pode ser reimportado.
+# Todas são texto, como na planilha de origem: peso e preço livres ("500g",
+# "1,5 kg", "sob consulta") voltam iguais e a reimportação não altera o registro.
+PARQUET_PRODUCT_FIELDS = [
+    'sku', 'title', 'description', 'price', 'brand', 'category', 'model', 'weight',
+    'dimensions', 'color', 'material', 'keywords', 'bullet_points', 'specifications'
+]
+
+# Schema fixo da exportação Parquet (independe dos campos de cada produto)
+MEMORY_PARQUET_SCHEMA = pa.schema(
+    [pa.field('product_identifier', pa.string(), nullable=False)]
+    + [pa.field(field, pa.string()) for field in PARQUET_PRODUCT_FIELDS]
+    + [
+        # Demais campos do produto, em JSON
+        pa.field('product_data_extra', pa.string()),
+        pa.field('generated_title', pa.string()),
+        pa.field('generated_description', pa.string()),
+        pa.field('generated_bullet_points', pa.list_(pa.string())),
+        pa.field('generated_keywords', pa.list_(pa.string())),
+        pa.field('data_quality_score', pa.int16()),
+        pa.field('status', pa.string()),
+        pa.field('origin', pa.string()),
+        pa.field('created_at', pa.string()),
+        pa.field('updated_at', pa.string())
+    ]
+)
+
+def _parquet_text(value: Any) -> Optional[str]:
+    if value is None or value == '' or value == []:
+        return None
+    if isinstance(value, (list, tuple)):
+        return '; '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+def _parquet_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace(';', ',').split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def _records_to_parquet_columns(records: List[Dict[str, Any]]) -> Dict[str, list]:
+    columns: Dict[str, list] = {name: [] for name in MEMORY_PARQUET_SCHEMA.names}
+    product_fields = set(PARQUET_PRODUCT_FIELDS)
+    
+    for record in records:
+        product_data = record.get('product_data') or {}
+        content = record.get('generated_content') or {}
+        
+        columns['product_identifier'].append(str(record.get('product_identifier', '')))
+        for field in PARQUET_PRODUCT_FIELDS:
+            columns[field].append(_parquet_text(product_data.get(field)))
+        extra = {field: value for field, value in product_data.items() if field not in product_fields}
+        columns['product_data_extra'].append(json.dumps(extra, ensure_ascii=False, default=str) if extra else None)
+        
+        columns['generated_title'].append(_parquet_text(content.get('titulo')))
+        columns['generated_description'].append(_parquet_text(content.get('descricao_produto')))
+        columns['generated_bullet_points'].append(_parquet_list(content.get('bullet_points')))
+        columns['generated_keywords'].append(_parquet_list(content.get('palavras_chave')))
+        columns['data_quality_score'].append(int(record.get('data_quality_score') or 0))
+        columns['status'].append(record.get('status'))
+        columns['origin'].append(record.get('origin'))
+        columns['created_at'].append(record.get('created_at'))
+        columns['updated_at'].append(record.get('updated_at'))
+    
+    return columns
+
+def export_memory_parquet(output, limit: Optional[int] = None, batch_size: int = 5000) -> int:
+    """
+    Exporta a memória em Parquet com schema fixo (MEMORY_PARQUET_SCHEMA).
+    
+    Cada lote de registros vira um row group, então o uso de memória é
+    constante. O arquivo pode ser reimportado por SpreadsheetImporter: as
+    colunas dos dados do produto usam os nomes padrão da importação.
+    
+    Args:
+        output: Caminho ou arquivo binário de saída
+        limit: Número máximo de produtos (None para todos)
+        batch_size: Registros por lote/row group
+    
+    Returns:
+        Número de produtos exportados
+    """
+    exported = 0
+    with pq.ParquetWriter(output, MEMORY_PARQUET_SCHEMA, compression='zstd') as writer:
+        for batch in product_memory.iter_record_batches(batch_size=batch_size, limit=limit):
+            writer.write_table(pa.Table.from_pydict(_records_to_parquet_columns(batch), schema=MEMORY_PARQUET_SCHEMA))
+            exported += len(batch)
+    
+    logger.info(f"Exportados {exported} produtos da memória (Parquet)")
+    return exported
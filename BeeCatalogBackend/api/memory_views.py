@@ -2,19 +2,22 @@
 
 import json
 import logging
-from django.http import JsonResponse
+import tempfile
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_http_methods
 from .memory_utils import (
     get_memory_statistics,
-    clear_product_memory,
     delete_product_from_memory,
     export_memory_data,
+    iter_memory_export,
+    export_memory_parquet,
     extract_product_identifier
 )
 from .product_memory import product_memory
+from .tasks import clear_product_memory_task
 
 logger = logging.getLogger(__name__)
 
@@ -46,18 +49,14 @@ class ClearProductMemoryView(View):
     
     def post(self, request):
         try:
-            success = clear_product_memory()
+            # A limpeza roda como tarefa Celery; o progresso é consultado em task-status/<job_id>/
+            task = clear_product_memory_task.delay()
             
-            if success:
-                return JsonResponse({
-                    'status': 'success',
-                    'message': 'Memória de produtos limpa com sucesso'
-                })
-            else:
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'Falha ao limpar memória de produtos'
-                }, status=500)
+            return JsonResponse({
+                'status': 'success',
+                'message': 'Limpeza da memória de produtos iniciada',
+                'job_id': task.id
+            }, status=202)
                 
         except Exception as e:
             logger.error(f"Erro ao limpar memória de produtos: {e}")
@@ -117,6 +116,29 @@ class ExportProductMemoryView(View):
     
     def get(self, request):
         try:
+            # Exportação completa em Parquet: ?format=parquet[&limit=N]
+            if request.GET.get('format') == 'parquet':
+                limit = int(request.GET['limit']) if request.GET.get('limit') else None
+                # O rodapé do Parquet só é gravado no fim: arquivo temporário, removido ao fechar a resposta
+                output = tempfile.TemporaryFile()
+                export_memory_parquet(output, limit=limit)
+                output.seek(0)
+                return FileResponse(output, as_attachment=True, filename='memoria_produtos.parquet',
+                                    content_type='application/vnd.apache.parquet')
+            
+            # Exportação completa em streaming: ?format=ndjson[&gzip=1][&limit=N]
+            if request.GET.get('format') == 'ndjson':
+                limit = int(request.GET['limit']) if request.GET.get('limit') else None
+                compress = request.GET.get('gzip') in ('1', 'true')
+                
+                response = StreamingHttpResponse(
+                    iter_memory_export(limit=limit, compress=compress),
+                    content_type='application/gzip' if compress else 'application/x-ndjson'
+                )
+                filename = 'memoria_produtos.ndjson.gz' if compress else 'memoria_produtos.ndjson'
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
+            
             limit = int(request.GET.get('limit', 1000))
             exported_data = export_memory_data(limit=limit)
             
@@ -147,6 +169,25 @@ class ListProductsMemoryView(View):
     def get(self, request):
         try:
             limit = int(request.GET.get('limit', 100))
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Parâmetro limit deve ser um número'
+            }, status=400)
+        
+        try:
+            # Paginação por cursor (keyset) quando o parâmetro é enviado
+            cursor = request.GET.get('cursor')
+            if cursor is not None:
+                result = product_memory.list_products_advanced(limit=limit, cursor=cursor)
+                return JsonResponse({
+                    'status': 'success',
+                    'data': result['products'],
+                    'count': len(result['products']),
+                    'next_cursor': result['pagination']['nextCursor'],
+                    'prev_cursor': result['pagination']['prevCursor']
+                })
+            
             products_list = product_memory.list_products(limit=limit)
             
             return JsonResponse({
@@ -155,10 +196,10 @@ class ListProductsMemoryView(View):
                 'count': len(products_list)
             })
             
-        except ValueError:
+        except ValueError as e:
             return JsonResponse({
                 'status': 'error',
-                'message': 'Parâmetro limit deve ser um número'
+                'message': str(e)
             }, status=400)
         except Exception as e:
             logger.error(f"Erro ao listar produtos da memória: {e}")
@@ -260,7 +301,7 @@ def memory_health_check(request):
     Endpoint para verificar a saúde do sistema de memória.
     """
     try:
-        stats = get_memory_statistics()
+        stats = get_memory_statistics(detailed=True)
         
         # Verificar se o sistema está funcionando
         health_status = {
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RememberedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('memory_key', models.CharField(max_length=32, unique=True)),
+                ('product_identifier', models.CharField(db_index=True, max_length=512)),
+                ('sku', models.CharField(blank=True, db_index=True, default='', max_length=255)),
+                ('name', models.CharField(blank=True, default='', max_length=512)),
+                ('title', models.CharField(blank=True, default='', max_length=512)),
+                ('status', models.CharField(db_index=True, default='pending', max_length=32)),
+                ('origin', models.CharField(db_index=True, default='manual', max_length=32)),
+                ('data_quality_score', models.PositiveSmallIntegerField(db_index=True, default=0)),
+                ('has_title', models.BooleanField(default=False)),
+                ('has_description', models.BooleanField(default=False)),
+                ('has_bullet_points', models.BooleanField(default=False)),
+                ('has_keywords', models.BooleanField(default=False)),
+                ('original_data_keys', models.JSONField(default=list)),
+                ('generated_content_keys', models.JSONField(default=list)),
+                ('search_text', models.TextField(blank=True, default='')),
+                ('content_hash', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('source_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('validated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-created_at', '-product_identifier'], name='memoria_criado_ident_idx'), models.Index(fields=['status', '-created_at'], name='memoria_status_criado_idx'), models.Index(fields=['origin', '-created_at'], name='memoria_origem_criado_idx')],
+            },
+        ),
+    ]
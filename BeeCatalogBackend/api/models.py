@@ -14,3 +14,66 @@ class UploadedImage(models.Model):
 
     def __str__(self):
         return self.url
+
+
+class RememberedProduct(models.Model):
+    """
+    Camada durável da memória inteligente de produtos.
+
+    O registro completo fica em `payload` (JSONB no PostgreSQL); as colunas
+    indexadas permitem filtrar, ordenar e paginar o histórico em SQL, e os
+    campos de enriquecimento (has_*, listas de chaves, qualidade) são
+    calculados na gravação para que as listagens não decodifiquem o payload.
+    O conteúdo gerado fica em GeneratedContentBlob, referenciado por `content_hash`;
+    `source_hash` é a impressão digital da linha importada (ver save_products_bulk).
+    O índice GIN/trigram de `search_text` é criado após o migrate (ver apps.py).
+    """
+    memory_key = models.CharField(max_length=32, unique=True)
+    product_identifier = models.CharField(max_length=512, db_index=True)
+    sku = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    name = models.CharField(max_length=512, blank=True, default='')
+    title = models.CharField(max_length=512, blank=True, default='')
+    status = models.CharField(max_length=32, default='pending', db_index=True)
+    origin = models.CharField(max_length=32, default='manual', db_index=True)
+    data_quality_score = models.PositiveSmallIntegerField(default=0, db_index=True)
+    has_title = models.BooleanField(default=False)
+    has_description = models.BooleanField(default=False)
+    has_bullet_points = models.BooleanField(default=False)
+    has_keywords = models.BooleanField(default=False)
+    original_data_keys = models.JSONField(default=list)
+    generated_content_keys = models.JSONField(default=list)
+    search_text = models.TextField(blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    source_hash = models.CharField(max_length=64, blank=True, default='')
+    payload = models.JSONField()
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    validated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-product_identifier'], name='memoria_criado_ident_idx'),
+            models.Index(fields=['status', '-created_at'], name='memoria_status_criado_idx'),
+            models.Index(fields=['origin', '-created_at'], name='memoria_origem_criado_idx'),
+        ]
+
+    def __str__(self):
+        return self.product_identifier
+
+
+class GeneratedContentBlob(models.Model):
+    """
+    Conteúdo gerado pela IA endereçado pelo hash (SHA-256) do próprio conteúdo.
+
+    SKUs variantes com o mesmo título, descrição e tópicos compartilham um
+    único blob; `ref_count` conta os produtos que o referenciam e blobs sem
+    referências são removidos pela coleta de lixo (ver content_blobs.py).
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    content = models.JSONField()
+    ref_count = models.IntegerField(default=0, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.content_hash
@@ -2,13 +2,26 @@
 
 import os
 import json
+import time
+import base64
 import hashlib
 import logging
-from typing import Dict, Optional, Any, List
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Any, Iterator, List, Tuple
+from datetime import datetime, date
 from django.conf import settings
 from django.core.cache import cache
-import redis
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+from .local_cache import LocalCache, invalidation_bus
+from .bloom_filter import BloomFilter
+from .models import RememberedProduct
+from .redis_utils import unlink_by_pattern
+from .redis_shards import get_redis_client
+from .content_blobs import ContentBlobStore
+from .backup_store import BackupStore
 
 logger = logging.getLogger(__name__)
 
@@ -30,21 +43,54 @@ class ProductMemory:
     def __init__(self):
         self.memory_prefix = 'product_memory'
         self.default_timeout = 7776000  # 90 dias
+        self.cache_timeout = 3600  # 1 hora no cache Django
         
-        # Diretório local para backup dos dados
+        # Cache L1 em memória do processo (evita ida ao Redis em consultas repetidas)
+        self.local_cache = LocalCache(self.memory_prefix)
+        self.local_cache.add_invalidation_listener(self._on_remote_invalidation)
+        
+        # Cache negativo: produtos ausentes são lembrados por pouco tempo e um
+        # filtro de Bloom responde "definitivamente ausente" sem nenhum I/O
+        self.negative_timeout = getattr(settings, 'PRODUCT_MEMORY_NEGATIVE_TIMEOUT', 60)
+        self.membership_rebuild_interval = getattr(settings, 'PRODUCT_MEMORY_BLOOM_REBUILD_INTERVAL', 600)
+        self._membership_filter = None
+        self._membership_built_at = 0.0
+        self._membership_lock = threading.Lock()
+        self._membership_pending = None
+        self.negative_hits = 0
+        self.bloom_rejections = 0
+        
+        # Banco de dados como camada durável (Redis passa a ser cache de leitura)
+        self.db_enabled = getattr(settings, 'PRODUCT_MEMORY_DB_ENABLED', True)
+        
+        # Contadores das estatísticas mantidos incrementalmente (hash no Redis);
+        # o campo de reconciliação só é gravado por reconcile_statistics
+        self.stats_key = f"{self.memory_prefix}_stats"
+        self.stats_reconciled_field = 'reconciled_at'
+        
+        # Backup local (SQLite gravado em segundo plano); memory_dir guarda os
+        # arquivos JSON do formato antigo, lidos até serem migrados
         self.memory_dir = os.path.join(settings.BASE_DIR, "memory", "produtos")
-        if not os.path.exists(self.memory_dir):
-            os.makedirs(self.memory_dir, exist_ok=True)
+        self.backup_store = BackupStore(
+            getattr(settings, 'PRODUCT_MEMORY_BACKUP_PATH', os.path.join(settings.BASE_DIR, "memory", "backup.sqlite3")),
+            batch_size=getattr(settings, 'PRODUCT_MEMORY_BACKUP_BATCH_SIZE', 500),
+            compaction_interval=getattr(settings, 'PRODUCT_MEMORY_BACKUP_COMPACTION_INTERVAL', 3600)
+        )
         
         # Conectar ao Redis para armazenamento principal apenas em produção
         self.redis_client = None
         if not settings.DEBUG:
             try:
-                redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
-                self.redis_client = redis.from_url(redis_url)
+                # Particionado entre PRODUCT_MEMORY_REDIS_URLS quando configurado
+                self.redis_client = get_redis_client(
+                    'PRODUCT_MEMORY_REDIS_URLS', 'PRODUCT_MEMORY_REDIS_PREVIOUS_URLS'
+                )
             except Exception as e:
                 logger.warning(f"Não foi possível conectar ao Redis para memória de produtos: {e}")
                 self.redis_client = None
+        
+        # Conteúdo gerado deduplicado entre SKUs (blobs endereçados pelo hash)
+        self.blob_store = ContentBlobStore(self)
     
     def _generate_product_key(self, product_identifier: str) -> str:
         """
@@ -66,11 +112,407 @@ class ProductMemory:
     
     def _get_product_file_path(self, product_identifier: str) -> str:
         """
-        Retorna o caminho do arquivo local para backup do produto.
+        Retorna o caminho do arquivo de backup no formato antigo (um JSON por produto).
         """
+        return os.path.join(self.memory_dir, f"{self._get_product_file_stem(product_identifier)}.json")
+    
+    def _get_product_file_stem(self, product_identifier: str) -> str:
         normalized_id = str(product_identifier).strip().lower()
-        safe_filename = "".join(c for c in normalized_id if c.isalnum() or c in ('-', '_'))[:50]
-        return os.path.join(self.memory_dir, f"{safe_filename}.json")
+        return "".join(c for c in normalized_id if c.isalnum() or c in ('-', '_'))[:50]
+    
+    def _negative_key(self, memory_key: str) -> str:
+        return f"{memory_key}:ausente"
+    
+    def _memory_hash(self, memory_key: str) -> str:
+        # Coluna memory_key do banco guarda apenas o hash, sem o prefixo
+        return memory_key[len(self.memory_prefix) + 1:]
+    
+    def _parse_timestamp(self, value: Optional[str]) -> Optional[datetime]:
+        """
+        Converte timestamps ISO dos registros em datetime com fuso horário.
+        """
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+    
+    def _infer_origin(self, original_data: Dict[str, Any]) -> str:
+        """
+        Deduz a origem de registros antigos gravados sem o campo origin.
+        """
+        if not original_data:
+            return 'unknown'
+        
+        # Se tem muitos campos estruturados, provavelmente veio de planilha
+        structured_fields = ['sku', 'SKU', 'title', 'price', 'categoria', 'marca']
+        if sum(1 for field in structured_fields if field in original_data) >= 3:
+            return 'spreadsheet'
+        
+        # Se tem URL, provavelmente veio de extração de link
+        if 'url' in original_data or 'link' in original_data:
+            return 'link_extraction'
+        
+        return 'manual'
+    
+    def _enrichment_fields(self, memory_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Calcula os campos de resumo do registro (gravados como colunas do índice).
+        """
+        original_data = memory_data.get('product_data') or {}
+        generated_content = memory_data.get('generated_content') or {}
+        
+        return {
+            'name': str(original_data.get('nome') or original_data.get('title') or ''),
+            'title': str(generated_content.get('titulo') or ''),
+            'sku': str(original_data.get('sku') or original_data.get('SKU') or ''),
+            'status': memory_data.get('status') or 'pending',
+            'origin': memory_data.get('origin') or self._infer_origin(original_data),
+            'data_quality_score': memory_data.get('data_quality_score') or 0,
+            'has_title': bool(generated_content.get('titulo')),
+            'has_description': bool(generated_content.get('descricao_produto')),
+            'has_bullet_points': bool(generated_content.get('bullet_points')),
+            'has_keywords': bool(generated_content.get('palavras_chave')),
+            'original_data_keys': list(original_data.keys()),
+            'generated_content_keys': list(generated_content.keys())
+        }
+    
+    def _record_to_row(self, memory_key: str, memory_data: Dict[str, Any],
+                       stored_data: Dict[str, Any]) -> RememberedProduct:
+        """
+        Monta a linha do banco a partir do registro salvo na memória.
+        
+        Args:
+            memory_key: Chave da memória
+            memory_data: Registro completo (fonte das colunas de enriquecimento)
+            stored_data: Registro com a referência ao conteúdo gerado (payload)
+        """
+        fields = self._enrichment_fields(memory_data)
+        identifier = str(memory_data.get('product_identifier', ''))
+        now = timezone.now()
+        
+        return RememberedProduct(
+            memory_key=self._memory_hash(memory_key),
+            product_identifier=identifier[:512],
+            sku=fields['sku'][:255],
+            name=fields['name'][:512],
+            title=fields['title'][:512],
+            status=fields['status'],
+            origin=fields['origin'],
+            data_quality_score=fields['data_quality_score'],
+            has_title=fields['has_title'],
+            has_description=fields['has_description'],
+            has_bullet_points=fields['has_bullet_points'],
+            has_keywords=fields['has_keywords'],
+            original_data_keys=fields['original_data_keys'],
+            generated_content_keys=fields['generated_content_keys'],
+            search_text=' '.join(
+                part for part in (fields['name'], fields['sku'], fields['title'], identifier) if part
+            ).lower(),
+            content_hash=self.blob_store.reference_of(stored_data) or '',
+            source_hash=memory_data.get('source_hash') or '',
+            payload=stored_data,
+            created_at=self._parse_timestamp(memory_data.get('created_at')) or now,
+            updated_at=self._parse_timestamp(memory_data.get('updated_at')) or now,
+            validated_at=self._parse_timestamp(memory_data.get('validated_at'))
+        )
+    
+    def _build_membership_filter(self) -> BloomFilter:
+        """
+        Reconstrói o filtro de Bloom a partir das chaves do Redis, do banco,
+        do backup local e dos nomes dos arquivos antigos ainda não migrados.
+        """
+        members = []
+        
+        if self.redis_client:
+            for key in self.redis_client.scan_iter(match=f"{self.memory_prefix}:*", count=1000):
+                members.append(key.decode('utf-8') if isinstance(key, bytes) else key)
+        
+        if self.db_enabled:
+            for key_hash in RememberedProduct.objects.values_list('memory_key', flat=True).iterator(chunk_size=5000):
+                members.append(f"{self.memory_prefix}:{key_hash}")
+        
+        members.extend(self.backup_store.keys('records'))
+        
+        if os.path.exists(self.memory_dir):
+            for filename in os.listdir(self.memory_dir):
+                if filename.endswith('.json'):
+                    members.append(f"arquivo:{filename[:-5]}")
+        
+        # Folga para inserções até a próxima reconstrução
+        membership = BloomFilter(capacity=len(members) * 2 + 10000)
+        membership.update(members)
+        return membership
+    
+    def _get_membership_filter(self) -> Optional[BloomFilter]:
+        """
+        Retorna o filtro de Bloom atual, agendando a reconstrução quando
+        vencido ou saturado.
+        
+        A reconstrução percorre todas as chaves (Redis, banco, backup e
+        arquivos) e roda em uma thread em segundo plano: a consulta usa o
+        filtro anterior enquanto isso, ou nenhum filtro antes do primeiro.
+        """
+        membership = self._membership_filter
+        expired = time.monotonic() - self._membership_built_at > self.membership_rebuild_interval
+        if membership is None or expired or membership.is_saturated:
+            self._schedule_membership_rebuild()
+        return membership
+    
+    def _schedule_membership_rebuild(self):
+        if not self._membership_lock.acquire(blocking=False):
+            # Reconstrução já em andamento
+            return
+        # Chaves gravadas durante a reconstrução são reaplicadas no filtro novo
+        self._membership_pending = []
+        try:
+            threading.Thread(
+                target=self._rebuild_membership_filter, name='memory-bloom-rebuild', daemon=True
+            ).start()
+        except Exception as e:
+            logger.warning(f"Erro ao agendar reconstrução do filtro de Bloom da memória: {e}")
+            self._membership_pending = None
+            self._membership_lock.release()
+    
+    def _rebuild_membership_filter(self):
+        try:
+            new_membership = self._build_membership_filter()
+            new_membership.update(self._membership_pending)
+            self._membership_filter = new_membership
+            self._membership_built_at = time.monotonic()
+            # Chaves gravadas entre a cópia da fila e a troca do filtro
+            new_membership.update(self._membership_pending)
+            logger.debug(f"Filtro de Bloom da memória reconstruído com {new_membership.count} chaves")
+        except Exception as e:
+            logger.warning(f"Erro ao reconstruir filtro de Bloom da memória: {e}")
+        finally:
+            self._membership_pending = None
+            self._membership_lock.release()
+            # Conexão do banco aberta por esta thread
+            connection.close()
+    
+    def _add_membership(self, *members: str):
+        pending = self._membership_pending
+        if pending is not None:
+            pending.extend(members)
+        if self._membership_filter is not None:
+            self._membership_filter.update(members)
+    
+    def _on_remote_invalidation(self, keys: List[str]):
+        # Escrita em outro processo: a chave passa a existir também para este filtro
+        self._add_membership(*[key for key in keys if not key.endswith(':ausente')])
+    
+    def _is_definitely_absent(self, memory_key: str, product_identifier: str) -> bool:
+        """
+        Retorna True quando o produto certamente não está na memória.
+        
+        Só confia no filtro enquanto o canal de invalidação estiver ativo,
+        pois é por ele que gravações de outros processos chegam ao filtro.
+        """
+        if not invalidation_bus.is_healthy():
+            return False
+        
+        if self.local_cache.get(self._negative_key(memory_key)):
+            self.negative_hits += 1
+            return True
+        
+        membership = self._get_membership_filter()
+        if membership is None:
+            return False
+        
+        file_member = f"arquivo:{self._get_product_file_stem(product_identifier)}"
+        if memory_key not in membership and file_member not in membership:
+            self.bloom_rejections += 1
+            return True
+        
+        return False
+    
+    def _remember_written(self, written: Dict[str, str]):
+        """
+        Atualiza cache negativo e filtro de Bloom após gravações.
+        
+        Args:
+            written: Mapeamento chave da memória -> identificador do produto
+        """
+        self._add_membership(*written)
+        
+        stale_keys = []
+        for memory_key in written:
+            stale_keys.extend((memory_key, self._negative_key(memory_key)))
+        self.local_cache.invalidate(*stale_keys)
+    
+    def _stat_fields(self, record: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Contribuição de um registro para os contadores das estatísticas.
+        """
+        if not record:
+            return {}
+        fields = self._enrichment_fields(record)
+        return {
+            'total': 1,
+            'quality_sum': fields['data_quality_score'],
+            f"status:{fields['status']}": 1,
+            f"origin:{fields['origin']}": 1,
+            'with_title': int(fields['has_title']),
+            'with_description': int(fields['has_description']),
+            'with_bullet_points': int(fields['has_bullet_points'])
+        }
+    
+    def _load_stored_records(self, memory_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Lê da camada durável as versões atuais das chaves (para calcular deltas).
+        """
+        if not memory_keys:
+            return {}
+        
+        if self.db_enabled:
+            rows = RememberedProduct.objects.filter(
+                memory_key__in=[self._memory_hash(memory_key) for memory_key in memory_keys]
+            ).values_list('memory_key', 'payload')
+            return {f"{self.memory_prefix}:{key_hash}": payload for key_hash, payload in rows}
+        
+        if not self.redis_client:
+            return {}
+        stored = {}
+        for memory_key, data in zip(memory_keys, self.redis_client.mget(memory_keys)):
+            if data:
+                stored[memory_key] = json.loads(data.decode('utf-8'))
+        return stored
+    
+    def _update_stat_counters(self, previous: Dict[str, Dict[str, Any]],
+                              current: Dict[str, Optional[Dict[str, Any]]]):
+        """
+        Aplica nos contadores a diferença entre as versões anteriores e as novas.
+        
+        Args:
+            previous: Registros antes da operação (chave -> registro)
+            current: Registros depois da operação (None para removidos)
+        """
+        if not self.redis_client:
+            return
+        
+        deltas: Dict[str, float] = {}
+        for memory_key in set(previous) | set(current):
+            for field, value in self._stat_fields(current.get(memory_key)).items():
+                deltas[field] = deltas.get(field, 0) + value
+            for field, value in self._stat_fields(previous.get(memory_key)).items():
+                deltas[field] = deltas.get(field, 0) - value
+        
+        try:
+            pipeline = self.redis_client.pipeline(transaction=True)
+            for field, value in deltas.items():
+                if not value:
+                    continue
+                if field == 'quality_sum':
+                    pipeline.hincrbyfloat(self.stats_key, field, value)
+                else:
+                    pipeline.hincrby(self.stats_key, field, int(value))
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Erro ao atualizar contadores da memória: {e}")
+    
+    def _persist_records(self, records: List[Dict[str, Any]]):
+        """
+        Grava registros completos em todas as camadas da memória.
+        
+        Caminho único de escrita: upsert em lote no banco (camada durável),
+        Redis em pipeline, cache Django, cache L1 e backup local em arquivo.
+        
+        Args:
+            records: Registros no formato salvo pela memória (com product_identifier)
+        """
+        keyed_records = {
+            self._generate_product_key(record['product_identifier']): record
+            for record in records
+        }
+        if not keyed_records:
+            return
+        
+        # Conteúdo gerado vira blob compartilhado; as camadas guardam só a referência
+        stored_records = {}
+        blobs = {}
+        for memory_key, record in keyed_records.items():
+            stored_record, content_hash, content = self.blob_store.split(record)
+            stored_records[memory_key] = stored_record
+            if content_hash:
+                blobs[content_hash] = content
+        
+        # Versões anteriores para o delta das referências e dos contadores das estatísticas
+        previous_records = {}
+        try:
+            previous_records = self._load_stored_records(list(keyed_records))
+        except Exception as e:
+            logger.warning(f"Erro ao ler versões anteriores da memória: {e}")
+        
+        self.blob_store.store(blobs)
+        self.blob_store.adjust_references(self.blob_store.reference_deltas(previous_records, stored_records))
+        
+        # Salvar no banco de dados (principal)
+        if self.db_enabled:
+            try:
+                RememberedProduct.objects.bulk_create(
+                    [
+                        self._record_to_row(memory_key, record, stored_records[memory_key])
+                        for memory_key, record in keyed_records.items()
+                    ],
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['memory_key'],
+                    update_fields=[
+                        'product_identifier', 'sku', 'name', 'title', 'status', 'origin', 'data_quality_score',
+                        'has_title', 'has_description', 'has_bullet_points', 'has_keywords',
+                        'original_data_keys', 'generated_content_keys', 'search_text', 'content_hash', 'source_hash', 'payload', 'created_at', 'updated_at', 'validated_at'
+                    ]
+                )
+                logger.info(f"{len(keyed_records)} produto(s) salvo(s) na memória do banco de dados")
+            except Exception as e:
+                logger.error(f"Erro ao salvar no banco de dados: {e}")
+        
+        # Salvar no Redis (cache de leitura na frente do banco)
+        if self.redis_client:
+            try:
+                pipeline = self.redis_client.pipeline(transaction=False)
+                for memory_key, stored_record in stored_records.items():
+                    pipeline.setex(memory_key, self.default_timeout, json.dumps(stored_record, ensure_ascii=False))
+                pipeline.execute()
+            except Exception as e:
+                logger.error(f"Erro ao salvar no Redis: {e}")
+            
+            self._update_stat_counters(self.blob_store.resolve_map(previous_records), keyed_records)
+        
+        # Salvar no cache Django (acesso rápido)
+        cache.set_many(keyed_records, timeout=self.cache_timeout)
+        
+        # Invalidar o cache L1 (e o negativo) dos outros processos e manter a versão nova localmente
+        self._remember_written({
+            memory_key: record['product_identifier'] for memory_key, record in keyed_records.items()
+        })
+        for memory_key, record in keyed_records.items():
+            self.local_cache.set(memory_key, record)
+        
+        # Backup local (gravado em lote pela thread do BackupStore, fora da task)
+        try:
+            self.backup_store.put_many('records', stored_records)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar backup local: {e}")
+    
+    def _fill_caches(self, memory_key: str, record: Dict[str, Any]):
+        """
+        Replica no Redis, no cache Django e no L1 um registro lido de uma camada inferior.
+        """
+        cache.set(memory_key, record, timeout=self.cache_timeout)
+        self.local_cache.set(memory_key, record)
+        if self.redis_client:
+            try:
+                stored_record, _, _ = self.blob_store.split(record)
+                serialized_data = json.dumps(stored_record, ensure_ascii=False)
+                self.redis_client.setex(memory_key, self.default_timeout, serialized_data)
+            except Exception as e:
+                logger.warning(f"Erro ao replicar no Redis: {e}")
     
     def save_product_data(self, product_identifier: str, product_data: Dict[str, Any], 
                          generated_content: Dict[str, Any], force_update: bool = False, 
@@ -88,58 +530,162 @@ class ProductMemory:
             True se salvou com sucesso, False caso contrário
         """
         try:
-            memory_key = self._generate_product_key(product_identifier)
-            
             # Verificar se já existe e não forçar atualização
-            if not force_update and self.get_product_data(product_identifier):
+            existing_data = self.get_product_data(product_identifier)
+            if existing_data and not force_update:
                 logger.info(f"Produto {product_identifier} já existe na memória. Use force_update=True para sobrescrever.")
                 return False
             
-            # Verificar se já existe dados
-            existing_data = self.get_product_data(product_identifier) if not force_update else None
-            current_time = datetime.now().isoformat()
-            
-            # Estrutura dos dados salvos
-            memory_data = {
-                'product_identifier': product_identifier,
-                'product_data': product_data,
-                'generated_content': generated_content,
-                'created_at': existing_data.get('created_at', current_time) if existing_data else current_time,
-                'updated_at': current_time,
-                'origin': existing_data.get('origin', origin) if existing_data else origin,
-                'status': existing_data.get('status', status) if existing_data else status,
-                'validated_at': existing_data.get('validated_at') if existing_data else None,
-                'data_quality_score': self._calculate_quality_score(product_data, generated_content),
-                'version': '1.0'
-            }
-            
-            # Salvar no Redis (principal)
-            if self.redis_client:
-                try:
-                    serialized_data = json.dumps(memory_data, ensure_ascii=False, indent=2)
-                    self.redis_client.setex(memory_key, self.default_timeout, serialized_data)
-                    logger.info(f"Produto {product_identifier} salvo na memória Redis")
-                except Exception as e:
-                    logger.error(f"Erro ao salvar no Redis: {e}")
-            
-            # Salvar no cache Django (acesso rápido)
-            cache.set(memory_key, memory_data, timeout=3600)  # 1 hora no cache Django
-            
-            # Backup local em arquivo
-            try:
-                file_path = self._get_product_file_path(product_identifier)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(memory_data, f, ensure_ascii=False, indent=2)
-                logger.debug(f"Backup local salvo: {file_path}")
-            except Exception as e:
-                logger.warning(f"Erro ao salvar backup local: {e}")
-            
+            self._persist_records([
+                self._build_record(product_identifier, product_data, generated_content, existing_data, origin, status)
+            ])
             return True
             
         except Exception as e:
             logger.error(f"Erro ao salvar dados do produto {product_identifier}: {e}")
             return False
     
+    def _build_record(self, product_identifier: str, product_data: Dict[str, Any],
+                      generated_content: Dict[str, Any], existing_data: Optional[Dict[str, Any]],
+                      origin: str, status: str, current_time: Optional[str] = None,
+                      source_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Monta o registro salvo na memória (criação, origem e validação são preservadas na atualização).
+        """
+        current_time = current_time or datetime.now().isoformat()
+        existing_data = existing_data or {}
+        record = {
+            'product_identifier': product_identifier,
+            'product_data': product_data,
+            'generated_content': generated_content,
+            'created_at': existing_data.get('created_at', current_time),
+            'updated_at': current_time,
+            'origin': existing_data.get('origin', origin),
+            'status': existing_data.get('status', status),
+            'validated_at': existing_data.get('validated_at'),
+            'data_quality_score': self._calculate_quality_score(product_data, generated_content),
+            'version': '1.0'
+        }
+        if source_hash:
+            record['source_hash'] = source_hash
+        return record
+    
+    def source_hash(self, product_data: Dict[str, Any]) -> str:
+        """
+        Impressão digital dos dados de origem de um produto (campos mapeados da linha importada).
+        """
+        canonical = json.dumps(product_data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def _load_source_hashes(self, product_identifiers: List[str]) -> Dict[str, str]:
+        """
+        Lê do banco só as impressões digitais dos produtos, sem decodificar os payloads.
+        
+        Returns:
+            Dicionário identificador -> hash (vazio para registros sem hash);
+            sem banco, dicionário vazio
+        """
+        if not self.db_enabled or not product_identifiers:
+            return {}
+        keys = {
+            self._memory_hash(self._generate_product_key(identifier)): identifier
+            for identifier in product_identifiers
+        }
+        try:
+            rows = RememberedProduct.objects.filter(memory_key__in=list(keys)).values_list('memory_key', 'source_hash')
+            return {keys[key_hash]: source_hash for key_hash, source_hash in rows}
+        except Exception as e:
+            logger.warning(f"Erro ao ler impressões digitais da memória: {e}")
+            return {}
+    
+    def get_many_product_data(self, product_identifiers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Lê vários produtos de uma vez, sem uma ida ao armazenamento por produto.
+        
+        Consulta a camada durável (banco, ou Redis em um MGET) e o backup local
+        para as chaves que faltarem. O conteúdo gerado não é resolvido: os
+        registros trazem apenas a referência ao blob.
+        
+        Args:
+            product_identifiers: Identificadores dos produtos
+        
+        Returns:
+            Dicionário identificador -> registro salvo, apenas para os encontrados
+        """
+        keys = {identifier: self._generate_product_key(identifier) for identifier in product_identifiers}
+        memory_keys = list(set(keys.values()))
+        
+        found = self._load_stored_records(memory_keys)
+        missing = [memory_key for memory_key in memory_keys if memory_key not in found]
+        if missing:
+            try:
+                found.update(self.backup_store.get_many('records', missing))
+            except Exception as e:
+                logger.warning(f"Erro ao ler backup local: {e}")
+        
+        return {identifier: found[memory_key] for identifier, memory_key in keys.items() if memory_key in found}
+    
+    def save_products_bulk(self, products: List[Tuple[str, Dict[str, Any], Dict[str, Any]]],
+                           force_update: bool = False, origin: str = 'manual', status: str = 'pending',
+                           batch_size: int = 500) -> Dict[str, int]:
+        """
+        Salva vários produtos com upserts em lote, gravando só o que mudou.
+        
+        Cada produto recebe a impressão digital dos seus dados (source_hash),
+        comparada em lote com a dos registros salvos: produtos iguais não
+        são regravados, nem com force_update. Um produto alterado é
+        atualizado se veio da mesma origem (a reimportação de um catálogo é
+        dona dos seus registros) ou com force_update; os de outra origem são
+        ignorados. No banco, a comparação lê só os hashes; os registros
+        completos são lidos apenas para os produtos novos ou alterados.
+        
+        Args:
+            products: Tuplas (identificador, dados do produto, conteúdo gerado)
+            force_update: Se True, sobrescreve produtos alterados de qualquer origem
+            origin: Origem dos produtos novos
+            status: Status dos produtos novos
+            batch_size: Registros por lote de gravação
+        
+        Returns:
+            Contagens de importados (novos), atualizados (alterados), inalterados
+            e ignorados (alterados, mas de outra origem)
+        """
+        stored_hashes = self._load_source_hashes([identifier for identifier, _, _ in products])
+        current_time = datetime.now().isoformat()
+        result = {'imported': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        
+        candidates = []
+        for identifier, product_data, generated_content in products:
+            row_hash = self.source_hash(product_data)
+            if stored_hashes.get(identifier) == row_hash:
+                result['unchanged'] += 1
+                continue
+            candidates.append((identifier, product_data, generated_content, row_hash))
+        
+        existing = self.get_many_product_data([identifier for identifier, _, _, _ in candidates])
+        records = []
+        for identifier, product_data, generated_content, row_hash in candidates:
+            existing_data = existing.get(identifier)
+            if existing_data:
+                # Registros anteriores à impressão digital: hash calculado dos dados salvos
+                stored_hash = existing_data.get('source_hash') or self.source_hash(existing_data.get('product_data') or {})
+                if stored_hash == row_hash:
+                    result['unchanged'] += 1
+                    continue
+                if not force_update and existing_data.get('origin') != origin:
+                    result['skipped'] += 1
+                    continue
+            records.append(self._build_record(
+                identifier, product_data, generated_content, existing_data, origin, status, current_time,
+                source_hash=row_hash
+            ))
+            result['updated' if existing_data else 'imported'] += 1
+        
+        for start in range(0, len(records), batch_size):
+            self._persist_records(records[start:start + batch_size])
+        
+        return result
+    
     def get_product_data(self, product_identifier: str) -> Optional[Dict[str, Any]]:
         """
         Recupera os dados do produto da memória.
@@ -153,9 +699,21 @@ class ProductMemory:
         try:
             memory_key = self._generate_product_key(product_identifier)
             
-            # Tentar primeiro o cache Django (mais rápido)
+            # Tentar primeiro o cache L1 do processo (sem I/O)
+            local_data = self.local_cache.get(memory_key)
+            if local_data:
+                logger.debug(f"Produto {product_identifier} encontrado no cache L1")
+                return local_data
+            
+            # Produto sabidamente ausente: nenhum I/O
+            if self._is_definitely_absent(memory_key, product_identifier):
+                logger.debug(f"Produto {product_identifier} ausente (cache negativo)")
+                return None
+            
+            # Tentar o cache Django
             cached_data = cache.get(memory_key)
             if cached_data:
+                self.local_cache.set(memory_key, cached_data)
                 logger.debug(f"Produto {product_identifier} encontrado no cache Django")
                 return cached_data
             
@@ -164,30 +722,55 @@ class ProductMemory:
                 try:
                     redis_data = self.redis_client.get(memory_key)
                     if redis_data:
-                        result = json.loads(redis_data.decode('utf-8'))
-                        # Replicar no cache Django para próximas consultas
-                        cache.set(memory_key, result, timeout=3600)
+                        result = self.blob_store.resolve([json.loads(redis_data.decode('utf-8'))])[0]
+                        # Replicar no cache Django e no L1 para próximas consultas
+                        cache.set(memory_key, result, timeout=self.cache_timeout)
+                        self.local_cache.set(memory_key, result)
                         logger.debug(f"Produto {product_identifier} encontrado no Redis")
                         return result
                 except Exception as e:
                     logger.warning(f"Erro ao recuperar do Redis: {e}")
             
+            # Tentar o banco de dados (camada durável)
+            if self.db_enabled:
+                try:
+                    db_data = RememberedProduct.objects.filter(
+                        memory_key=self._memory_hash(memory_key)
+                    ).values_list('payload', flat=True).first()
+                    if db_data:
+                        db_data = self.blob_store.resolve([db_data])[0]
+                        self._fill_caches(memory_key, db_data)
+                        logger.debug(f"Produto {product_identifier} encontrado no banco de dados")
+                        return db_data
+                except Exception as e:
+                    logger.warning(f"Erro ao recuperar do banco de dados: {e}")
+            
             # Tentar backup local
             try:
-                file_path = self._get_product_file_path(product_identifier)
-                if os.path.exists(file_path):
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        result = json.load(f)
-                    # Replicar nos caches
-                    cache.set(memory_key, result, timeout=3600)
-                    if self.redis_client:
-                        serialized_data = json.dumps(result, ensure_ascii=False)
-                        self.redis_client.setex(memory_key, self.default_timeout, serialized_data)
+                stored_data = self.backup_store.get('records', memory_key)
+                if stored_data:
+                    result = self.blob_store.resolve([stored_data])[0]
+                    if self.db_enabled:
+                        # Backup anterior ao banco: migrar para a camada durável
+                        self._persist_records([result])
+                    else:
+                        self._fill_caches(memory_key, result)
                     logger.debug(f"Produto {product_identifier} encontrado no backup local")
                     return result
+                
+                # Arquivo JSON do formato antigo: migrar para o backup atual
+                result = self._read_legacy_backup(product_identifier)
+                if result:
+                    self._persist_records([result])
+                    os.remove(self._get_product_file_path(product_identifier))
+                    logger.debug(f"Produto {product_identifier} migrado do backup em arquivo")
+                    return result
             except Exception as e:
                 logger.warning(f"Erro ao recuperar backup local: {e}")
             
+            # Lembrar a ausência por pouco tempo (invalidado ao salvar)
+            self.local_cache.set(self._negative_key(memory_key), True, timeout=self.negative_timeout)
+            
             logger.debug(f"Produto {product_identifier} não encontrado na memória")
             return None
             
@@ -195,6 +778,84 @@ class ProductMemory:
             logger.error(f"Erro ao recuperar dados do produto {product_identifier}: {e}")
             return None
     
+    def _read_legacy_backup(self, product_identifier: str) -> Optional[Dict[str, Any]]:
+        """
+        Lê o arquivo de backup do formato antigo, se ainda existir.
+        
+        Nomes de arquivo eram truncados em 50 caracteres, então o arquivo pode
+        pertencer a outro produto: só é aceito se o identificador bater.
+        """
+        file_path = self._get_product_file_path(product_identifier)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        stored_identifier = record.setdefault('product_identifier', product_identifier)
+        if str(stored_identifier).strip().lower() != str(product_identifier).strip().lower():
+            return None
+        return self.blob_store.resolve([record])[0]
+    
+    def migrate_legacy_backups(self, progress_callback: Optional[Callable[[int], None]] = None,
+                               batch_size: int = 500) -> int:
+        """
+        Move para o backup SQLite os arquivos JSON do formato antigo
+        (memory/produtos/ e memory/conteudos/), removendo cada arquivo migrado.
+        
+        Os arquivos são lidos em um pool de threads; os registros vão direto
+        para o backup, sem passar pelo Redis ou pelo banco.
+        
+        Args:
+            progress_callback: Chamada com o total de arquivos migrados após cada lote
+            batch_size: Arquivos por lote
+        
+        Returns:
+            Número de arquivos migrados
+        """
+        def read(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return path, json.load(f)
+            except Exception as e:
+                logger.warning(f"Erro ao ler backup antigo {path}: {e}")
+                return path, None
+        
+        migrated = 0
+        legacy_dirs = (
+            ('records', self.memory_dir),
+            ('blobs', self.blob_store.legacy_blob_dir)
+        )
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for table, directory in legacy_dirs:
+                if not os.path.exists(directory):
+                    continue
+                paths = [entry.path for entry in os.scandir(directory) if entry.name.endswith('.json')]
+                for start in range(0, len(paths), batch_size):
+                    items = {}
+                    loaded_paths = []
+                    for path, data in executor.map(read, paths[start:start + batch_size]):
+                        if not data:
+                            continue
+                        if table == 'records':
+                            if not data.get('product_identifier'):
+                                continue
+                            key = self._generate_product_key(data['product_identifier'])
+                        else:
+                            key = os.path.basename(path)[:-5]
+                        items[key] = data
+                        loaded_paths.append(path)
+                    self.backup_store.put_many(table, items)
+                    self.backup_store.flush()
+                    for path in loaded_paths:
+                        os.remove(path)
+                    migrated += len(loaded_paths)
+                    if progress_callback:
+                        progress_callback(migrated)
+        
+        # Membros "arquivo:" do filtro de Bloom deixam de existir
+        self._membership_built_at = 0.0
+        logger.info(f"{migrated} arquivos de backup migrados para {self.backup_store.path}")
+        return migrated
+    
     def has_product(self, product_identifier: str) -> bool:
         """
         Verifica se o produto existe na memória.
@@ -219,19 +880,31 @@ class ProductMemory:
         """
         try:
             memory_key = self._generate_product_key(product_identifier)
+            previous_records = self._load_stored_records([memory_key])
+            
+            # Remover do cache L1 (local e dos outros processos)
+            self.local_cache.invalidate(memory_key)
             
             # Remover do cache Django
             cache.delete(memory_key)
             
-            # Remover do Redis
+            # Remover do Redis (UNLINK libera a memória em segundo plano)
             if self.redis_client:
-                self.redis_client.delete(memory_key)
+                self.redis_client.unlink(memory_key)
+            
+            # Remover do banco de dados
+            if self.db_enabled:
+                RememberedProduct.objects.filter(memory_key=self._memory_hash(memory_key)).delete()
             
-            # Remover backup local
+            self.blob_store.adjust_references(self.blob_store.reference_deltas(previous_records, {memory_key: None}))
+            if self.redis_client:
+                self._update_stat_counters(self.blob_store.resolve_map(previous_records), {memory_key: None})
+            
+            # Remover backup local (e o arquivo do formato antigo, se for deste produto)
             try:
-                file_path = self._get_product_file_path(product_identifier)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                self.backup_store.delete('records', memory_key)
+                if self._read_legacy_backup(product_identifier):
+                    os.remove(self._get_product_file_path(product_identifier))
             except Exception as e:
                 logger.warning(f"Erro ao remover backup local: {e}")
             
@@ -242,33 +915,60 @@ class ProductMemory:
             logger.error(f"Erro ao remover produto {product_identifier}: {e}")
             return False
     
-    def clear_all_memory(self) -> bool:
+    def clear_all_memory(self, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
         """
         Limpa toda a memória de produtos.
         
+        Pensado para rodar em segundo plano (clear_product_memory_task): as
+        chaves do Redis são removidas com SCAN + UNLINK em lotes e os backups
+        locais em um pool de threads, com progresso reportado a cada lote.
+        
+        Args:
+            progress_callback: Chamada com {'step', 'redis_keys_removed', 'files_removed'}
+        
         Returns:
             True se limpou com sucesso, False caso contrário
         """
+        progress = {'step': 'redis', 'redis_keys_removed': 0, 'files_removed': 0}
+        
+        def report(**changes):
+            progress.update(changes)
+            if progress_callback:
+                progress_callback(dict(progress))
+        
         try:
             # Limpar Redis
             if self.redis_client:
-                pattern = f"{self.memory_prefix}:*"
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
+                unlink_by_pattern(
+                    self.redis_client, f"{self.memory_prefix}:*",
+                    progress_callback=lambda removed: report(redis_keys_removed=removed)
+                )
+                self.redis_client.unlink(self.stats_key)
             
-            # Limpar cache Django
-            # Note: Django cache não tem clear por padrão, então vamos limpar individualmente
+            # Limpar cache Django (django-redis também faz SCAN em lotes)
+            if hasattr(cache, 'delete_pattern'):
+                cache.delete_pattern(f"{self.memory_prefix}:*")
             
-            # Limpar backups locais
+            # Limpar banco de dados
+            report(step='database')
+            if self.db_enabled:
+                RememberedProduct.objects.all().delete()
+            
+            # Conteúdo gerado compartilhado (banco, Redis e arquivos)
+            self.blob_store.clear()
+            
+            # Limpar cache L1 de todos os processos
+            self.local_cache.invalidate_all()
+            
+            # Limpar backups locais (SQLite e arquivos do formato antigo)
+            report(step='files')
             try:
-                if os.path.exists(self.memory_dir):
-                    for filename in os.listdir(self.memory_dir):
-                        if filename.endswith('.json'):
-                            os.remove(os.path.join(self.memory_dir, filename))
+                self.backup_store.clear('records')
+                self._remove_backup_files(lambda removed: report(files_removed=removed))
             except Exception as e:
                 logger.warning(f"Erro ao limpar backups locais: {e}")
             
+            report(step='done')
             logger.info("Memória de produtos limpa com sucesso")
             return True
             
@@ -276,35 +976,91 @@ class ProductMemory:
             logger.error(f"Erro ao limpar memória de produtos: {e}")
             return False
     
-    def get_memory_stats(self) -> Dict[str, Any]:
+    def _remove_backup_files(self, progress_callback: Callable[[int], None], batch_size: int = 1000):
+        """
+        Remove os arquivos de backup do formato antigo em um pool de threads, em lotes.
+        """
+        if not os.path.exists(self.memory_dir):
+            return
+        
+        def remove(path):
+            try:
+                os.remove(path)
+                return 1
+            except FileNotFoundError:
+                return 0
+        
+        removed = 0
+        with ThreadPoolExecutor(max_workers=8) as executor, os.scandir(self.memory_dir) as entries:
+            batch = []
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    batch.append(entry.path)
+                if len(batch) >= batch_size:
+                    removed += sum(executor.map(remove, batch))
+                    batch = []
+                    progress_callback(removed)
+            if batch:
+                removed += sum(executor.map(remove, batch))
+                progress_callback(removed)
+    
+    def get_memory_stats(self, detailed: bool = False) -> Dict[str, Any]:
         """
         Retorna estatísticas da memória de produtos.
         
+        Args:
+            detailed: Se True, conta os produtos em cada camada (Redis, banco e
+                backups locais). A contagem percorre as chaves e arquivos, por
+                isso fica restrita a diagnósticos (health check e comando).
+        
         Returns:
             Dicionário com estatísticas
         """
         try:
             stats = {
-                'redis_products': 0,
-                'local_backups': 0,
                 'memory_dir': self.memory_dir,
-                'redis_connected': self.redis_client is not None
+                'backup_path': self.backup_store.path,
+                'redis_connected': self.redis_client is not None,
+                'database_enabled': self.db_enabled,
+                'local_cache': self.local_cache.get_stats(),
+                'negative_cache': {
+                    'negative_hits': self.negative_hits,
+                    'bloom_rejections': self.bloom_rejections,
+                    'bloom_members': self._membership_filter.count if self._membership_filter else 0
+                }
             }
             
-            # Contar produtos no Redis
+            if not detailed:
+                return stats
+            
+            stats.update({'redis_products': 0, 'database_products': 0, 'local_backups': 0, 'content_blobs': 0})
+            
+            # Contar produtos no Redis (SCAN em lotes, sem bloquear o servidor como KEYS)
             if self.redis_client:
                 try:
                     pattern = f"{self.memory_prefix}:*"
-                    keys = self.redis_client.keys(pattern)
-                    stats['redis_products'] = len(keys)
+                    stats['redis_products'] = sum(1 for _ in self.redis_client.scan_iter(match=pattern, count=1000))
                 except Exception as e:
                     logger.warning(f"Erro ao contar produtos no Redis: {e}")
             
-            # Contar backups locais
+            # Contar produtos no banco de dados
+            if self.db_enabled:
+                try:
+                    stats['database_products'] = RememberedProduct.objects.count()
+                except Exception as e:
+                    logger.warning(f"Erro ao contar produtos no banco de dados: {e}")
+            
+            # Contar blobs de conteúdo gerado (compartilhados entre SKUs)
             try:
+                stats['content_blobs'] = self.blob_store.count()
+            except Exception as e:
+                logger.warning(f"Erro ao contar blobs de conteúdo gerado: {e}")
+            
+            # Contar backups locais (e arquivos do formato antigo ainda não migrados)
+            try:
+                stats['local_backups'] = self.backup_store.count('records')
                 if os.path.exists(self.memory_dir):
-                    json_files = [f for f in os.listdir(self.memory_dir) if f.endswith('.json')]
-                    stats['local_backups'] = len(json_files)
+                    stats['legacy_backup_files'] = sum(1 for f in os.listdir(self.memory_dir) if f.endswith('.json'))
             except Exception as e:
                 logger.warning(f"Erro ao contar backups locais: {e}")
             
@@ -370,37 +1126,513 @@ class ProductMemory:
             product_data['validated_at'] = datetime.now().isoformat()
             product_data['updated_at'] = datetime.now().isoformat()
             
-            # Salvar de volta
-            memory_key = self._generate_product_key(product_identifier)
-            data_json = json.dumps(product_data, ensure_ascii=False)
+            # Salvar de volta em todas as camadas
+            product_data.setdefault('product_identifier', product_identifier)
+            self._persist_records([product_data])
             
-            # Salvar no Redis
-            if self.redis_client:
-                self.redis_client.setex(memory_key, self.redis_ttl, data_json)
+            logger.info(f"Produto {product_identifier} validado com sucesso")
+            return True
             
-            # Salvar no cache Django
-            cache.set(memory_key, product_data, timeout=self.cache_timeout)
+        except Exception as e:
+            logger.error(f"Erro ao validar produto {product_identifier}: {e}")
+            return False
+    
+    def _build_summary(self, identifier: str, fields: Dict[str, Any], created_at: Optional[str],
+                       updated_at: Optional[str], validated_at: Optional[str]) -> Dict[str, Any]:
+        return {
+            'id': identifier,
+            'identifier': identifier,
+            'name': fields['title'] or fields['name'] or identifier or 'Produto sem nome',
+            'sku': fields['sku'],
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'origin': fields['origin'],
+            'status': fields['status'],
+            'validated_at': validated_at,
+            'data_quality_score': fields['data_quality_score'],
+            'has_title': fields['has_title'],
+            'has_description': fields['has_description'],
+            'has_bullet_points': fields['has_bullet_points'],
+            'has_keywords': fields['has_keywords'],
+            'original_data_keys': fields['original_data_keys'],
+            'generated_content_keys': fields['generated_content_keys']
+        }
+    
+    def _summarize_record(self, product_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extrai o resumo de listagem de um registro completo da memória.
+        """
+        return self._build_summary(
+            product_data.get('product_identifier'),
+            self._enrichment_fields(product_data),
+            product_data.get('created_at'),
+            product_data.get('updated_at'),
+            product_data.get('validated_at')
+        )
+    
+    def _format_timestamp(self, value: Optional[datetime]) -> Optional[str]:
+        # Mesmo formato dos registros (horário local sem fuso)
+        if value is None:
+            return None
+        return timezone.localtime(value).replace(tzinfo=None).isoformat()
+    
+    def _row_to_summary(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Monta o resumo de listagem direto das colunas do índice (sem ler o payload).
+        """
+        return self._build_summary(
+            row['product_identifier'],
+            row,
+            self._format_timestamp(row['created_at']),
+            self._format_timestamp(row['updated_at']),
+            self._format_timestamp(row['validated_at'])
+        )
+    
+    def _date_lookup(self, operator: str, value: str) -> Dict[str, Any]:
+        # Datas sem horário (YYYY-MM-DD) comparam o dia inteiro
+        if len(value) == 10:
+            return {f'created_at__date__{operator}': date.fromisoformat(value)}
+        parsed = self._parse_timestamp(value)
+        if parsed is None:
+            raise ValueError(f"Data inválida: {value}")
+        return {f'created_at__{operator}': parsed}
+    
+    def _prefix_condition(self, term: str) -> Q:
+        # Prefixo de qualquer palavra do texto indexado
+        return Q(search_text__startswith=term) | Q(search_text__contains=f" {term}")
+    
+    def _filtered_queryset(self, search: str = '', status: str = 'all', origin: str = 'all',
+                           date_from: str = '', date_to: str = '', search_mode: str = 'substring'):
+        """
+        Monta a consulta indexada do histórico a partir dos filtros.
+        """
+        queryset = RememberedProduct.objects.all()
+        
+        # Busca por trecho ou prefixo (índice trigram no PostgreSQL atende LIKE '%termo%')
+        term = search.strip().lower() if search else ''
+        if term:
+            if search_mode == 'prefix':
+                queryset = queryset.filter(self._prefix_condition(term))
+            else:
+                queryset = queryset.filter(search_text__contains=term)
+        
+        if status and status != 'all':
+            queryset = queryset.filter(status=status)
+        
+        if origin and origin != 'all':
+            queryset = queryset.filter(origin=origin)
+        
+        for operator, value in (('gte', date_from), ('lte', date_to)):
+            if not value:
+                continue
+            try:
+                queryset = queryset.filter(**self._date_lookup(operator, value))
+            except ValueError as e:
+                logger.warning(f"Erro ao aplicar filtro de data {value}: {e}")
+        
+        return queryset
+    
+    def _rank_search(self, queryset, search: str):
+        """
+        Ordena resultados de busca por relevância.
+        
+        Prefixos vêm primeiro; no PostgreSQL, em seguida, a similaridade
+        trigram com o termo. Empates seguem a ordem cronológica do histórico.
+        """
+        term = search.strip().lower()
+        queryset = queryset.annotate(
+            search_prefix_rank=Case(
+                When(self._prefix_condition(term), then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+        ordering = ['-search_prefix_rank']
+        
+        if connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import TrigramSimilarity
+            queryset = queryset.annotate(search_similarity=TrigramSimilarity('search_text', term))
+            ordering.append('-search_similarity')
+        
+        return queryset.order_by(*ordering, '-created_at', '-product_identifier')
+    
+    def _scan_redis_records(self) -> List[Dict[str, Any]]:
+        """
+        Lê todos os registros do Redis (modo legado, sem banco de dados).
+        """
+        records = []
+        if not self.redis_client:
+            return records
+        
+        try:
+            for key in self.redis_client.scan_iter(match=f"{self.memory_prefix}:*", count=1000):
+                try:
+                    data = self.redis_client.get(key)
+                    if data:
+                        records.append(json.loads(data.decode('utf-8')))
+                except Exception as e:
+                    logger.warning(f"Erro ao processar produto {key}: {e}")
+                    continue
+        except Exception as e:
+            logger.warning(f"Erro ao listar produtos do Redis: {e}")
+        
+        return self.blob_store.resolve(records)
+    
+    def query_products(self, search: str = '', status: str = 'all', origin: str = 'all',
+                       date_from: str = '', date_to: str = '', offset: int = 0,
+                       limit: int = 20, search_mode: str = 'substring',
+                       summary: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Consulta registros completos da memória com filtros e paginação.
+        
+        Com o banco habilitado é uma consulta SQL indexada que lê apenas a
+        página pedida (buscas ordenadas por relevância); sem banco, recai na
+        varredura do Redis.
+        
+        Args:
+            search: Termo de busca (nome, SKU, título gerado ou identificador)
+            status: Filtro por status ('all', 'validated', 'pending')
+            origin: Filtro por origem ('all', 'spreadsheet', 'manual', 'link_extraction')
+            date_from: Data inicial (formato ISO)
+            date_to: Data final (formato ISO)
+            offset: Quantidade de registros a pular
+            limit: Número máximo de registros retornados
+            search_mode: 'substring' (trecho em qualquer posição) ou 'prefix' (início de palavra)
+            summary: Se True, retorna resumos lidos só das colunas do índice
+        
+        Returns:
+            Tupla (registros ou resumos da página, total de registros filtrados)
+        """
+        if self.db_enabled:
+            queryset = self._filtered_queryset(search, status, origin, date_from, date_to, search_mode)
+            total_items = self._count_filtered(queryset, search, status, origin, date_from, date_to)
+            if search and search.strip():
+                queryset = self._rank_search(queryset, search)
+            else:
+                queryset = queryset.order_by('-created_at', '-product_identifier')
+            if summary:
+                rows = queryset.values(*self.summary_columns)[offset:offset + limit]
+                return [self._row_to_summary(row) for row in rows], total_items
+            records = list(queryset.values_list('payload', flat=True)[offset:offset + limit])
+            return self.blob_store.resolve(records), total_items
+        
+        matched = self._scan_filtered_records(search, status, origin, date_from, date_to, search_mode)
+        page = matched[offset:offset + limit]
+        if summary:
+            page = [self._summarize_record(record) for record in page]
+        return page, len(matched)
+    
+    def _scan_filtered_records(self, search: str, status: str, origin: str, date_from: str,
+                               date_to: str, search_mode: str) -> List[Dict[str, Any]]:
+        """
+        Filtra e ordena (mais recentes primeiro) os registros do Redis (modo legado).
+        """
+        pairs = [(self._summarize_record(record), record) for record in self._scan_redis_records()]
+        kept = {id(summary) for summary in self._apply_filters(
+            [summary for summary, _ in pairs], search, status, origin, date_from, date_to, search_mode
+        )}
+        matched = [record for summary, record in pairs if id(summary) in kept]
+        matched.sort(key=self._record_sort_key, reverse=True)
+        return matched
+    
+    def _record_sort_key(self, record: Dict[str, Any]) -> Tuple[str, str]:
+        return (record.get('created_at') or '', str(record.get('product_identifier') or ''))
+    
+    def _count_filtered(self, queryset, search: str, status: str, origin: str,
+                        date_from: str, date_to: str) -> int:
+        """
+        Total de registros filtrados, lido dos contadores sempre que possível.
+        
+        Sem filtros, ou com apenas status ou apenas origem, o total sai do hash
+        de estatísticas (O(1)); combinações de filtros recorrem ao COUNT indexado.
+        """
+        status_filtered = bool(status and status != 'all')
+        origin_filtered = bool(origin and origin != 'all')
+        if self.redis_client and not search and not date_from and not date_to \
+                and not (status_filtered and origin_filtered):
+            statistics = self.get_statistics()
+            if status_filtered:
+                return statistics['by_status'].get(status, 0)
+            if origin_filtered:
+                return statistics['by_origin'].get(origin, 0)
+            return statistics['total_products']
+        return queryset.count()
+    
+    summary_columns = (
+        'product_identifier', 'name', 'title', 'sku', 'status', 'origin', 'data_quality_score',
+        'has_title', 'has_description', 'has_bullet_points', 'has_keywords',
+        'original_data_keys', 'generated_content_keys', 'created_at', 'updated_at', 'validated_at'
+    )
+    
+    def _keyset_condition(self, created_at: datetime, identifier: str, operator: str) -> Q:
+        # Linhas antes ('lt') ou depois ('gt') da posição (created_at, identificador)
+        return (
+            Q(**{f'created_at__{operator}': created_at}) |
+            Q(created_at=created_at, **{f'product_identifier__{operator}': identifier})
+        )
+    
+    def iter_record_batches(self, batch_size: int = 500,
+                            limit: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Percorre todos os registros da memória em lotes, com memória constante.
+        
+        No banco, cada lote é uma consulta keyset sobre o índice
+        (created_at, identificador); no modo legado, as chaves vêm do SCAN do
+        Redis e os registros de cada lote são lidos com um único MGET.
+        
+        Args:
+            batch_size: Número de registros por lote
+            limit: Número máximo de registros (None para todos)
+        
+        Yields:
+            Listas de registros completos
+        """
+        remaining = limit if limit is not None else float('inf')
+        
+        if self.db_enabled:
+            queryset = RememberedProduct.objects.order_by('-created_at', '-product_identifier')
+            position = None
+            while remaining > 0:
+                page = queryset.filter(self._keyset_condition(*position, 'lt')) if position else queryset
+                rows = list(page.values_list('created_at', 'product_identifier', 'payload')[:int(min(batch_size, remaining))])
+                if not rows:
+                    return
+                remaining -= len(rows)
+                position = rows[-1][:2]
+                yield self.blob_store.resolve([payload for _, _, payload in rows])
+            return
+        
+        if not self.redis_client:
+            return
+        
+        keys = []
+        for key in self.redis_client.scan_iter(match=f"{self.memory_prefix}:*", count=batch_size):
+            keys.append(key)
+            if len(keys) >= min(batch_size, remaining):
+                batch = self._read_redis_batch(keys)
+                keys = []
+                remaining -= len(batch)
+                yield batch
+                if remaining <= 0:
+                    return
+        if keys:
+            yield self._read_redis_batch(keys)
+    
+    def _read_redis_batch(self, keys: List[bytes]) -> List[Dict[str, Any]]:
+        records = []
+        for key, data in zip(keys, self.redis_client.mget(keys)):
+            if not data:
+                continue
+            try:
+                records.append(json.loads(data.decode('utf-8')))
+            except Exception as e:
+                logger.warning(f"Erro ao processar produto {key}: {e}")
+        return self.blob_store.resolve(records)
+    
+    def _encode_cursor(self, position: Tuple[str, str], direction: str) -> str:
+        created_at, identifier = position
+        payload = json.dumps({'c': created_at, 'i': identifier, 'd': direction}, ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    def _decode_cursor(self, cursor: str) -> Tuple[str, str, str]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            direction = payload['d']
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            return payload['c'], payload['i'], direction
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Cursor inválido: {cursor}") from e
+    
+    def query_products_page(self, cursor: str = '', limit: int = 20, search: str = '',
+                            status: str = 'all', origin: str = 'all', date_from: str = '',
+                            date_to: str = '', search_mode: str = 'substring',
+                            summary: bool = False) -> Dict[str, Any]:
+        """
+        Pagina a memória por cursor (keyset) sobre (created_at, identificador).
+        
+        Cada página custa o mesmo independentemente da profundidade: a consulta
+        parte da posição do cursor no índice em vez de pular registros. A ordem
+        é sempre cronológica (mais recentes primeiro), inclusive em buscas.
+        
+        Args:
+            cursor: Cursor opaco recebido em next_cursor/prev_cursor ('' para a primeira página)
+            limit: Número de registros por página
+            search, status, origin, date_from, date_to, search_mode: Mesmos filtros de query_products
+            summary: Se True, retorna resumos lidos só das colunas do índice
+        
+        Returns:
+            Dicionário com records, next_cursor, prev_cursor e total_items
+        
+        Raises:
+            ValueError: Se o cursor for inválido
+        """
+        position = self._decode_cursor(cursor) if cursor else None
+        backwards = position is not None and position[2] == 'prev'
+        
+        if self.db_enabled:
+            queryset = self._filtered_queryset(search, status, origin, date_from, date_to, search_mode)
+            total_items = self._count_filtered(queryset, search, status, origin, date_from, date_to)
             
-            # Salvar backup local
+            if position:
+                created_at = self._parse_timestamp(position[0])
+                if created_at is None:
+                    raise ValueError(f"Cursor inválido: {cursor}")
+                queryset = queryset.filter(
+                    self._keyset_condition(created_at, position[1], 'gt' if backwards else 'lt')
+                )
+            
+            ordering = ('created_at', 'product_identifier') if backwards else ('-created_at', '-product_identifier')
+            queryset = queryset.order_by(*ordering)
+            if summary:
+                entries = [
+                    ((row['created_at'].isoformat(), row['product_identifier']), self._row_to_summary(row))
+                    for row in queryset.values(*self.summary_columns)[:limit + 1]
+                ]
+            else:
+                rows = list(queryset.values_list('created_at', 'product_identifier', 'payload')[:limit + 1])
+                payloads = self.blob_store.resolve([payload for _, _, payload in rows])
+                entries = [
+                    ((created_at.isoformat(), identifier), payload)
+                    for (created_at, identifier, _), payload in zip(rows, payloads)
+                ]
+        else:
+            matched = self._scan_filtered_records(search, status, origin, date_from, date_to, search_mode)
+            total_items = len(matched)
+            
+            entries = [
+                (self._record_sort_key(record), self._summarize_record(record) if summary else record)
+                for record in matched
+            ]
+            if backwards:
+                entries = [entry for entry in reversed(entries) if entry[0] > position[:2]]
+            elif position:
+                entries = [entry for entry in entries if entry[0] < position[:2]]
+            entries = entries[:limit + 1]
+        
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        if backwards:
+            entries.reverse()
+        
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else position is not None
+        
+        return {
+            'records': [record for _, record in entries],
+            'next_cursor': self._encode_cursor(entries[-1][0], 'next') if entries and has_next else None,
+            'prev_cursor': self._encode_cursor(entries[0][0], 'prev') if entries and has_previous else None,
+            'total_items': total_items
+        }
+    
+    def _aggregate_statistics(self) -> Dict[str, float]:
+        """
+        Recalcula os contadores das estatísticas a partir da camada durável.
+        """
+        if self.db_enabled:
+            queryset = RememberedProduct.objects.order_by()
+            totals = queryset.aggregate(
+                total=Count('id'),
+                quality_sum=Sum('data_quality_score'),
+                with_title=Count('id', filter=Q(has_title=True)),
+                with_description=Count('id', filter=Q(has_description=True)),
+                with_bullet_points=Count('id', filter=Q(has_bullet_points=True))
+            )
+            counters = {field: value or 0 for field, value in totals.items()}
+            for status, total in queryset.values_list('status').annotate(total=Count('id')):
+                counters[f"status:{status}"] = total
+            for origin, total in queryset.values_list('origin').annotate(total=Count('id')):
+                counters[f"origin:{origin}"] = total
+            return counters
+        
+        counters: Dict[str, float] = {}
+        for record in self._scan_redis_records():
+            for field, value in self._stat_fields(record).items():
+                counters[field] = counters.get(field, 0) + value
+        return counters
+    
+    def _format_statistics(self, counters: Dict[str, float]) -> Dict[str, Any]:
+        total_products = int(counters.get('total', 0))
+        by_status = {}
+        by_origin = {}
+        for field, value in counters.items():
+            prefix, _, name = field.partition(':')
+            if prefix == 'status' and int(value) > 0:
+                by_status[name] = int(value)
+            elif prefix == 'origin' and int(value) > 0:
+                by_origin[name] = int(value)
+        
+        average_quality = float(counters.get('quality_sum', 0)) / total_products if total_products > 0 else 0
+        
+        return {
+            'total_products': total_products,
+            'by_status': by_status,
+            'by_origin': by_origin,
+            'average_quality_score': round(average_quality, 1),
+            'products_with_title': int(counters.get('with_title', 0)),
+            'products_with_description': int(counters.get('with_description', 0)),
+            'products_with_bullet_points': int(counters.get('with_bullet_points', 0))
+        }
+    
+    def reconcile_statistics(self) -> Dict[str, Any]:
+        """
+        Recalcula os contadores das estatísticas e corrige desvios no Redis.
+        
+        Executada periodicamente (reconcile_memory_statistics_task) e quando
+        o hash de contadores não tem o campo de reconciliação (ainda não
+        existe ou foi recriado só com incrementos após um restart do Redis).
+        
+        Returns:
+            Estatísticas recalculadas
+        """
+        counters = self._aggregate_statistics()
+        
+        if self.redis_client:
             try:
-                file_path = self._get_product_file_path(product_identifier)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(product_data, f, ensure_ascii=False, indent=2)
+                pipeline = self.redis_client.pipeline(transaction=True)
+                pipeline.delete(self.stats_key)
+                pipeline.hset(self.stats_key, mapping={**counters, self.stats_reconciled_field: time.time()})
+                pipeline.execute()
+                logger.info(f"Contadores da memória reconciliados: {int(counters.get('total', 0))} produtos")
             except Exception as e:
-                logger.warning(f"Erro ao salvar backup local: {e}")
+                logger.warning(f"Erro ao gravar contadores reconciliados: {e}")
+        
+        return self._format_statistics(counters)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas agregadas da memória (por status, origem e qualidade).
+        
+        Com Redis é uma leitura O(1) do hash de contadores mantido a cada
+        gravação; sem Redis, agrega diretamente na camada durável.
+        
+        Returns:
+            Dicionário com total, contagens por status/origem e score médio
+        """
+        try:
+            if self.redis_client:
+                counters = {
+                    field.decode('utf-8'): float(value)
+                    for field, value in self.redis_client.hgetall(self.stats_key).items()
+                }
+                # Sem o campo de reconciliação, o hash só tem os incrementos
+                # gravados depois que os contadores se perderam
+                if self.stats_reconciled_field in counters:
+                    return self._format_statistics(counters)
+                return self.reconcile_statistics()
             
-            logger.info(f"Produto {product_identifier} validado com sucesso")
-            return True
+            return self._format_statistics(self._aggregate_statistics())
             
         except Exception as e:
-            logger.error(f"Erro ao validar produto {product_identifier}: {e}")
-            return False
+            logger.error(f"Erro ao calcular estatísticas da memória: {e}")
+            return self._format_statistics({})
     
     def list_products_advanced(self, page: int = 1, limit: int = 20, 
                               search: str = '', status: str = 'all', 
                               origin: str = 'all', date_from: str = '', 
-                              date_to: str = '') -> Dict[str, Any]:
+                              date_to: str = '', search_mode: str = 'substring',
+                              cursor: Optional[str] = None) -> Dict[str, Any]:
         """
         Lista produtos na memória com filtros avançados e paginação.
         
@@ -412,69 +1644,42 @@ class ProductMemory:
             origin: Filtro por origem ('all', 'spreadsheet', 'manual', 'link_extraction')
             date_from: Data inicial (formato ISO)
             date_to: Data final (formato ISO)
+            search_mode: 'substring' ou 'prefix'
+            cursor: Se informado (mesmo vazio), pagina por cursor em vez de página
         
         Returns:
             Dicionário com produtos, paginação e estatísticas
+        
+        Raises:
+            ValueError: Se o cursor for inválido
         """
         try:
-            all_products = []
+            if cursor is not None:
+                result = self.query_products_page(
+                    cursor, limit, search, status, origin, date_from, date_to, search_mode, summary=True
+                )
+                return {
+                    'products': result['records'],
+                    'pagination': {
+                        'nextCursor': result['next_cursor'],
+                        'prevCursor': result['prev_cursor'],
+                        'totalItems': result['total_items'],
+                        'itemsPerPage': limit,
+                        'hasNext': result['next_cursor'] is not None,
+                        'hasPrevious': result['prev_cursor'] is not None
+                    },
+                    'statistics': self.get_statistics()
+                }
             
-            # Listar do Redis
-            if self.redis_client:
-                try:
-                    pattern = f"{self.memory_prefix}:*"
-                    keys = self.redis_client.keys(pattern)
-                    
-                    for key in keys:
-                        try:
-                            data = self.redis_client.get(key)
-                            if data:
-                                product_data = json.loads(data.decode('utf-8'))
-                                
-                                # Extrair informações do produto
-                                product_info = {
-                                    'id': product_data.get('product_identifier'),
-                                    'name': product_data.get('product_data', {}).get('nome', 'Produto sem nome'),
-                                    'sku': product_data.get('product_data', {}).get('sku', ''),
-                                    'created_at': product_data.get('created_at'),
-                                    'updated_at': product_data.get('updated_at'),
-                                    'origin': product_data.get('origin', 'manual'),
-                                    'status': product_data.get('status', 'pending'),
-                                    'validated_at': product_data.get('validated_at'),
-                                    'data_quality_score': product_data.get('data_quality_score', 0),
-                                    'has_title': bool(product_data.get('generated_content', {}).get('titulo')),
-                                    'has_description': bool(product_data.get('generated_content', {}).get('descricao_produto')),
-                                    'has_bullet_points': bool(product_data.get('generated_content', {}).get('bullet_points'))
-                                }
-                                
-                                all_products.append(product_info)
-                                
-                        except Exception as e:
-                            logger.warning(f"Erro ao processar produto {key}: {e}")
-                            continue
-                            
-                except Exception as e:
-                    logger.warning(f"Erro ao listar produtos do Redis: {e}")
-            
-            # Aplicar filtros
-            filtered_products = self._apply_filters(all_products, search, status, origin, date_from, date_to)
-            
-            # Ordenar por data de criação (mais recentes primeiro)
-            filtered_products.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            
-            # Calcular paginação
-            total_items = len(filtered_products)
+            page = max(page, 1)
+            summaries, total_items = self.query_products(
+                search, status, origin, date_from, date_to,
+                offset=(page - 1) * limit, limit=limit, search_mode=search_mode, summary=True
+            )
             total_pages = (total_items + limit - 1) // limit
-            start_index = (page - 1) * limit
-            end_index = start_index + limit
-            
-            paginated_products = filtered_products[start_index:end_index]
-            
-            # Calcular estatísticas
-            statistics = self._calculate_statistics(all_products)
             
             return {
-                'products': paginated_products,
+                'products': summaries,
                 'pagination': {
                     'currentPage': page,
                     'totalPages': total_pages,
@@ -483,9 +1688,11 @@ class ProductMemory:
                     'hasNext': page < total_pages,
                     'hasPrevious': page > 1
                 },
-                'statistics': statistics
+                'statistics': self.get_statistics()
             }
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao listar produtos avançado: {e}")
             return {
@@ -502,20 +1709,28 @@ class ProductMemory:
             }
     
     def _apply_filters(self, products: List[Dict[str, Any]], search: str, status: str, 
-                      origin: str, date_from: str, date_to: str) -> List[Dict[str, Any]]:
+                      origin: str, date_from: str, date_to: str,
+                      search_mode: str = 'substring') -> List[Dict[str, Any]]:
         """
-        Aplica filtros à lista de produtos.
+        Aplica filtros à lista de produtos (modo legado, sem banco de dados).
         """
         filtered = products
         
         # Filtro de busca
         if search:
             search_lower = search.lower()
-            filtered = [
-                p for p in filtered 
-                if search_lower in p.get('name', '').lower() or 
-                   search_lower in p.get('sku', '').lower()
-            ]
+            if search_mode == 'prefix':
+                filtered = [
+                    p for p in filtered
+                    if any(word.startswith(search_lower)
+                           for word in f"{p.get('name', '')} {p.get('sku', '')}".lower().split())
+                ]
+            else:
+                filtered = [
+                    p for p in filtered 
+                    if search_lower in p.get('name', '').lower() or 
+                       search_lower in p.get('sku', '').lower()
+                ]
         
         # Filtro de status
         if status != 'all':
@@ -527,45 +1742,13 @@ class ProductMemory:
         
         # Filtro de data
         if date_from:
-            filtered = [p for p in filtered if p.get('created_at', '') >= date_from]
+            filtered = [p for p in filtered if (p.get('created_at') or '') >= date_from]
         
         if date_to:
-            filtered = [p for p in filtered if p.get('created_at', '') <= date_to]
+            filtered = [p for p in filtered if (p.get('created_at') or '') <= date_to]
         
         return filtered
     
-    def _calculate_statistics(self, products: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """
-        Calcula estatísticas dos produtos.
-        """
-        if not products:
-            return {}
-        
-        total_products = len(products)
-        
-        # Estatísticas por status
-        by_status = {}
-        for product in products:
-            status = product.get('status', 'pending')
-            by_status[status] = by_status.get(status, 0) + 1
-        
-        # Estatísticas por origem
-        by_origin = {}
-        for product in products:
-            origin = product.get('origin', 'manual')
-            by_origin[origin] = by_origin.get(origin, 0) + 1
-        
-        # Qualidade média
-        quality_scores = [p.get('data_quality_score', 0) for p in products]
-        average_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
-        
-        return {
-            'total_products': total_products,
-            'by_status': by_status,
-            'by_origin': by_origin,
-            'average_quality_score': round(average_quality, 1)
-        }
-    
     def list_products(self, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Lista produtos na memória (método legado).
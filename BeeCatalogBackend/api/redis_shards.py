@@ -0,0 +1,334 @@
+# api/redis_shards.py
+
+import bisect
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from django.conf import settings
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """
+    Anel de hash consistente: cada nó ocupa vários pontos virtuais, então
+    adicionar ou remover um nó move apenas ~1/N das chaves.
+    """
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 160):
+        self.nodes = list(nodes)
+        self._points: List[int] = []
+        self._owners: List[str] = []
+
+        ring = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+    def get_node(self, key) -> str:
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardedPipeline:
+    """
+    Pipeline que agrupa os comandos por shard e executa os pipelines de cada
+    nó em paralelo, devolvendo os resultados na ordem em que foram enfileirados.
+
+    Com transaction=True cada shard roda seu trecho em MULTI/EXEC; só há
+    atomicidade entre comandos que caem no mesmo nó (ex.: a mesma chave).
+    """
+
+    def __init__(self, sharded_client: 'ShardedRedis', transaction: bool = True):
+        self._sharded_client = sharded_client
+        self._transaction = transaction
+        self._commands: List[Tuple[str, str, tuple, dict]] = []
+
+    def __getattr__(self, command: str) -> Callable[..., 'ShardedPipeline']:
+        def queue(key, *args, **kwargs):
+            self._commands.append((command, key, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> List[Any]:
+        commands_by_node: Dict[str, List[Tuple[int, str, Any, tuple, dict]]] = {}
+        for position, (command, key, args, kwargs) in enumerate(self._commands):
+            node = self._sharded_client.ring.get_node(key)
+            commands_by_node.setdefault(node, []).append((position, command, key, args, kwargs))
+        self._commands = []
+
+        def run(node: str) -> List[Tuple[int, Any]]:
+            pipeline = self._sharded_client.clients[node].pipeline(transaction=self._transaction)
+            node_commands = commands_by_node[node]
+            for _, command, key, args, kwargs in node_commands:
+                getattr(pipeline, command)(key, *args, **kwargs)
+            return list(zip((position for position, *_ in node_commands), pipeline.execute()))
+
+        results: List[Any] = [None] * sum(len(commands) for commands in commands_by_node.values())
+        for node_results in self._sharded_client._map_nodes(run, list(commands_by_node)):
+            for position, result in node_results:
+                results[position] = result
+        return results
+
+
+class ShardedRedis:
+    """
+    Cliente Redis que distribui as chaves entre vários nós por hash consistente.
+
+    Expõe o subconjunto da API do redis-py usado pela memória de produtos e
+    pelo cache da IA: comandos de uma chave vão direto ao nó dono, comandos
+    de várias chaves (MGET, DELETE, UNLINK, EXISTS) e pipelines são
+    divididos por nó e executados em paralelo.
+
+    Para resharding sem flush, informe os nós anteriores em previous_urls:
+    leituras que não encontram a chave no dono atual consultam o dono antigo
+    enquanto reshard() move as chaves em segundo plano.
+    """
+
+    def __init__(self, urls: Sequence[str], previous_urls: Optional[Sequence[str]] = None,
+                 replicas: int = 160):
+        if not urls:
+            raise ValueError('Nenhum nó Redis informado para o cliente particionado')
+
+        self.clients: Dict[str, redis.Redis] = {}
+        for url in list(urls) + list(previous_urls or []):
+            if url not in self.clients:
+                self.clients[url] = redis.from_url(url)
+
+        self.ring = HashRing(urls, replicas=replicas)
+        self.previous_ring = HashRing(previous_urls, replicas=replicas) if previous_urls else None
+        self._executor = ThreadPoolExecutor(max_workers=len(self.clients), thread_name_prefix='redis-shard')
+
+    def _map_nodes(self, function: Callable[[str], Any], nodes: List[str]) -> List[Any]:
+        # Um único nó não compensa o custo de despachar para a thread pool
+        if len(nodes) == 1:
+            return [function(nodes[0])]
+        return list(self._executor.map(function, nodes))
+
+    def _client_for(self, key) -> redis.Redis:
+        return self.clients[self.ring.get_node(key)]
+
+    def client_for(self, key) -> redis.Redis:
+        """Cliente do nó dono da chave (transações com WATCH sobre uma única chave)."""
+        return self._client_for(key)
+
+    def _previous_client_for(self, key) -> Optional[redis.Redis]:
+        if not self.previous_ring:
+            return None
+        previous_node = self.previous_ring.get_node(key)
+        if previous_node == self.ring.get_node(key):
+            return None
+        return self.clients[previous_node]
+
+    def _group_by_node(self, keys) -> Dict[str, List[Tuple[int, Any]]]:
+        keys_by_node: Dict[str, List[Tuple[int, Any]]] = {}
+        for position, key in enumerate(keys):
+            keys_by_node.setdefault(self.ring.get_node(key), []).append((position, key))
+        return keys_by_node
+
+    def _sum_by_node(self, command: str, keys) -> int:
+        keys_by_node = self._group_by_node(keys)
+
+        def run(node: str) -> int:
+            return getattr(self.clients[node], command)(*[key for _, key in keys_by_node[node]])
+
+        return sum(self._map_nodes(run, list(keys_by_node)))
+
+    # Comandos de uma chave
+
+    def get(self, key):
+        value = self._client_for(key).get(key)
+        if value is None:
+            previous_client = self._previous_client_for(key)
+            if previous_client is not None:
+                value = previous_client.get(key)
+        return value
+
+    def set(self, key, value, *args, **kwargs):
+        return self._client_for(key).set(key, value, *args, **kwargs)
+
+    def setex(self, key, timeout, value):
+        return self._client_for(key).setex(key, timeout, value)
+
+    def hgetall(self, key):
+        return self._client_for(key).hgetall(key)
+
+    def hset(self, key, *args, **kwargs):
+        return self._client_for(key).hset(key, *args, **kwargs)
+
+    def hdel(self, key, *fields):
+        return self._client_for(key).hdel(key, *fields)
+
+    def hincrby(self, key, field, amount=1):
+        return self._client_for(key).hincrby(key, field, amount)
+
+    def hincrbyfloat(self, key, field, amount=1.0):
+        return self._client_for(key).hincrbyfloat(key, field, amount)
+
+    # Comandos de várias chaves (divididos por nó)
+
+    def mget(self, keys, *args):
+        keys = list(keys) + list(args)
+        keys_by_node = self._group_by_node(keys)
+
+        def run(node: str) -> List[Tuple[int, Any]]:
+            node_keys = keys_by_node[node]
+            values = self.clients[node].mget([key for _, key in node_keys])
+            return list(zip((position for position, _ in node_keys), values))
+
+        values: List[Any] = [None] * len(keys)
+        for node_values in self._map_nodes(run, list(keys_by_node)):
+            for position, value in node_values:
+                values[position] = value
+
+        # Chaves ainda não migradas pelo resharding
+        for position, key in enumerate(keys):
+            if values[position] is None:
+                previous_client = self._previous_client_for(key)
+                if previous_client is not None:
+                    values[position] = previous_client.get(key)
+        return values
+
+    def delete(self, *keys) -> int:
+        removed = self._sum_by_node('delete', keys)
+        return removed + self._remove_previous_copies(keys)
+
+    def unlink(self, *keys) -> int:
+        removed = self._sum_by_node('unlink', keys)
+        return removed + self._remove_previous_copies(keys)
+
+    def _remove_previous_copies(self, keys) -> int:
+        removed = 0
+        for key in keys:
+            previous_client = self._previous_client_for(key)
+            if previous_client is not None:
+                removed += previous_client.unlink(key)
+        return removed
+
+    def exists(self, *keys) -> int:
+        return self._sum_by_node('exists', keys)
+
+    def pipeline(self, transaction: bool = True) -> ShardedPipeline:
+        return ShardedPipeline(self, transaction=transaction)
+
+    # Comandos que percorrem todos os nós
+
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> Iterator[bytes]:
+        for client in self.clients.values():
+            yield from client.scan_iter(match=match, count=count)
+
+    def keys(self, pattern: str = '*') -> List[bytes]:
+        return [key for client in self.clients.values() for key in client.keys(pattern)]
+
+    def info(self) -> Dict[str, Any]:
+        shards = {url: client.info() for url, client in self.clients.items()}
+        used_memory = sum(info.get('used_memory', 0) for info in shards.values())
+        return {
+            'used_memory': used_memory,
+            'used_memory_human': f"{used_memory / (1024 * 1024):.2f}M",
+            'connected_clients': sum(info.get('connected_clients', 0) for info in shards.values()),
+            'shards': {url: info.get('used_memory_human', 'N/A') for url, info in shards.items()}
+        }
+
+    def reshard(self, pattern: str, batch_size: int = 500,
+                progress_callback: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Move para o dono atual as chaves que estão no nó errado, sem flush.
+
+        Percorre cada nó com SCAN e, para as chaves cujo dono mudou, copia
+        com DUMP/RESTORE (preservando o TTL) em pipeline e remove a origem
+        com UNLINK. Pode ser interrompido e executado de novo.
+
+        Args:
+            pattern: Padrão das chaves (ex.: 'product_memory:*')
+            batch_size: Chaves por lote
+            progress_callback: Chamada com o total de chaves movidas após cada lote
+
+        Returns:
+            Número de chaves movidas
+        """
+        moved = 0
+
+        def move(source: redis.Redis, keys: List[bytes]) -> int:
+            read_pipeline = source.pipeline(transaction=False)
+            for key in keys:
+                read_pipeline.dump(key)
+                read_pipeline.pttl(key)
+            dumped = read_pipeline.execute()
+
+            pipelines = {}
+            moved_keys = []
+            for index, key in enumerate(keys):
+                payload, ttl = dumped[index * 2], dumped[index * 2 + 1]
+                if payload is None:
+                    continue
+                target_node = self.ring.get_node(key)
+                if target_node not in pipelines:
+                    pipelines[target_node] = self.clients[target_node].pipeline(transaction=False)
+                pipelines[target_node].restore(key, max(ttl, 0), payload, replace=True)
+                moved_keys.append(key)
+
+            for target_node in pipelines:
+                pipelines[target_node].execute()
+            if moved_keys:
+                source.unlink(*moved_keys)
+            return len(moved_keys)
+
+        for node, client in self.clients.items():
+            batch = []
+            for key in client.scan_iter(match=pattern, count=batch_size):
+                if self.ring.get_node(key) != node:
+                    batch.append(key)
+                if len(batch) >= batch_size:
+                    moved += move(client, batch)
+                    batch = []
+                    if progress_callback:
+                        progress_callback(moved)
+            if batch:
+                moved += move(client, batch)
+                if progress_callback:
+                    progress_callback(moved)
+
+        logger.info(f"Resharding concluído: {moved} chaves movidas com o padrão {pattern}")
+        return moved
+
+
+def _parse_urls(value) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(',')
+    return [url.strip() for url in value or [] if url.strip()]
+
+
+def get_redis_client(urls_setting: str, previous_urls_setting: Optional[str] = None):
+    """
+    Cria o cliente Redis de um conjunto de chaves.
+
+    Com a lista de nós configurada em urls_setting, retorna um ShardedRedis;
+    sem ela, mantém a conexão única em REDIS_URL (compartilhada com o broker).
+
+    Args:
+        urls_setting: Nome da configuração com as URLs dos nós
+        previous_urls_setting: Nome da configuração com os nós anteriores (resharding)
+    """
+    urls = _parse_urls(getattr(settings, urls_setting, None))
+    if not urls:
+        return redis.from_url(getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0'))
+
+    previous_urls = _parse_urls(getattr(settings, previous_urls_setting, None)) if previous_urls_setting else []
+    logger.info(f"Redis particionado em {len(urls)} nós ({urls_setting})")
+    return ShardedRedis(
+        urls,
+        previous_urls=previous_urls,
+        replicas=getattr(settings, 'REDIS_SHARD_REPLICAS', 160)
+    )
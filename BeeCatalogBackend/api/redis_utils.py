@@ -0,0 +1,49 @@
+# api/redis_utils.py
+
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def unlink_by_pattern(redis_client, pattern: str, batch_size: int = 1000,
+                      progress_callback: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Remove todas as chaves que casam com o padrão sem bloquear o Redis.
+
+    Percorre as chaves com SCAN (nunca KEYS) e remove cada lote com UNLINK
+    em pipeline: a liberação da memória acontece em segundo plano no Redis,
+    então a latência dos demais clientes não sobe durante a limpeza.
+
+    Args:
+        redis_client: Cliente Redis
+        pattern: Padrão das chaves (ex.: 'product_memory:*')
+        batch_size: Chaves por lote (COUNT do SCAN e tamanho do pipeline)
+        progress_callback: Chamada com o total removido após cada lote
+
+    Returns:
+        Número de chaves removidas
+    """
+    removed = 0
+    batch = []
+
+    def flush():
+        nonlocal removed
+        pipeline = redis_client.pipeline(transaction=False)
+        for key in batch:
+            pipeline.unlink(key)
+        removed += sum(pipeline.execute())
+        batch.clear()
+        if progress_callback:
+            progress_callback(removed)
+
+    for key in redis_client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    logger.info(f"{removed} chaves removidas do Redis com o padrão {pattern}")
+    return removed
@@ -0,0 +1,244 @@
+# api/s3_uploads.py
+
+import os
+import re
+import uuid
+import hashlib
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from . import utils
+from .models import UploadedImage
+
+logger = logging.getLogger(__name__)
+
+# Imagens enviadas ficam disponíveis para a planilha por este período
+UPLOADED_IMAGE_LIFETIME = timedelta(hours=12)
+
+
+def parse_image_field(field: str) -> Optional[Tuple[int, str]]:
+    """
+    Interpreta o nome do campo da imagem ('imagem_p<índice>_<tipo>[_<n>]').
+
+    Returns:
+        Tupla (índice do produto, tipo da imagem), ou None se o campo não é de imagem
+    """
+    if not field.startswith('imagem_'):
+        return None
+    try:
+        parts = field.split('_')
+        return int(parts[1].replace('p', '')), parts[2]
+    except (IndexError, ValueError):
+        return None
+
+
+def image_key_prefix(product_index: int, image_type: str) -> str:
+    return f"produto_{product_index}/{image_type}/"
+
+
+def image_object_key(product_index: int, image_type: str, file_name: str) -> str:
+    safe_name = re.sub(r'[^\w.-]', '_', os.path.basename(file_name)).strip('.') or 'imagem'
+    return f"{image_key_prefix(product_index, image_type)}{uuid.uuid4()}_{safe_name}"
+
+
+def guess_content_type(file_name: str) -> str:
+    content_type, _ = mimetypes.guess_type(file_name, strict=False)
+    return content_type or 'application/octet-stream'
+
+
+def add_image_url(image_urls_map: Dict[str, Dict[str, Any]], product_index: int, image_type: str, url: str):
+    """
+    Acrescenta a URL ao mapa de imagens por produto usado na montagem da planilha.
+    """
+    product_images = image_urls_map.setdefault(str(product_index), {'principal': '', 'amostra': '', 'extra': []})
+    if image_type == 'extra':
+        product_images['extra'].append(url)
+    else:
+        product_images[image_type] = url
+
+
+def create_presigned_uploads(files: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Gera URLs pré-assinadas (PUT) para o navegador enviar as imagens direto ao S3.
+
+    Args:
+        files: Itens {'field': 'imagem_p0_principal', 'name': 'foto.jpg', 'content_type': opcional}
+
+    Returns:
+        Um item por arquivo com o campo, a chave do objeto, a URL e os
+        cabeçalhos que o PUT precisa enviar (fazem parte da assinatura)
+
+    Raises:
+        ValueError: Campo de imagem inválido
+    """
+    s3_client = utils.get_s3_client()
+    expires_in = getattr(settings, 'S3_PRESIGNED_UPLOAD_EXPIRES', 900)
+    uploads = []
+    for item in files:
+        field, file_name = item.get('field', ''), item.get('name', '')
+        parsed = parse_image_field(field)
+        if parsed is None:
+            raise ValueError(f"Campo de imagem inválido: {field}")
+
+        key = image_object_key(*parsed, file_name)
+        content_type = item.get('content_type') or guess_content_type(file_name)
+        url = s3_client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': utils.AWS_STORAGE_BUCKET_NAME, 'Key': key, 'ContentType': content_type, 'ACL': 'public-read'},
+            ExpiresIn=expires_in
+        )
+        uploads.append({
+            'field': field,
+            'key': key,
+            'url': url,
+            'headers': {'Content-Type': content_type, 'x-amz-acl': 'public-read'}
+        })
+    return uploads
+
+
+def register_uploaded_images(urls: List[str]):
+    """
+    Registra as imagens enviadas (expiração controlada por UploadedImage) em
+    um único INSERT; URLs repetidas (mesmo conteúdo) são registradas uma vez.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return
+    expires_at = timezone.now() + UPLOADED_IMAGE_LIFETIME
+    UploadedImage.objects.bulk_create([UploadedImage(url=url, expires_at=expires_at) for url in urls], batch_size=500)
+    logger.info(f"{len(urls)} imagens registradas para expiração")
+
+
+class ImageUploader:
+    """
+    Envio das imagens que passam pelo backend (formulário multipart).
+
+    Cada arquivo é lido em blocos para calcular o SHA-256 e vira o objeto
+    imagens/<hash><extensão>: a mesma foto usada em várias variações ou
+    jobs tem uma única chave e a mesma URL. Chaves já conhecidas (índice no
+    cache do Django, depois HEAD no bucket) não são reenviadas; as demais
+    sobem em paralelo em um pool limitado de threads, com multipart acima
+    de S3_MULTIPART_THRESHOLD.
+    """
+
+    key_prefix = 'imagens'
+    index_prefix = 's3_imagem'
+    hash_block_size = 1024 * 1024
+
+    def __init__(self):
+        self.max_workers = getattr(settings, 'S3_UPLOAD_MAX_WORKERS', 8)
+        # O índice local não vive mais que as imagens (o HEAD confirma depois disso)
+        self.index_timeout = getattr(settings, 'S3_UPLOAD_INDEX_TIMEOUT', int(UPLOADED_IMAGE_LIFETIME.total_seconds()))
+        multipart_threshold = getattr(settings, 'S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=4
+        )
+
+    def _index_key(self, key: str) -> str:
+        return f"{self.index_prefix}:{key}"
+
+    def content_key(self, fileobj, file_name: str) -> str:
+        """
+        Chave do objeto pelo conteúdo, lendo o arquivo em blocos (sem carregá-lo inteiro).
+        """
+        digest = hashlib.sha256()
+        if hasattr(fileobj, 'chunks'):
+            blocks = fileobj.chunks(self.hash_block_size)
+        else:
+            fileobj.seek(0)
+            blocks = iter(lambda: fileobj.read(self.hash_block_size), b'')
+        for block in blocks:
+            digest.update(block)
+        fileobj.seek(0)
+        return f"{self.key_prefix}/{digest.hexdigest()}{os.path.splitext(file_name)[1].lower()}"
+
+    @staticmethod
+    def _exists(s3_client, key: str) -> bool:
+        try:
+            s3_client.head_object(Bucket=utils.AWS_STORAGE_BUCKET_NAME, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def _upload(self, s3_client, key: str, fileobj, file_name: str) -> bool:
+        """
+        Envia o objeto se ainda não existe no bucket.
+
+        Returns:
+            True se foi enviado, False se já existia
+        """
+        try:
+            if self._exists(s3_client, key):
+                return False
+            s3_client.upload_fileobj(
+                fileobj, utils.AWS_STORAGE_BUCKET_NAME, key,
+                ExtraArgs={'ContentType': guess_content_type(file_name), 'ACL': 'public-read'},
+                Config=self.transfer_config
+            )
+            return True
+        except Exception as e:
+            raise RuntimeError(f"Erro no upload da imagem {file_name}: {e}") from e
+
+    def upload(self, files: List[Tuple[Any, str]]) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Envia as imagens, uma vez por conteúdo.
+
+        Args:
+            files: Pares (arquivo, nome do arquivo)
+
+        Returns:
+            Tupla (URLs na ordem dos arquivos, contagem de enviadas, já
+            existentes no bucket e repetidas no próprio envio)
+
+        Raises:
+            RuntimeError: Falha no envio de alguma imagem
+        """
+        stats = {'uploaded': 0, 'existing': 0, 'duplicates': 0}
+        if not files:
+            return [], stats
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='s3-upload') as executor:
+            # hashlib libera o GIL em blocos grandes: o cálculo também roda no pool
+            keys = list(executor.map(lambda item: self.content_key(*item), files))
+
+            unique: Dict[str, Tuple[Any, str]] = {}
+            for key, item in zip(keys, files):
+                unique.setdefault(key, item)
+            indexed = cache.get_many([self._index_key(key) for key in unique])
+            pending = {key: item for key, item in unique.items() if self._index_key(key) not in indexed}
+            stats['duplicates'] = len(files) - len(unique)
+            stats['existing'] = len(unique) - len(pending)
+
+            if pending:
+                # Conexões para os envios paralelos e as partes do multipart
+                s3_client = utils.get_s3_client(max_pool_connections=self.max_workers * self.transfer_config.max_request_concurrency)
+                futures = {
+                    key: executor.submit(self._upload, s3_client, key, fileobj, file_name)
+                    for key, (fileobj, file_name) in pending.items()
+                }
+                for future in futures.values():
+                    if future.result():
+                        stats['uploaded'] += 1
+                    else:
+                        stats['existing'] += 1
+                cache.set_many({self._index_key(key): 1 for key in pending}, timeout=self.index_timeout)
+
+        logger.info(
+            f"Imagens: {stats['uploaded']} enviadas, {stats['existing']} já no bucket, "
+            f"{stats['duplicates']} repetidas no envio"
+        )
+        return [utils.s3_object_url(key) for key in keys], stats
+
+
+image_uploader = ImageUploader()
@@ -0,0 +1,303 @@
+# api/semantic_cache.py
+
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union, TYPE_CHECKING
+from django.conf import settings
+
+if TYPE_CHECKING:
+    import numpy as np
+    from .cache_utils import AICache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_context(context: Union[str, Dict, list]) -> str:
+    """
+    Normaliza o contexto antes do embedding: minúsculas, sem acentos nem
+    pontuação e com espaços colapsados.
+    """
+    if isinstance(context, (dict, list)):
+        context = json.dumps(context, sort_keys=True, ensure_ascii=False)
+    text = unicodedata.normalize('NFKD', str(context).lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+class SemanticCache:
+    """
+    Camada opcional de similaridade na frente da geração de anúncios.
+
+    O cache exato (AICache) só acerta quando o contexto é idêntico; produtos
+    cujo título muda por uma cor ou um erro de digitação sempre erram. Aqui o
+    contexto normalizado vira um embedding e é buscado em um índice ANN
+    (FAISS HNSW, produto interno de vetores normalizados = similaridade de
+    cosseno) dos anúncios já gerados. Acima do limiar configurado, a resposta
+    guardada é reaproveitada.
+
+    As entradas ficam no Redis do cache da IA (sob o mesmo prefixo, então
+    clear_all também as remove); cada processo mantém o índice em memória e o
+    reconstrói a partir do Redis no intervalo configurado, em uma thread em
+    segundo plano (as consultas usam o índice anterior enquanto isso). FAISS
+    e numpy só são importados com a camada ativada.
+    """
+
+    def __init__(self, cache: 'AICache', namespace: str = 'listing'):
+        self.cache = cache
+        self.namespace = namespace
+        self.key_prefix = f"{cache.cache_prefix}:semantic:{namespace}"
+        self.enabled = getattr(settings, 'AI_SEMANTIC_CACHE_ENABLED', False)
+        self.threshold = getattr(settings, 'AI_SEMANTIC_CACHE_THRESHOLD', 0.95)
+        self.max_entries = getattr(settings, 'AI_SEMANTIC_CACHE_MAX_ENTRIES', 50000)
+        self.rebuild_interval = getattr(settings, 'AI_SEMANTIC_CACHE_REBUILD_INTERVAL', 600)
+
+        self._embed_function: Optional[Callable[[str], List[float]]] = None
+        self._index = None
+        self._entry_keys: List[str] = []
+        self._indexed_keys: Set[str] = set()
+        self._built_at = 0.0
+        self._index_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        # Entradas registradas durante a reconstrução, reaplicadas no índice novo
+        self._pending: Optional[List[Tuple[str, 'np.ndarray']]] = None
+        # Incrementada por reset(): descarta uma reconstrução iniciada antes da limpeza
+        self._generation = 0
+        # Sem Redis (desenvolvimento) as entradas ficam só neste processo
+        self._local_entries: Dict[str, Dict[str, Any]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_key(self, normalized: str) -> str:
+        return f"{self.key_prefix}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+    def _embed(self, normalized: str) -> 'np.ndarray':
+        import numpy as np
+        if self._embed_function is None:
+            from .utils import get_embeddings_model
+            self._embed_function = get_embeddings_model().embed_query
+        vector = np.asarray(self._embed_function(normalized), dtype='float32')
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _new_index(dimension: int):
+        import faiss
+        index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = 64
+        return index
+
+    # Entradas
+
+    def _read_entry(self, entry_key: str) -> Optional[Dict[str, Any]]:
+        redis_client = self.cache.redis_client
+        if not redis_client:
+            return self._local_entries.get(entry_key)
+        value = redis_client.get(entry_key)
+        return json.loads(value.decode('utf-8')) if value else None
+
+    def _iter_entries(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        redis_client = self.cache.redis_client
+        if not redis_client:
+            yield from list(self._local_entries.items())
+            return
+
+        batch = []
+        for key in redis_client.scan_iter(match=f"{self.key_prefix}:*", count=500):
+            batch.append(key.decode('utf-8') if isinstance(key, bytes) else key)
+            if len(batch) >= 500:
+                yield from self._read_entries(redis_client, batch)
+                batch = []
+        if batch:
+            yield from self._read_entries(redis_client, batch)
+
+    @staticmethod
+    def _read_entries(redis_client, keys: List[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for key, value in zip(keys, redis_client.mget(keys)):
+            if value:
+                yield key, json.loads(value.decode('utf-8'))
+
+    # Índice
+
+    def _build_index(self) -> Tuple[Any, List[str]]:
+        import numpy as np
+        keys, vectors, seen = [], [], set()
+        for entry_key, entry in self._iter_entries():
+            if len(keys) >= self.max_entries:
+                break
+            # O SCAN pode devolver a mesma chave mais de uma vez
+            if entry_key in seen:
+                continue
+            seen.add(entry_key)
+            keys.append(entry_key)
+            vectors.append(entry['vector'])
+
+        if not vectors:
+            return None, []
+        matrix = np.asarray(vectors, dtype='float32')
+        index = self._new_index(matrix.shape[1])
+        index.add(matrix)
+        return index, keys
+
+    def _index_vector(self, entry_key: str, vector: 'np.ndarray'):
+        """Acrescenta o vetor ao índice atual, se a chave ainda não estiver nele (chamar com _index_lock)."""
+        if entry_key in self._indexed_keys:
+            return
+        if self._index is None:
+            self._index, self._entry_keys = self._new_index(vector.shape[0]), []
+        if self._index.d == vector.shape[0]:
+            self._index.add(vector.reshape(1, -1))
+            self._entry_keys.append(entry_key)
+            self._indexed_keys.add(entry_key)
+
+    def _schedule_rebuild(self):
+        if not self._rebuild_lock.acquire(blocking=False):
+            # Reconstrução já em andamento
+            return
+        with self._index_lock:
+            self._pending = []
+            generation = self._generation
+        try:
+            threading.Thread(
+                target=self._rebuild_index, args=(generation,), name=f'semantic-index-{self.namespace}', daemon=True
+            ).start()
+        except Exception as e:
+            logger.warning(f"Erro ao agendar reconstrução do índice do cache semântico: {e}")
+            with self._index_lock:
+                self._pending = None
+            self._rebuild_lock.release()
+
+    def _rebuild_index(self, generation: int):
+        try:
+            index, keys = self._build_index()
+            with self._index_lock:
+                if generation != self._generation:
+                    return
+                pending = self._pending or []
+                self._index, self._entry_keys, self._indexed_keys = index, keys, set(keys)
+                for entry_key, vector in pending:
+                    self._index_vector(entry_key, vector)
+                self._built_at = time.monotonic()
+            logger.debug(f"Índice do cache semântico ({self.namespace}) reconstruído com {len(self._entry_keys)} entradas")
+        except Exception as e:
+            logger.warning(f"Erro ao reconstruir índice do cache semântico: {e}")
+        finally:
+            with self._index_lock:
+                self._pending = None
+            self._rebuild_lock.release()
+
+    def _search(self, vector: 'np.ndarray') -> Tuple[Optional[str], float]:
+        if time.monotonic() - self._built_at > self.rebuild_interval:
+            self._schedule_rebuild()
+        with self._index_lock:
+            if self._index is None or self._index.ntotal == 0 or self._index.d != vector.shape[0]:
+                return None, 0.0
+            scores, positions = self._index.search(vector.reshape(1, -1), 1)
+            position = int(positions[0][0])
+            if position < 0:
+                return None, 0.0
+            return self._entry_keys[position], float(scores[0][0])
+
+    # API pública
+
+    def lookup(self, context: Union[str, Dict, list]) -> Optional[Tuple[Any, float, Dict[str, Any]]]:
+        """
+        Procura uma resposta gerada para um contexto parecido.
+
+        Returns:
+            Tupla (resposta, similaridade, dados do produto de origem), ou None
+            se nenhuma entrada passar do limiar
+        """
+        if not self.enabled:
+            return None
+        normalized = normalize_context(context)
+        if not normalized:
+            return None
+
+        try:
+            # Contexto idêntico após a normalização dispensa o embedding
+            entry_key, score = self._entry_key(normalized), 1.0
+            entry = self._read_entry(entry_key)
+            if entry is None:
+                entry_key, score = self._search(self._embed(normalized))
+                if entry_key is None or score < self.threshold:
+                    self.misses += 1
+                    logger.debug(f"Cache semântico miss (melhor similaridade {score:.3f})")
+                    return None
+                # Pode ter expirado ou sido limpa desde a última reconstrução
+                entry = self._read_entry(entry_key)
+                if entry is None:
+                    self.misses += 1
+                    return None
+
+            self.hits += 1
+            logger.info(f"Cache semântico hit (similaridade {score:.3f}): {entry_key.rsplit(':', 1)[-1][:16]}...")
+            return entry['response'], score, entry.get('source', {})
+        except Exception as e:
+            logger.warning(f"Erro ao consultar cache semântico: {e}")
+            return None
+
+    def add(self, context: Union[str, Dict, list], response: Any, source: Optional[Dict[str, Any]] = None,
+            timeout: Optional[int] = None) -> bool:
+        """
+        Registra uma resposta gerada no índice de similaridade.
+
+        Args:
+            context: Contexto enviado à IA
+            response: Resposta gerada (serializável em JSON)
+            source: Dados do produto de origem, usados para adaptar a resposta a quem a reaproveitar
+            timeout: Validade da entrada no Redis (padrão: a do cache da IA)
+        """
+        if not self.enabled:
+            return False
+        normalized = normalize_context(context)
+        if not normalized:
+            return False
+
+        try:
+            vector = self._embed(normalized)
+            entry_key = self._entry_key(normalized)
+            entry = {'vector': vector.tolist(), 'response': response, 'source': source or {}, 'created_at': time.time()}
+
+            redis_client = self.cache.redis_client
+            if redis_client:
+                redis_client.setex(entry_key, timeout or self.cache.default_timeout, json.dumps(entry, ensure_ascii=False))
+            else:
+                self._local_entries[entry_key] = entry
+
+            with self._index_lock:
+                if self._pending is not None:
+                    self._pending.append((entry_key, vector))
+                # Contexto já indexado: só a entrada no Redis é renovada
+                self._index_vector(entry_key, vector)
+            return True
+        except Exception as e:
+            logger.warning(f"Erro ao registrar resposta no cache semântico: {e}")
+            return False
+
+    def reset(self):
+        """
+        Descarta o índice deste processo (as entradas do Redis são removidas por AICache.clear_all).
+        """
+        with self._index_lock:
+            self._index, self._entry_keys, self._indexed_keys = None, [], set()
+            self._built_at = 0.0
+            self._generation += 1
+            self._local_entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'namespace': self.namespace,
+            'threshold': self.threshold,
+            'indexed_entries': len(self._entry_keys),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0
+        }
@@ -1,26 +1,43 @@
 # api/spreadsheet_importer.py
 
+import os
+import re
+import codecs
+import zipfile
+import multiprocessing
+import django
 import pandas as pd
 import logging
 import json
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime
-from .memory_utils import (
-    extract_product_identifier,
-    save_generated_content_to_memory,
-    normalize_generated_content
-)
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree import ElementTree
+from openpyxl import load_workbook
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from .product_memory import product_memory
+from .utils import detectar_codificacao
 
 logger = logging.getLogger(__name__)
 
+XLSX_MAIN_NAMESPACE = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XLSX_DOCUMENT_RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XLSX_PACKAGE_RELATIONSHIPS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+# <dimension ref="A1:K2500"/>: linha inicial (grupo 1, ausente em ref de célula única) e final
+XLSX_DIMENSION_PATTERN = re.compile(rb'<(?:\w+:)?dimension\s+ref="(?:[A-Z]+(\d+):)?[A-Z]+(\d+)"')
+XLSX_ROW_PATTERN = re.compile(rb'<(?:\w+:)?row[\s>]')
+
 class SpreadsheetImporter:
     """
     Classe para importar planilhas preenchidas e popular o sistema de memória inteligente.
     """
     
     def __init__(self):
-        self.supported_formats = ['.xlsx', '.xls', '.csv']
+        self.supported_formats = ['.xlsx', '.xls', '.csv', '.parquet', '.arrow', '.feather']
+        # Linhas por bloco na leitura em streaming
+        self.chunk_size = 5000
         self.field_mappings = {
             # Mapeamentos de campos comuns em planilhas
             'sku': ['sku', 'SKU', 'codigo', 'código', 'product_id', 'id_produto'],
@@ -38,6 +55,20 @@ class SpreadsheetImporter:
             'bullet_points': ['pontos_principais', 'bullet_points', 'caracteristicas', 'características'],
             'specifications': ['especificacoes', 'especificações', 'specifications', 'specs']
         }
+        # Campo padrão -> campo do conteúdo normalizado (os demais vão para 'outros_campos')
+        self.content_fields = {
+            'title': 'titulo',
+            'description': 'descricao_produto',
+            'bullet_points': 'bullet_points',
+            'keywords': 'palavras_chave',
+            'category': 'categoria',
+            'brand': 'marca',
+            'model': 'modelo',
+            'color': 'cor',
+            'material': 'material',
+            'weight': 'peso',
+            'dimensions': 'dimensoes'
+        }
     
     def detect_file_format(self, file_path: str) -> str:
         """
@@ -47,35 +78,23 @@ class SpreadsheetImporter:
             return 'csv'
         elif file_path.lower().endswith(('.xlsx', '.xls')):
             return 'excel'
+        elif file_path.lower().endswith('.parquet'):
+            return 'parquet'
+        elif file_path.lower().endswith(('.arrow', '.feather')):
+            return 'arrow'
         else:
             raise ValueError(f"Formato de arquivo não suportado: {file_path}")
     
     def read_spreadsheet(self, file_path: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
         """
-        Lê a planilha e retorna um DataFrame.
+        Lê a planilha inteira e retorna um DataFrame.
+        
+        Para arquivos grandes prefira iter_spreadsheet_chunks, que mantém o
+        uso de memória limitado ao tamanho do bloco.
         """
         try:
-            file_format = self.detect_file_format(file_path)
-            
-            if file_format == 'csv':
-                # Tentar diferentes encodings
-                encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(file_path, encoding=encoding)
-                        logger.info(f"Arquivo CSV lido com encoding: {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                else:
-                    raise ValueError("Não foi possível ler o arquivo CSV com nenhum encoding suportado")
-            
-            elif file_format == 'excel':
-                if sheet_name:
-                    df = pd.read_excel(file_path, sheet_name=sheet_name)
-                else:
-                    df = pd.read_excel(file_path)
-            
+            chunks = list(self.iter_spreadsheet_chunks(file_path, sheet_name))
+            df = pd.concat(chunks) if chunks else pd.DataFrame()
             logger.info(f"Planilha lida com sucesso: {len(df)} linhas, {len(df.columns)} colunas")
             return df
             
@@ -83,6 +102,245 @@ class SpreadsheetImporter:
             logger.error(f"Erro ao ler planilha {file_path}: {e}")
             raise
     
+    def detect_encoding(self, file_path: str, sample_size: int = 65536) -> str:
+        """
+        Detecta a codificação do CSV uma única vez, a partir de uma amostra.
+        
+        UTF-8 válido na amostra vence; senão cp1252 (o latin-1 do Windows, das
+        planilhas exportadas pelo Excel em português), que o chardet costuma
+        confundir com outras codificações de 8 bits. O chardet
+        (detectar_codificacao) fica para amostras que nem o cp1252 decodifica.
+        """
+        with open(file_path, 'rb') as f:
+            sample = f.read(sample_size)
+        
+        candidates = ['utf-8-sig' if sample.startswith(codecs.BOM_UTF8) else 'utf-8', 'cp1252']
+        for encoding in candidates:
+            try:
+                # final=False: a amostra pode terminar no meio de um caractere multibyte
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            encoding = detectar_codificacao(file_path)
+        
+        logger.info(f"Encoding detectado para o CSV: {encoding}")
+        return encoding
+    
+    def iter_spreadsheet_chunks(self, file_path: str, sheet_name: Optional[str] = None,
+                                chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Lê a planilha em blocos de linhas (gerador).
+        
+        CSV é lido com chunksize após detectar a codificação em uma amostra;
+        XLSX é percorrido linha a linha pelo openpyxl em modo read_only;
+        Parquet e Arrow IPC são lidos em lotes de registros do arquivo mapeado
+        em memória. O índice de cada bloco continua a numeração das linhas do arquivo.
+        
+        Args:
+            file_path: Caminho do arquivo
+            sheet_name: Planilha a ler (padrão: a primeira)
+            chunk_size: Linhas por bloco (padrão: self.chunk_size)
+        """
+        chunk_size = chunk_size or self.chunk_size
+        file_format = self.detect_file_format(file_path)
+        
+        if file_format == 'csv':
+            # Bytes inválidos após a amostra não interrompem a importação no meio
+            yield from pd.read_csv(
+                file_path, encoding=self.detect_encoding(file_path), encoding_errors='replace',
+                dtype=str, chunksize=chunk_size
+            )
+        elif file_format in ('parquet', 'arrow'):
+            yield from self._iter_arrow_chunks(file_path, file_format, chunk_size)
+        elif file_path.lower().endswith('.xls'):
+            # Formato binário antigo: sem leitura em streaming no openpyxl
+            df = pd.read_excel(file_path, sheet_name=sheet_name or 0)
+            for start in range(0, len(df), chunk_size):
+                yield df.iloc[start:start + chunk_size]
+        else:
+            yield from self._iter_xlsx_chunks(file_path, sheet_name, chunk_size)
+    
+    def _iter_arrow_batches(self, file_path: str, file_format: str, chunk_size: int) -> Iterator['pa.RecordBatch']:
+        if file_format == 'parquet':
+            yield from pq.ParquetFile(file_path, memory_map=True).iter_batches(batch_size=chunk_size)
+            return
+        
+        with pa.memory_map(file_path, 'r') as source:
+            try:
+                reader = pa.ipc.open_file(source)
+                batches = (reader.get_batch(position) for position in range(reader.num_record_batches))
+            except pa.ArrowInvalid:
+                # Formato de stream do Arrow IPC (sem rodapé)
+                source.seek(0)
+                batches = pa.ipc.open_stream(source)
+            for batch in batches:
+                # Lotes do arquivo maiores que o bloco: fatias sem cópia
+                for start in range(0, batch.num_rows, chunk_size):
+                    yield batch.slice(start, chunk_size)
+    
+    def _iter_arrow_chunks(self, file_path: str, file_format: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        offset = 0
+        for batch in self._iter_arrow_batches(file_path, file_format, chunk_size):
+            # Listas (ex.: palavras-chave) viram texto separado por ';', como nas planilhas
+            columns = [
+                pc.binary_join(column, '; ') if pa.types.is_list(column.type) or pa.types.is_large_list(column.type) else column
+                for column in batch.columns
+            ]
+            batch = pa.RecordBatch.from_arrays(columns, names=[str(name) for name in batch.schema.names])
+            # Colunas apoiadas nos buffers do Arrow (ArrowDtype), sem conversão para objetos Python
+            df = batch.to_pandas(types_mapper=pd.ArrowDtype)
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            yield df
+    
+    @staticmethod
+    def _rows_to_frame(rows: List[tuple], columns: List[str], offset: int) -> pd.DataFrame:
+        df = pd.DataFrame(rows, columns=columns, index=pd.RangeIndex(offset, offset + len(rows)))
+        # Células vazias do openpyxl chegam como None; viram NaN como no pd.read_excel
+        return df.where(df.notna(), float('nan'))
+    
+    def _iter_xlsx_chunks(self, file_path: str, sheet_name: Optional[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+        wb = load_workbook(filename=file_path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+            rows = ws.iter_rows(values_only=True)
+            
+            # Cabeçalho: primeira linha com algum valor
+            header = next((row for row in rows if any(value is not None for value in row)), None)
+            if header is None:
+                return
+            columns = [
+                str(value).strip() if value is not None else f"Unnamed: {position}"
+                for position, value in enumerate(header)
+            ]
+            
+            offset = 0
+            batch = []
+            for row in rows:
+                batch.append(row[:len(columns)])
+                if len(batch) >= chunk_size:
+                    yield self._rows_to_frame(batch, columns, offset)
+                    offset += len(batch)
+                    batch = []
+            if batch:
+                yield self._rows_to_frame(batch, columns, offset)
+        finally:
+            wb.close()
+    
+    def read_sample(self, file_path: str, sheet_name: Optional[str] = None, nrows: int = 5) -> pd.DataFrame:
+        """
+        Lê apenas o cabeçalho e as primeiras nrows linhas da planilha.
+        """
+        if self.detect_file_format(file_path) == 'csv':
+            return pd.read_csv(
+                file_path, encoding=self.detect_encoding(file_path), encoding_errors='replace',
+                dtype=str, nrows=nrows
+            )
+        if file_path.lower().endswith('.xls'):
+            return pd.read_excel(file_path, sheet_name=sheet_name or 0, nrows=nrows)
+        
+        # Encerrar o gerador fecha o arquivo sem percorrer o restante das linhas
+        chunks = self.iter_spreadsheet_chunks(file_path, sheet_name, max(nrows, 1))
+        try:
+            return next(chunks, pd.DataFrame()).head(nrows)
+        finally:
+            chunks.close()
+    
+    def estimate_total_rows(self, file_path: str, sheet_name: Optional[str] = None) -> int:
+        """
+        Estima o número de linhas de dados sem ler as células.
+        
+        CSV: contagem de quebras de linha (campos com quebras de linha entre
+        aspas contam a mais). XLSX: metadado <dimension> da planilha, ou a
+        contagem das tags <row> quando o arquivo não o traz. XLS: contagem
+        do xlrd (o formato antigo é carregado inteiro). Parquet e Arrow IPC:
+        contagem exata dos metadados.
+        """
+        file_format = self.detect_file_format(file_path)
+        if file_format == 'csv':
+            return self._count_csv_rows(file_path)
+        if file_format == 'parquet':
+            return pq.ParquetFile(file_path).metadata.num_rows
+        if file_format == 'arrow':
+            return sum(batch.num_rows for batch in self._iter_arrow_batches(file_path, file_format, 2 ** 31 - 1))
+        if file_path.lower().endswith('.xls'):
+            book = pd.ExcelFile(file_path).book
+            sheet = book.sheet_by_name(sheet_name) if sheet_name else book.sheet_by_index(0)
+            return max(sheet.nrows - 1, 0)
+        return self._count_xlsx_rows(file_path, sheet_name)
+    
+    def _count_csv_rows(self, file_path: str, block_size: int = 1024 * 1024) -> int:
+        lines = 0
+        last_byte = b'\n'
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                lines += block.count(b'\n')
+                last_byte = block[-1:]
+        if last_byte != b'\n':
+            lines += 1
+        # Desconta o cabeçalho
+        return max(lines - 1, 0)
+    
+    def _xlsx_sheet_members(self, file_path: str) -> List[Tuple[str, str]]:
+        """
+        Lê do XML do workbook (sem carregar células nem strings compartilhadas)
+        os nomes das planilhas e os arquivos de cada uma, na ordem do arquivo.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+            relationships = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        
+        targets = {
+            relationship.get('Id'): relationship.get('Target')
+            for relationship in relationships.iter(f'{{{XLSX_PACKAGE_RELATIONSHIPS}}}Relationship')
+        }
+        members = []
+        for sheet in workbook.iter(f'{{{XLSX_MAIN_NAMESPACE}}}sheet'):
+            target = targets.get(sheet.get(f'{{{XLSX_DOCUMENT_RELATIONSHIPS}}}id'), '')
+            members.append((sheet.get('name'), target.lstrip('/') if target.startswith('/') else f'xl/{target}'))
+        return members
+    
+    def _count_xlsx_rows(self, file_path: str, sheet_name: Optional[str] = None) -> int:
+        members = self._xlsx_sheet_members(file_path)
+        if sheet_name:
+            members = [(name, member) for name, member in members if name == sheet_name]
+            if not members:
+                raise ValueError(f"Planilha não encontrada: {sheet_name}")
+        if not members:
+            return 0
+        
+        with zipfile.ZipFile(file_path) as archive, archive.open(members[0][1]) as sheet_xml:
+            # <dimension> vem antes de <sheetData>, no início do XML
+            head = b''
+            while b'<sheetData' not in head and len(head) < 1024 * 1024:
+                block = sheet_xml.read(16384)
+                if not block:
+                    break
+                head += block
+            match = XLSX_DIMENSION_PATTERN.search(head)
+            if match and match.group(1):
+                return max(int(match.group(2)) - int(match.group(1)), 0)
+            
+            # Sem dimensão útil (alguns exportadores gravam só "A1"): contar as linhas no XML em blocos
+            rows = 0
+            pending = head
+            while True:
+                cut = pending.rfind(b'<')
+                rows += len(XLSX_ROW_PATTERN.findall(pending, 0, cut if cut >= 0 else len(pending)))
+                pending = pending[cut:] if cut >= 0 else b''
+                block = sheet_xml.read(1024 * 1024)
+                if not block:
+                    rows += len(XLSX_ROW_PATTERN.findall(pending))
+                    break
+                pending += block
+        # Desconta o cabeçalho
+        return max(rows - 1, 0)
+    
     def map_columns(self, df: pd.DataFrame) -> Dict[str, str]:
         """
         Mapeia as colunas da planilha para os campos padrão.
@@ -111,33 +369,104 @@ class SpreadsheetImporter:
         # Remover espaços em branco extras
         for col in df.select_dtypes(include=['object']).columns:
             df[col] = df[col].astype(str).str.strip()
-            # Substituir 'nan' string por NaN real
-            df[col] = df[col].replace('nan', pd.NA)
+            # Substituir 'nan'/'None' string por NaN real
+            df[col] = df[col].replace(['nan', 'None'], pd.NA)
         
-        # Converter valores numéricos
-        numeric_fields = ['price', 'weight']
-        for field in numeric_fields:
-            if field in df.columns:
-                df[field] = pd.to_numeric(df[field], errors='coerce')
+        # Preço e peso continuam como texto: o preço é convertido em
+        # build_product_frame (mantendo o texto quando não é numérico) e
+        # valores como "500g" ou "1,5 kg" não podem virar NaN
         
         logger.info(f"Dados limpos: {len(df)} linhas válidas")
         return df
     
     def convert_to_product_data(self, df, column_mapping):
         """Converte DataFrame em lista de dados de produtos."""
-        products = []
-        errors = []
+        frame = self.build_product_frame(df, column_mapping)
+        return self.frame_to_products(frame), []
+    
+    def _clean_column(self, values: pd.Series) -> pd.Series:
+        """Converte a coluna em texto sem espaços nas pontas; vazios viram NA."""
+        values = values.astype('string').str.strip()
+        return values.mask(values.isin(['', 'nan', 'None']))
+    
+    def _split_column(self, values: pd.Series, separators: List[str]) -> pd.Series:
+        """
+        Divide cada valor em lista pelo primeiro separador presente no valor
+        (na ordem informada); valores sem separador viram lista de um item.
+        """
+        result = pd.Series(pd.NA, index=values.index, dtype=object)
+        remaining = values.notna()
+        for separator in separators:
+            has_separator = remaining & values.str.contains(separator, regex=False, na=False)
+            result[has_separator] = values[has_separator].str.split(rf'\s*{re.escape(separator)}\s*', regex=True)
+            remaining &= ~has_separator
+        result[remaining] = values[remaining].map(lambda value: [value])
+        return result
+    
+    def build_product_frame(self, df: pd.DataFrame, column_mapping: Dict[str, str]) -> pd.DataFrame:
+        """
+        Aplica mapeamento, limpeza e conversões em colunas inteiras.
         
-        for index, row in df.iterrows():
-            try:
-                product_data = self.row_to_product_data(row, column_mapping)
-                if product_data:
-                    products.append(product_data)
-                
-            except Exception as e:
-                errors.append(f"Linha {index + 2}: {str(e)}")
+        Equivale a row_to_product_data para cada linha, mas com operações
+        vetorizadas do pandas: uma coluna por campo padrão, tópicos e
+        palavras-chave divididos em listas, preço convertido e o
+        identificador da memória calculado como coluna ('_identifier').
+        Linhas sem SKU nem título ficam com identificador NA.
+        """
+        frame = pd.DataFrame(index=df.index)
+        for standard_field, original_col in column_mapping.items():
+            if original_col and original_col in df.columns:
+                frame[standard_field] = self._clean_column(df[original_col])
+        
+        identifier = pd.Series(pd.NA, index=df.index, dtype='string')
+        if 'title' in frame:
+            identifier = identifier.fillna('titulo_' + frame['title'].str[:100])
+        if 'sku' in frame:
+            identifier = ('sku_' + frame['sku']).fillna(identifier)
         
-        return products, errors
+        if 'bullet_points' in frame:
+            frame['bullet_points'] = self._split_column(frame['bullet_points'], [';', ','])
+        if 'keywords' in frame:
+            frame['keywords'] = self._split_column(frame['keywords'], [',', ';'])
+        if 'price' in frame:
+            # Preço convertido para float; valores não numéricos permanecem como texto
+            price = frame['price']
+            parsed = pd.to_numeric(
+                price.str.replace(',', '.', regex=False).str.replace('R$', '', regex=False).str.strip(),
+                errors='coerce'
+            )
+            frame['price'] = parsed.astype(object).where(parsed.notna(), price.astype(object))
+        
+        frame['_identifier'] = identifier
+        return frame
+    
+    def frame_to_products(self, frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Converte o frame de produtos em dicionários, omitindo campos vazios."""
+        columns = [column for column in frame.columns if not column.startswith('_')]
+        values = frame[columns].astype(object)
+        values = values.where(values.notna(), None)
+        return [
+            {field: value for field, value in zip(columns, row) if value is not None}
+            for row in values.itertuples(index=False, name=None)
+        ]
+    
+    def product_to_content(self, product_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Monta o conteúdo normalizado (formato de normalize_generated_content)
+        de um produto importado.
+        """
+        content = {
+            'titulo': None, 'descricao_produto': None, 'bullet_points': [], 'palavras_chave': [],
+            'categoria': None, 'subcategoria': None, 'marca': None, 'modelo': None, 'cor': None,
+            'tamanho': None, 'material': None, 'peso': None, 'dimensoes': None, 'outros_campos': {}
+        }
+        for field, value in product_data.items():
+            content_field = self.content_fields.get(field)
+            if content_field:
+                content[content_field] = value
+            else:
+                content['outros_campos'][field] = value
+        return content
     
     def row_to_product_data(self, row, column_mapping):
         """Converte uma linha do DataFrame em dados de produto."""
@@ -170,6 +499,8 @@ class SpreadsheetImporter:
             keywords = product_data['keywords']
             if ',' in keywords:
                 product_data['keywords'] = [kw.strip() for kw in keywords.split(',')]
+            elif ';' in keywords:
+                product_data['keywords'] = [kw.strip() for kw in keywords.split(';')]
             else:
                 product_data['keywords'] = [keywords]
         
@@ -183,93 +514,150 @@ class SpreadsheetImporter:
         
         return product_data
     
+    def _import_frame(self, frame: pd.DataFrame, stats: Dict[str, Any], force_update: bool, batch_size: int,
+                      start_row: int = 0, on_batch: Optional[Callable[[int], None]] = None):
+        """
+        Grava na memória um bloco do frame de produtos, atualizando as estatísticas.
+        
+        Args:
+            start_row: Linhas anteriores a esta já foram gravadas (retomada)
+            on_batch: Chamada após cada lote com a linha seguinte à última gravada
+        """
+        # Linhas sem identificador (sem SKU nem título)
+        valid = frame['_identifier'].notna()
+        
+        # Identificador repetido no bloco: vale a primeira linha (ou a última, ao forçar atualização);
+        # entre blocos, a verificação de existência tem o mesmo efeito
+        duplicated = frame['_identifier'].duplicated(keep='last' if force_update else 'first') & valid
+        
+        pending = frame.index >= start_row
+        frame, skip = frame[pending], (~valid | duplicated)[pending]
+        
+        # Gravação em lotes com verificação de existência e upsert em lote
+        for i in range(0, len(frame), batch_size):
+            batch_frame = frame.iloc[i:i + batch_size]
+            batch_skip = skip.iloc[i:i + batch_size]
+            stats['total_rows'] += len(batch_frame)
+            stats['skipped'] += int(batch_skip.sum())
+            batch_frame = batch_frame[~batch_skip]
+            
+            if len(batch_frame):
+                try:
+                    products = self.frame_to_products(batch_frame)
+                    result = product_memory.save_products_bulk(
+                        [
+                            (identifier, product_data, self.product_to_content(product_data))
+                            for identifier, product_data in zip(batch_frame['_identifier'], products)
+                        ],
+                        force_update=force_update,
+                        origin='spreadsheet',
+                        batch_size=batch_size
+                    )
+                    for field, count in result.items():
+                        stats[field] = stats.get(field, 0) + count
+                except Exception as e:
+                    stats['errors'] += len(batch_frame)
+                    error_msg = f"Erro nas linhas {batch_frame.index[0] + 2}-{batch_frame.index[-1] + 2}: {str(e)}"
+                    stats['error_details'].append(error_msg)
+                    logger.error(error_msg)
+            
+            if on_batch:
+                on_batch(int(frame.index[min(i + batch_size, len(frame)) - 1]) + 1)
+    
+    def _load_checkpoint(self, checkpoint_path: Optional[str], file_path: str,
+                         sheet_name: Optional[str]) -> Dict[str, Any]:
+        if not checkpoint_path:
+            return {}
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('file_path') == file_path and checkpoint.get('sheet_name') == sheet_name:
+                return checkpoint
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Checkpoint de importação inválido, recomeçando do início: {e}")
+        return {}
+    
+    def _save_checkpoint(self, checkpoint_path: str, checkpoint: Dict[str, Any]):
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(temp_path, checkpoint_path)
+    
     def import_to_memory(self, file_path: str, sheet_name: Optional[str] = None, 
-                        force_update: bool = False, batch_size: int = 100) -> Dict[str, Any]:
+                        force_update: bool = False, batch_size: int = 500,
+                        checkpoint_path: Optional[str] = None,
+                        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Importa dados da planilha para o sistema de memória inteligente.
+        
+        Com checkpoint_path, a próxima linha a gravar e as estatísticas são
+        salvas após cada lote; uma importação interrompida do mesmo arquivo
+        continua de onde parou. O checkpoint é removido ao concluir.
         """
         try:
-            start_time = datetime.now()
-            
-            # Ler planilha
-            df = self.read_spreadsheet(file_path, sheet_name)
-            
-            # Mapear colunas
-            column_mapping = self.map_columns(df)
-            
-            if not column_mapping:
-                raise ValueError("Nenhuma coluna reconhecida foi encontrada na planilha")
-            
-            # Limpar dados
-            df = self.clean_and_validate_data(df)
+            checkpoint = self._load_checkpoint(checkpoint_path, file_path, sheet_name)
+            start_time = datetime.fromisoformat(checkpoint['start_time']) if checkpoint else datetime.now()
+            next_row = checkpoint.get('next_row', 0)
+            if checkpoint:
+                logger.info(f"Retomando importação de {file_path} a partir da linha {next_row + 2}")
             
             # Estatísticas de importação
-            stats = {
-                'total_rows': len(df),
+            stats = checkpoint.get('stats') or {
+                'total_rows': 0,
                 'imported': 0,
                 'updated': 0,
+                'unchanged': 0,
                 'skipped': 0,
                 'errors': 0,
                 'error_details': []
             }
             
-            # Processar em lotes
-            for i in range(0, len(df), batch_size):
-                batch_df = df.iloc[i:i+batch_size]
+            def on_batch(row: int):
+                progress = {'processed_rows': row, **{
+                    field: value for field, value in stats.items() if field != 'error_details'
+                }}
+                if checkpoint_path:
+                    self._save_checkpoint(checkpoint_path, {
+                        'file_path': file_path,
+                        'sheet_name': sheet_name,
+                        'start_time': start_time.isoformat(),
+                        'next_row': row,
+                        'stats': stats
+                    })
+                if progress_callback:
+                    progress_callback(progress)
+            
+            # Leitura em blocos: o uso de memória não depende do tamanho do arquivo
+            column_mapping = None
+            for chunk in self.iter_spreadsheet_chunks(file_path, sheet_name):
+                # Mapear colunas (cabeçalho do primeiro bloco)
+                if column_mapping is None:
+                    column_mapping = self.map_columns(chunk)
+                    if not column_mapping:
+                        raise ValueError("Nenhuma coluna reconhecida foi encontrada na planilha")
                 
-                for idx, row in batch_df.iterrows():
-                    try:
-                        # Converter para dados de produto
-                        product_data = self.convert_to_product_data(row, column_mapping)
-                        
-                        # Verificar se tem dados mínimos necessários
-                        if not any(field in product_data for field in ['sku', 'title', 'name']):
-                            stats['skipped'] += 1
-                            continue
-                        
-                        # Extrair identificador
-                        identifier = extract_product_identifier(product_data)
-                        
-                        # Verificar se já existe
-                        exists = product_memory.exists(identifier)
-                        
-                        if exists and not force_update:
-                            stats['skipped'] += 1
-                            continue
-                        
-                        # Normalizar conteúdo
-                        normalized_content = normalize_generated_content(product_data)
-                        
-                        # Salvar na memória
-                        success = save_generated_content_to_memory(
-                            product_data=product_data,
-                            generated_content=normalized_content,
-                            force_update=force_update
-                        )
-                        
-                        if success:
-                            if exists:
-                                stats['updated'] += 1
-                            else:
-                                stats['imported'] += 1
-                        else:
-                            stats['errors'] += 1
-                            stats['error_details'].append(f"Falha ao salvar produto: {identifier}")
-                    
-                    except Exception as e:
-                        stats['errors'] += 1
-                        error_msg = f"Erro na linha {idx}: {str(e)}"
-                        stats['error_details'].append(error_msg)
-                        logger.error(error_msg)
+                # Bloco já gravado antes da interrupção
+                if not len(chunk) or chunk.index[-1] < next_row:
+                    continue
+                
+                # Limpar dados
+                chunk = self.clean_and_validate_data(chunk)
                 
-                # Log de progresso
-                processed = min(i + batch_size, len(df))
-                logger.info(f"Processadas {processed}/{len(df)} linhas")
+                # Mapeamento, limpeza e identificadores em operações vetorizadas
+                self._import_frame(self.build_product_frame(chunk, column_mapping), stats, force_update, batch_size,
+                                   start_row=next_row, on_batch=on_batch)
+                logger.info(f"Processadas {stats['total_rows']} linhas")
+            
+            if column_mapping is None:
+                raise ValueError("Nenhuma coluna reconhecida foi encontrada na planilha")
             
             end_time = datetime.now()
             processing_time = (end_time - start_time).total_seconds()
             
             stats.update({
+                'total_processed': sum(stats.get(field, 0) for field in ('imported', 'updated', 'unchanged', 'skipped', 'errors')),
                 'processing_time_seconds': processing_time,
                 'file_path': file_path,
                 'sheet_name': sheet_name,
@@ -278,7 +666,10 @@ class SpreadsheetImporter:
                 'end_time': end_time.isoformat()
             })
             
-            logger.info(f"Importação concluída: {stats['imported']} importados, {stats['updated']} atualizados, {stats['skipped']} ignorados, {stats['errors']} erros")
+            if checkpoint_path and os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            
+            logger.info(f"Importação concluída: {stats['imported']} importados, {stats['updated']} atualizados, {stats.get('unchanged', 0)} inalterados, {stats['skipped']} ignorados, {stats['errors']} erros")
             
             return stats
             
@@ -286,43 +677,132 @@ class SpreadsheetImporter:
             logger.error(f"Erro durante importação: {e}")
             raise
     
+    def import_sheets(self, file_path: str, sheet_names: Optional[List[str]] = None,
+                      force_update: bool = False, batch_size: int = 500, workers: Optional[int] = None,
+                      sheet_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Importa várias planilhas de um workbook em paralelo, uma por processo.
+        
+        Cada planilha é lida, mapeada e gravada de forma independente
+        (import_to_memory, com o upsert em lote da memória); as estatísticas
+        de cada uma são somadas em um único relatório. Os processos são
+        criados com 'spawn' (sem herdar conexões nem threads do processo
+        atual) e configuram o Django ao iniciar.
+        
+        Args:
+            file_path: Caminho do arquivo Excel
+            sheet_names: Planilhas a importar (padrão: todas)
+            workers: Processos simultâneos (padrão: uma por planilha, até o número de CPUs)
+            sheet_callback: Chamada com (planilha, estatísticas) ao fim de cada planilha
+        
+        Returns:
+            Estatísticas somadas, com as de cada planilha em 'sheets'
+        """
+        available = self.get_sheet_names(file_path)
+        if not available:
+            raise ValueError("O arquivo não tem planilhas para importar (use import_to_memory para CSV)")
+        sheet_names = sheet_names or available
+        missing = [name for name in sheet_names if name not in available]
+        if missing:
+            raise ValueError(f"Planilha(s) não encontrada(s): {', '.join(missing)}")
+        
+        start_time = datetime.now()
+        workers = max(1, min(workers or os.cpu_count() or 1, len(sheet_names)))
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        def collect(sheet_name: str, sheet_stats: Dict[str, Any]):
+            results[sheet_name] = sheet_stats
+            if sheet_callback:
+                sheet_callback(sheet_name, sheet_stats)
+        
+        if workers == 1:
+            for sheet_name in sheet_names:
+                try:
+                    collect(sheet_name, _import_sheet(file_path, sheet_name, force_update, batch_size))
+                except Exception as e:
+                    collect(sheet_name, {'error': str(e)})
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=django.setup) as executor:
+                futures = {
+                    executor.submit(_import_sheet, file_path, sheet_name, force_update, batch_size): sheet_name
+                    for sheet_name in sheet_names
+                }
+                for future in as_completed(futures):
+                    try:
+                        collect(futures[future], future.result())
+                    except Exception as e:
+                        collect(futures[future], {'error': str(e)})
+        
+        # Relatório único, na ordem das planilhas no arquivo
+        stats = {field: 0 for field in ('total_rows', 'imported', 'updated', 'unchanged', 'skipped', 'errors', 'total_processed')}
+        stats['error_details'] = []
+        stats['failed_sheets'] = []
+        for sheet_name in sheet_names:
+            sheet_stats = results[sheet_name]
+            if 'error' in sheet_stats:
+                stats['failed_sheets'].append(sheet_name)
+                stats['error_details'].append(f"Planilha {sheet_name}: {sheet_stats['error']}")
+                logger.error(f"Erro ao importar planilha {sheet_name}: {sheet_stats['error']}")
+                continue
+            for field in stats:
+                if field not in ('error_details', 'failed_sheets'):
+                    stats[field] += sheet_stats.get(field, 0)
+            stats['error_details'].extend(f"[{sheet_name}] {error}" for error in sheet_stats.get('error_details', []))
+        
+        end_time = datetime.now()
+        stats.update({
+            'processing_time_seconds': (end_time - start_time).total_seconds(),
+            'file_path': file_path,
+            'sheets': {sheet_name: results[sheet_name] for sheet_name in sheet_names},
+            'workers': workers,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat()
+        })
+        
+        logger.info(f"Importação de {len(sheet_names)} planilhas concluída: {stats['imported']} importados, {stats['updated']} atualizados, {stats['unchanged']} inalterados, {stats['errors']} erros")
+        return stats
+    
     def preview_import(self, file_path: str, sheet_name: Optional[str] = None, 
                       sample_size: int = 5) -> Dict[str, Any]:
         """
         Faz uma prévia da importação sem salvar dados.
+        
+        Lê apenas as primeiras sample_size linhas; o total de linhas é
+        estimado pelos metadados (ver estimate_total_rows), sem ler o arquivo.
         """
         try:
             # Ler apenas uma amostra
-            df = self.read_spreadsheet(file_path, sheet_name)
-            sample_df = df.head(sample_size)
+            sample_df = self.read_sample(file_path, sheet_name, sample_size)
             
             # Mapear colunas
-            column_mapping = self.map_columns(df)
+            column_mapping = self.map_columns(sample_df)
             
             # Limpar dados da amostra
             sample_df = self.clean_and_validate_data(sample_df)
             
             # Converter amostras
+            sample_frame = self.build_product_frame(sample_df, column_mapping)
             sample_products = []
-            for idx, row in sample_df.iterrows():
-                try:
-                    product_data = self.convert_to_product_data(row, column_mapping)
-                    identifier = extract_product_identifier(product_data)
-                    sample_products.append({
-                        'identifier': identifier,
-                        'data': product_data
-                    })
-                except Exception as e:
-                    sample_products.append({
-                        'error': str(e),
-                        'row_index': idx
-                    })
+            errors = []
+            for (idx, identifier), product_data in zip(sample_frame['_identifier'].items(), self.frame_to_products(sample_frame)):
+                if pd.isna(identifier):
+                    errors.append(f"Linha {idx + 2}: sem SKU nem título")
+                    continue
+                sample_products.append({
+                    'identifier': identifier,
+                    'data': product_data
+                })
             
             return {
-                'total_rows': len(df),
+                'total_rows': self.estimate_total_rows(file_path, sheet_name),
+                'total_rows_estimated': True,
                 'sample_size': len(sample_df),
+                'valid_rows': len(sample_df),
+                'identified_products': len(sample_products),
+                'errors': errors,
                 'column_mapping': column_mapping,
-                'available_columns': list(df.columns),
+                'available_columns': list(sample_df.columns),
                 'sample_products': sample_products,
                 'file_info': {
                     'path': file_path,
@@ -338,16 +818,33 @@ class SpreadsheetImporter:
     def get_sheet_names(self, file_path: str) -> List[str]:
         """
         Retorna os nomes das planilhas em um arquivo Excel.
+        
+        Em XLSX, os nomes vêm do XML do workbook, sem carregar as planilhas.
         """
         try:
-            if self.detect_file_format(file_path) == 'excel':
-                excel_file = pd.ExcelFile(file_path)
-                return excel_file.sheet_names
-            else:
+            if self.detect_file_format(file_path) != 'excel':
                 return []
+            if file_path.lower().endswith('.xls'):
+                return pd.ExcelFile(file_path).sheet_names
+            return [name for name, _ in self._xlsx_sheet_members(file_path)]
         except Exception as e:
             logger.error(f"Erro ao obter nomes das planilhas: {e}")
             return []
 
 # Instância global
-spreadsheet_importer = SpreadsheetImporter()
\ No newline at end of file
+spreadsheet_importer = SpreadsheetImporter()
+
+
+def _import_sheet(file_path: str, sheet_name: str, force_update: bool, batch_size: int) -> Dict[str, Any]:
+    """
+    Importa uma planilha do workbook (executada nos processos de import_sheets).
+    """
+    stats = spreadsheet_importer.import_to_memory(
+        file_path=file_path,
+        sheet_name=sheet_name,
+        force_update=force_update,
+        batch_size=batch_size
+    )
+    # O backup local é gravado por uma thread: esvaziar a fila antes de o processo terminar
+    product_memory.backup_store.flush()
+    return stats
\ No newline at end of file
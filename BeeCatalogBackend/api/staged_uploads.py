@@ -0,0 +1,190 @@
+# api/staged_uploads.py
+
+import time
+import uuid
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Colunas da planilha de produtos na ordem dos campos devolvidos ao frontend:
+# (campo, cabeçalho, conversão). 'strip' = texto sem espaços nas pontas,
+# 'str' = texto como está, None = valor original da célula.
+UPLOAD_COLUMNS: List[Tuple[str, str, Optional[str]]] = [
+    ('tipo_marca', 'TIPO DE MARCA', 'strip'),
+    ('nome_marca', 'MARCA:', 'strip'),
+    ('preco', 'PREÇO DE VENDA:', None),
+    ('fba_dba', 'LOGÍSTICA', 'strip'),
+    ('id_produto', 'EAN:', 'strip'),
+    ('ncm', 'NCM:', 'strip'),
+    ('quantidade', 'QUANTIDADE EM ESTOQUE PARA DBA', None),
+    ('tipo_id_produto', 'TIPO DE ID DO PRODUTO', 'strip'),
+    ('peso_pacote', 'PESO DO PACOTE: (Em gramas)', None),
+    ('c_l_a_pacote', 'COMPRIMENTO X  LARGURA X ALTURA  (DO PACOTE)', 'strip'),
+    ('peso_produto', 'PESO DO PRODUTO: (Em gramas) ', 'str'),
+    ('c_l_a_produto', 'COMPRIMENTO X  LARGURA X ALTURA (DO PRODUTO)', 'strip'),
+    ('ajuste', 'O PRODUTO É AJUSTÁVEL?', 'strip'),
+    ('tema_variacao_pai', 'TEMA DE VARIAÇÃO PAI', 'strip'),
+]
+
+
+# Campos do produto enviados na geração, na ordem do formulário do frontend
+# (createNewProduct em CriarListing.jsx); a ordem define o contexto da IA
+# (utils.format_product_context)
+PRODUCT_FIELDS = [
+    'titulo', 'sku', 'tipo_marca', 'nome_marca', 'preco', 'fba_dba', 'id_produto', 'tipo_id_produto',
+    'ncm', 'quantidade', 'peso_pacote', 'c_l_a_pacote', 'peso_produto', 'c_l_a_produto', 'ajuste'
+]
+
+
+def normalize_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Produto no formato do formulário do frontend: os mesmos campos, na
+    mesma ordem, valores vazios como '' e a lista de variações. Produtos
+    guardados no upload e produtos editados chegam à geração iguais aos do
+    envio completo (products_data).
+    """
+    normalized = {field: product.get(field) or '' for field in PRODUCT_FIELDS}
+    normalized['variacoes'] = list(product.get('variacoes') or [])
+    return normalized
+
+
+def _upload_column(df: pd.DataFrame, header: str, conversion: Optional[str]) -> pd.Series:
+    if header not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    values = df[header].fillna('')
+    if conversion is None:
+        return values
+    values = values.astype(str)
+    return values.str.strip() if conversion == 'strip' else values
+
+
+def map_upload_frame(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Converte a planilha de produtos (cabeçalhos fixos em português) nos
+    dicionários de produto usados pelo frontend e pela geração da planilha.
+
+    As conversões são feitas em colunas inteiras: linhas sem SKU são
+    descartadas, o SKU do produto pai é limpo (como em
+    utils.processar_string_produto_pai) e, sem nome do produto, o título é
+    montado com a marca (ou o tipo de marca) e o SKU.
+    """
+    sku_original = _upload_column(df, 'SKU:', 'strip')
+    df = df[sku_original != '']
+    sku_original = sku_original[df.index]
+
+    sku = (
+        sku_original.str.replace('Produto pai:', '', regex=False)
+        .str.split('Variações:').str[0]
+        .str.strip()
+    )
+
+    columns = {field: _upload_column(df, header, conversion) for field, header, conversion in UPLOAD_COLUMNS}
+    nome_base = columns['nome_marca'].where(columns['tipo_marca'] == 'Marca', columns['tipo_marca'])
+    titulo_padrao = (nome_base + ' ' + sku).where(nome_base != '', sku)
+    titulo = _upload_column(df, 'NOME DO PRODUTO', 'strip')
+    titulo = titulo.where(titulo != '', titulo_padrao)
+
+    columns = {'titulo': titulo, 'sku': sku, **columns}
+    # Registros montados a partir das listas das colunas (valores nativos do Python)
+    return [dict(zip(columns, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+
+
+class StagedUploadStore:
+    """
+    Planilhas de produtos enviadas, guardadas no servidor até a geração.
+
+    O upload é lido uma única vez; os produtos ficam no cache do Django
+    (Redis em produção) em partes de tamanho fixo sob um identificador. O
+    frontend lê os produtos em páginas e a geração recebe só o
+    identificador, em vez de reenviar o JSON completo dos produtos.
+    """
+
+    key_prefix = 'planilha_enviada'
+
+    def __init__(self):
+        self.timeout = getattr(settings, 'STAGED_UPLOAD_TIMEOUT', 6 * 3600)
+        self.part_size = getattr(settings, 'STAGED_UPLOAD_PART_SIZE', 500)
+
+    def _meta_key(self, dataset_id: str) -> str:
+        return f"{self.key_prefix}:{dataset_id}:meta"
+
+    def _part_key(self, dataset_id: str, part: int) -> str:
+        return f"{self.key_prefix}:{dataset_id}:{part}"
+
+    def create(self, products: List[Dict[str, Any]], file_name: str = '') -> Dict[str, Any]:
+        """
+        Guarda os produtos e retorna os metadados do conjunto (com 'dataset_id').
+        """
+        dataset_id = uuid.uuid4().hex
+        meta = {
+            'dataset_id': dataset_id,
+            'file_name': file_name,
+            'total': len(products),
+            'part_size': self.part_size,
+            'created_at': time.time()
+        }
+        values = {
+            self._part_key(dataset_id, start // self.part_size): products[start:start + self.part_size]
+            for start in range(0, len(products), self.part_size)
+        }
+        values[self._meta_key(dataset_id)] = meta
+        cache.set_many(values, timeout=self.timeout)
+        logger.info(f"Planilha '{file_name}' guardada como {dataset_id} ({len(products)} produtos)")
+        return meta
+
+    def get_meta(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        return cache.get(self._meta_key(dataset_id))
+
+    def _read(self, meta: Dict[str, Any], offset: int, limit: int) -> List[Dict[str, Any]]:
+        end = min(offset + limit, meta['total'])
+        if offset >= end:
+            return []
+        part_size = meta['part_size']
+        part_keys = [
+            self._part_key(meta['dataset_id'], part)
+            for part in range(offset // part_size, (end - 1) // part_size + 1)
+        ]
+        parts = cache.get_many(part_keys)
+        if len(parts) != len(part_keys):
+            raise LookupError(f"Planilha {meta['dataset_id']} incompleta no cache")
+
+        first_part = offset // part_size
+        products = [product for key in part_keys for product in parts[key]]
+        start = offset - first_part * part_size
+        return products[start:start + end - offset]
+
+    def get_page(self, dataset_id: str, page: int, limit: int) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Lê uma página de produtos (apenas as partes que a cobrem).
+
+        Returns:
+            Tupla (produtos, metadados), ou None se o conjunto expirou
+        """
+        meta = self.get_meta(dataset_id)
+        if meta is None:
+            return None
+        try:
+            return self._read(meta, (page - 1) * limit, limit), meta
+        except LookupError as e:
+            logger.warning(str(e))
+            return None
+
+    def get_all(self, dataset_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Lê todos os produtos do conjunto, ou None se expirou.
+        """
+        meta = self.get_meta(dataset_id)
+        if meta is None:
+            return None
+        try:
+            return self._read(meta, 0, meta['total'])
+        except LookupError as e:
+            logger.warning(str(e))
+            return None
+
+
+staged_uploads = StagedUploadStore()
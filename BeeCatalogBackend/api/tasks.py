@@ -23,6 +23,8 @@ from .memory_utils import (
     check_product_in_memory,
     extract_product_identifier
 )
+from .product_memory import product_memory
+from .cache_utils import ai_cache
 
 # Configurar logging estruturado
 # Remover linha duplicada do logger original
@@ -83,38 +85,52 @@ def generate_main_content_task(product_index, product_data, force_regenerate=Fal
         # Formata o contexto completo do produto
         product_context = utils.format_product_context(product_data)
         
-        # Detecta a categoria do produto
-        categoria = utils.detectar_categoria_produto(product_context)
-        print(f"INFO: [IA] Categoria detectada para produto {product_index}: {categoria}")
-        
-        # Obtém instruções específicas da categoria
-        instrucoes_categoria = utils.get_prompt_especifico_categoria(categoria)
-        
-        # Gera palavras-chave inteligentes baseadas na categoria
-        palavras_chave_sugeridas = utils.gerar_palavras_chave_inteligentes(product_context, categoria)
-        palavras_chave_str = "; ".join(palavras_chave_sugeridas)
-        
-        main_ia_chain = utils.get_main_ia_chain()
-        # Invoca a IA com o contexto completo e parâmetros aprimorados
-        parsed_content = main_ia_chain.invoke({
-            "product_context": product_context,
-            "categoria": categoria,
-            "instrucoes_categoria": instrucoes_categoria,
-            "palavras_chave_sugeridas": palavras_chave_str
-        })
+        # Camada de similaridade: reaproveita o anúncio de um produto quase idêntico
+        semantic_hit = ai_cache.semantic.lookup(product_context)
+        if semantic_hit:
+            cached_content, similarity, source_product = semantic_hit
+            data_to_return = utils.derivar_conteudo_variacao(cached_content, source_product, product_data)
+            data_to_return['_similaridade_semantica'] = round(similarity, 4)
+            print(f"INFO: [Cache Semântico] Produto {product_index} reaproveitou conteúdo similar (similaridade {similarity:.3f})")
+        else:
+            # Detecta a categoria do produto
+            categoria = utils.detectar_categoria_produto(product_context)
+            print(f"INFO: [IA] Categoria detectada para produto {product_index}: {categoria}")
+        
+            # Obtém instruções específicas da categoria
+            instrucoes_categoria = utils.get_prompt_especifico_categoria(categoria)
+        
+            # Gera palavras-chave inteligentes baseadas na categoria
+            palavras_chave_sugeridas = utils.gerar_palavras_chave_inteligentes(product_context, categoria)
+            palavras_chave_str = "; ".join(palavras_chave_sugeridas)
+        
+            main_ia_chain = utils.get_main_ia_chain()
+            # Invoca a IA com o contexto completo e parâmetros aprimorados
+            parsed_content = main_ia_chain.invoke({
+                "product_context": product_context,
+                "categoria": categoria,
+                "instrucoes_categoria": instrucoes_categoria,
+                "palavras_chave_sugeridas": palavras_chave_str
+            })
         
-        data_to_return = parsed_content.dict() if isinstance(parsed_content, BaseModel) else parsed_content
+            data_to_return = parsed_content.dict() if isinstance(parsed_content, BaseModel) else parsed_content
         
-        # Validar qualidade do conteúdo gerado
-        validacao = utils.validar_qualidade_conteudo(data_to_return, categoria)
-        print(f"INFO: [Qualidade] Produto {product_index} - Score: {validacao['score']}/100 ({validacao['qualidade']})")
-        if validacao['feedback']:
-            print(f"INFO: [Qualidade] Feedback: {'; '.join(validacao['feedback'])}")
+            # Validar qualidade do conteúdo gerado
+            validacao = utils.validar_qualidade_conteudo(data_to_return, categoria)
+            print(f"INFO: [Qualidade] Produto {product_index} - Score: {validacao['score']}/100 ({validacao['qualidade']})")
+            if validacao['feedback']:
+                print(f"INFO: [Qualidade] Feedback: {'; '.join(validacao['feedback'])}")
         
-        # Adiciona informações de qualidade ao retorno
-        data_to_return['_qualidade_score'] = validacao['score']
-        data_to_return['_qualidade_nivel'] = validacao['qualidade']
-        data_to_return['_categoria_detectada'] = categoria
+            # Adiciona informações de qualidade ao retorno
+            data_to_return['_qualidade_score'] = validacao['score']
+            data_to_return['_qualidade_nivel'] = validacao['qualidade']
+            data_to_return['_categoria_detectada'] = categoria
+            
+            ai_cache.semantic.add(
+                product_context,
+                data_to_return,
+                source={campo: product_data.get(campo) for campo in utils.CAMPOS_VARIACAO if product_data.get(campo)}
+            )
         
         # Salvar na memória
         try:
@@ -217,7 +233,7 @@ def process_chunk_task(product_index, chunk_name, product_data, temp_file_path,
 # *** FIM DA REFATORAÇÃO ***
 
 @shared_task(bind=True)
-def assemble_spreadsheet_task(self, results_list, products_data, image_urls_map, temp_file_path):
+def assemble_spreadsheet_task(self, results_list, products_data, image_urls_map, temp_file_path, variation_families=None):
     wb = None
     try:
         safe_update_state(self, 'PROGRESS', {'step': 'Montando planilha final...'})
@@ -239,6 +255,23 @@ def assemble_spreadsheet_task(self, results_list, products_data, image_urls_map,
             elif res_type:
                 organized_results[idx][res_type] = result.get('data', {})
 
+        # Filhos de famílias de variação herdam os resultados do representante
+        # (exceto os chunks com dados próprios, processados para cada filho)
+        for child_index, parent_index in (variation_families or {}).items():
+            child_index = int(child_index)
+            parent_results = organized_results[parent_index]
+            parent_product, child_product = products_data[parent_index], products_data[child_index]
+            child_results = organized_results[child_index]
+            if parent_results.get('main_content'):
+                child_results['main_content'] = utils.derivar_conteudo_variacao(
+                    parent_results['main_content'], parent_product, child_product
+                )
+            if parent_results.get('options'):
+                child_results['options'] = utils.derivar_campos_variacao(parent_results['options'], parent_product, child_product)
+            for chunk_name, chunk_data in parent_results.get('chunks', {}).items():
+                if chunk_name not in utils.CHUNKS_POR_PRODUTO:
+                    child_results['chunks'][chunk_name] = utils.derivar_campos_variacao(chunk_data, parent_product, child_product)
+
         for i, product in enumerate(products_data):
             row = 7 + i
             print(f"INFO: [Finalizador] Preenchendo linha {row} para SKU {product.get('sku')}")
@@ -358,6 +391,13 @@ def generate_spreadsheet_task(self, products_data, image_urls_map, template_path
         wb.close()
         wb = None
 
+        # Etapas de IA só para o representante de cada família de variação
+        variation_families = {}
+        if getattr(settings, 'VARIATION_FAMILY_GROUPING', False):
+            variation_families = utils.mapear_familias_variacao(products_data)
+            if variation_families:
+                print(f"INFO: [Maestra] {len(variation_families)} produtos derivados de famílias de variação (sem chamadas à IA).")
+
         # Verifica se está no modo síncrono (desenvolvimento)
         if settings.CELERY_TASK_ALWAYS_EAGER:
             # Modo síncrono: executa tarefas sequencialmente
@@ -368,16 +408,19 @@ def generate_spreadsheet_task(self, products_data, image_urls_map, template_path
             current_task = 0
             
             for i, product in enumerate(products_data):
+                # Filhos de famílias de variação só passam pelos chunks com dados próprios do produto
+                derivado = str(i) in variation_families
                 safe_update_state(self, 'PROGRESS', {'step': f'Processando produto {i+1}/{len(products_data)}...'})
                 
-                # Executa tarefas sequencialmente
-                current_task += 1
-                result = generate_main_content_task(i, product)
-                results_list.append(result)
-                
-                current_task += 1
-                result = choose_options_task(i, product, assemble_temp_path)
-                results_list.append(result)
+                if not derivado:
+                    # Executa tarefas sequencialmente
+                    current_task += 1
+                    result = generate_main_content_task(i, product)
+                    results_list.append(result)
+                    
+                    current_task += 1
+                    result = choose_options_task(i, product, assemble_temp_path)
+                    results_list.append(result)
 
                 chunk_personas = {
                     "Oferta (BR) - (Vender na Amazon)": "Especialista em dados de OFERTA...",
@@ -385,22 +428,25 @@ def generate_spreadsheet_task(self, products_data, image_urls_map, template_path
                     "Segurança e Conformidade": "Especialista em CONFORMIDADE e segurança..."
                 }
                 for name, persona in chunk_personas.items():
-                    if name in chunks:
+                    if name in chunks and (not derivado or name in utils.CHUNKS_POR_PRODUTO):
                         current_task += 1
                         result = process_chunk_task(i, name, product, assemble_temp_path, list(utils.campos_criticos), persona)
                         results_list.append(result)
             
             # Executa a tarefa final de montagem
             safe_update_state(self, 'PROGRESS', {'step': 'Montando planilha final...'})
-            final_result = assemble_spreadsheet_task(results_list, products_data, image_urls_map, assemble_temp_path)
+            final_result = assemble_spreadsheet_task(results_list, products_data, image_urls_map, assemble_temp_path, variation_families)
             return final_result
         else:
             # Modo assíncrono: usa chord (produção)
             header_tasks = []
             
             for i, product in enumerate(products_data):
-                header_tasks.append(generate_main_content_task.s(i, product))
-                header_tasks.append(choose_options_task.s(i, product, assemble_temp_path))
+                # Filhos de famílias de variação só passam pelos chunks com dados próprios do produto
+                derivado = str(i) in variation_families
+                if not derivado:
+                    header_tasks.append(generate_main_content_task.s(i, product))
+                    header_tasks.append(choose_options_task.s(i, product, assemble_temp_path))
 
                 chunk_personas = {
                     "Oferta (BR) - (Vender na Amazon)": "Especialista em dados de OFERTA...",
@@ -408,7 +454,7 @@ def generate_spreadsheet_task(self, products_data, image_urls_map, template_path
                     "Segurança e Conformidade": "Especialista em CONFORMIDADE e segurança..."
                 }
                 for name, persona in chunk_personas.items():
-                    if name in chunks:
+                    if name in chunks and (not derivado or name in utils.CHUNKS_POR_PRODUTO):
                         header_tasks.append(
                             process_chunk_task.s(i, name, product, assemble_temp_path, list(utils.campos_criticos), persona)
                         )
@@ -418,7 +464,8 @@ def generate_spreadsheet_task(self, products_data, image_urls_map, template_path
             body_task = assemble_spreadsheet_task.s(
                 products_data, 
                 image_urls_map, 
-                assemble_temp_path
+                assemble_temp_path,
+                variation_families
             )
 
             the_chord = chord(header_tasks, body_task)
@@ -789,4 +836,98 @@ def optimized_generate_spreadsheet_task(self, products_data, image_urls_map, tem
             'exc_type': type(e).__name__,
             'exc_message': str(e)
         })
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task
+def reconcile_memory_statistics_task():
+    """
+    Recalcula periodicamente os contadores das estatísticas da memória de
+    produtos, corrigindo desvios de gravações concorrentes.
+    """
+    stats = product_memory.reconcile_statistics()
+    return {'status': 'SUCCESS', 'total_products': stats.get('total_products', 0)}
+
+
+@shared_task
+def collect_content_blobs_task():
+    """
+    Remove periodicamente os blobs de conteúdo gerado que nenhum produto
+    da memória referencia mais.
+    """
+    removed = product_memory.blob_store.collect_garbage()
+    return {'status': 'SUCCESS', 'blobs_removed': removed}
+
+
+@shared_task(bind=True)
+def clear_product_memory_task(self):
+    """
+    Limpa toda a memória de produtos em segundo plano, reportando o progresso
+    (chaves do Redis e arquivos removidos) no estado da tarefa.
+    """
+    success = product_memory.clear_all_memory(
+        progress_callback=lambda progress: safe_update_state(self, 'PROGRESS', progress)
+    )
+    if not success:
+        raise RuntimeError('Falha ao limpar memória de produtos')
+    return {'status': 'SUCCESS', 'message': 'Memória de produtos limpa com sucesso'}
+
+
+@shared_task(bind=True)
+def clear_ai_cache_task(self):
+    """
+    Limpa o cache de respostas da IA em segundo plano, reportando o progresso.
+    """
+    success = ai_cache.clear_all(
+        progress_callback=lambda removed: safe_update_state(self, 'PROGRESS', {'redis_keys_removed': removed})
+    )
+    if not success:
+        raise RuntimeError('Falha ao limpar cache da IA')
+    return {'status': 'SUCCESS', 'message': 'Cache da IA limpo com sucesso'}
+
+
+@shared_task(bind=True)
+def hydrate_memory_task(self):
+    """
+    Recarrega a memória de produtos no Redis após um flush/failover,
+    reportando o progresso no estado da tarefa. Disparada na inicialização
+    dos workers quando PRODUCT_MEMORY_HYDRATE_ON_STARTUP está ativo.
+    """
+    from .memory_hydration import hydrate_memory_if_needed
+
+    result = hydrate_memory_if_needed(
+        batch_size=getattr(settings, 'PRODUCT_MEMORY_HYDRATE_BATCH_SIZE', 500),
+        rate_limit=getattr(settings, 'PRODUCT_MEMORY_HYDRATE_RATE_LIMIT', 0),
+        progress_callback=lambda progress: safe_update_state(self, 'PROGRESS', progress)
+    )
+    if result is None:
+        return {'status': 'SUCCESS', 'message': 'Hidratação da memória não necessária'}
+    return {'status': 'SUCCESS', **result}
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def import_spreadsheet_task(self, file_path, sheet_name=None, force_update=False, batch_size=500):
+    """
+    Importa uma planilha enviada para a memória de produtos, reportando o
+    progresso no estado da tarefa. O checkpoint fica ao lado do arquivo:
+    se o worker cair, a mensagem é reentregue e a importação continua da
+    última linha gravada.
+    """
+    from .spreadsheet_importer import spreadsheet_importer
+
+    checkpoint_path = f"{file_path}.checkpoint.json"
+    try:
+        stats = spreadsheet_importer.import_to_memory(
+            file_path=file_path,
+            sheet_name=sheet_name,
+            force_update=force_update,
+            batch_size=batch_size,
+            checkpoint_path=checkpoint_path,
+            progress_callback=lambda progress: safe_update_state(self, 'PROGRESS', progress)
+        )
+    finally:
+        # Erro comum encerra a importação; só a queda do worker deixa o arquivo para a retomada
+        for path in (file_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return {'status': 'SUCCESS', **stats}
@@ -1,3 +1,1095 @@
-from django.test import TestCase
+import os
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.utils import timezone
+import fakeredis
+import pandas as pd
+from django.test import SimpleTestCase, TestCase, override_settings
+from openpyxl import Workbook
+
+from . import local_cache, memory_hydration, redis_shards, utils
+from .backup_store import BackupStore
+from .bloom_filter import BloomFilter
+from .memory_utils import export_memory_parquet
+from .models import RememberedProduct
+from .product_memory import product_memory
+from .semantic_cache import SemanticCache
+from .spreadsheet_importer import spreadsheet_importer
+from .staged_uploads import PRODUCT_FIELDS, map_upload_frame, normalize_product, staged_uploads
+
+
+class IsolatedMemoryMixin:
+    """
+    Memória de produtos isolada por teste: backup SQLite e arquivos JSON em
+    um diretório temporário, sem Redis (como em DEBUG), caches vazios e
+    filtro de Bloom descartado.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp(prefix='beecatalog_test_')
+        self._original_backup_store = product_memory.backup_store
+        self._original_memory_dir = product_memory.memory_dir
+        self._original_redis_client = product_memory.redis_client
+        product_memory.redis_client = None
+        product_memory.backup_store = BackupStore(os.path.join(self.temp_dir, 'backup.sqlite3'))
+        product_memory.memory_dir = os.path.join(self.temp_dir, 'produtos')
+        self._reset_caches()
+
+    def tearDown(self):
+        product_memory.backup_store.flush()
+        product_memory.backup_store = self._original_backup_store
+        product_memory.memory_dir = self._original_memory_dir
+        product_memory.redis_client = self._original_redis_client
+        self._reset_caches()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().tearDown()
+
+    def _reset_caches(self):
+        cache.clear()
+        product_memory.local_cache.clear()
+        product_memory._membership_filter = None
+        product_memory._membership_built_at = 0.0
+
+    def write_xlsx(self, rows, name='produtos.xlsx'):
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in rows:
+            sheet.append(row)
+        path = os.path.join(self.temp_dir, name)
+        workbook.save(path)
+        return path
+
+
+class SpreadsheetImportTests(IsolatedMemoryMixin, TestCase):
+
+    def test_xlsx_empty_cells_are_missing_values(self):
+        """Células vazias não viram o texto 'None' nem o identificador sku_None."""
+        path = self.write_xlsx([
+            ['SKU', 'Título', 'Marca', 'Preço'],
+            ['PROD001', 'Produto A', None, '10,50'],
+            [None, 'Produto B', 'Marca B', None],
+            [None, 'Produto C', None, None],
+            [None, None, 'Só marca', None],
+        ])
+
+        stats = spreadsheet_importer.import_to_memory(path)
+
+        self.assertEqual(stats['imported'], 3)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(stats['errors'], 0)
+        self.assertIsNone(product_memory.get_product_data('sku_None'))
+
+        product_a = product_memory.get_product_data('sku_PROD001')['product_data']
+        self.assertEqual(product_a, {'sku': 'PROD001', 'title': 'Produto A', 'price': 10.5})
+        product_b = product_memory.get_product_data('titulo_Produto B')['product_data']
+        self.assertEqual(product_b, {'title': 'Produto B', 'brand': 'Marca B'})
+        product_c = product_memory.get_product_data('titulo_Produto C')['product_data']
+        self.assertEqual(product_c, {'title': 'Produto C'})
+
+    def test_xlsx_sample_has_no_none_text(self):
+        path = self.write_xlsx([['SKU', 'Título'], [None, 'Produto A']])
+
+        sample = spreadsheet_importer.clean_and_validate_data(spreadsheet_importer.read_sample(path))
+
+        self.assertTrue(sample['SKU'].isna().all())
+
+
+class ParquetExportTests(IsolatedMemoryMixin, TestCase):
+
+    def test_parquet_round_trip_keeps_records_unchanged(self):
+        """Reimportar a exportação Parquet não altera nenhum registro (peso e preço em texto livre)."""
+        path = self.write_xlsx([
+            ['SKU', 'Título', 'Preço', 'Peso', 'Palavras_chave', 'Características'],
+            ['PROD001', 'Produto A', '10,50', '500g', 'casa, jardim', 'leve; resistente'],
+            ['PROD002', 'Produto B', 'sob consulta', '1,5 kg', None, None],
+            [None, 'Produto C', '7', '2', 'único', None],
+        ])
+        spreadsheet_importer.import_to_memory(path)
+        identifiers = ['sku_PROD001', 'sku_PROD002', 'titulo_Produto C']
+        before = {
+            identifier: product_memory.get_product_data(identifier)['product_data'] for identifier in identifiers
+        }
+        self.assertEqual(before['sku_PROD002']['weight'], '1,5 kg')
+
+        parquet_path = os.path.join(self.temp_dir, 'memoria.parquet')
+        self.assertEqual(export_memory_parquet(parquet_path), 3)
+        stats = spreadsheet_importer.import_to_memory(parquet_path)
+
+        self.assertEqual(stats['unchanged'], 3)
+        self.assertEqual(stats['updated'] + stats['imported'] + stats['errors'], 0)
+        self._reset_caches()
+        for identifier in identifiers:
+            self.assertEqual(product_memory.get_product_data(identifier)['product_data'], before[identifier])
+
+
+class LegacyBlobGarbageCollectionTests(IsolatedMemoryMixin, TestCase):
+    """Coleta de lixo dos blobs no modo legado (contagens no Redis, sem banco)."""
+
+    def setUp(self):
+        super().setUp()
+        self._original_db_enabled = product_memory.db_enabled
+        product_memory.db_enabled = False
+        product_memory.redis_client = fakeredis.FakeRedis()
+        self.blob_store = product_memory.blob_store
+
+    def tearDown(self):
+        product_memory.db_enabled = self._original_db_enabled
+        super().tearDown()
+
+    def store_unreferenced(self, content):
+        content_hash = self.blob_store.content_hash(content)
+        self.blob_store.store({content_hash: content})
+        self.blob_store.adjust_references({content_hash: 1})
+        self.blob_store.adjust_references({content_hash: -1})
+        return content_hash
+
+    def age(self, content_hash, seconds):
+        product_memory.redis_client.hset(
+            self.blob_store.refs_key, self.blob_store._touched_field(content_hash), time.time() - seconds
+        )
+
+    def test_recent_unreferenced_blob_is_kept(self):
+        content_hash = self.store_unreferenced({'titulo': 'Recente'})
+
+        self.assertEqual(self.blob_store.collect_garbage(grace_period=3600), 0)
+        self.assertEqual(self.blob_store.fetch([content_hash]), {content_hash: {'titulo': 'Recente'}})
+
+    def test_old_unreferenced_blob_is_removed(self):
+        content_hash = self.store_unreferenced({'titulo': 'Antigo'})
+        self.age(content_hash, 7200)
+
+        self.assertEqual(self.blob_store.collect_garbage(grace_period=3600), 1)
+        self.assertEqual(self.blob_store.fetch([content_hash]), {})
+        self.assertEqual(product_memory.redis_client.hgetall(self.blob_store.refs_key), {})
+
+    def test_blob_without_timestamp_waits_for_next_collection(self):
+        content_hash = self.store_unreferenced({'titulo': 'Sem horário'})
+        product_memory.redis_client.hdel(self.blob_store.refs_key, self.blob_store._touched_field(content_hash))
+
+        self.assertEqual(self.blob_store.collect_garbage(grace_period=3600), 0)
+        touched = product_memory.redis_client.hget(self.blob_store.refs_key, self.blob_store._touched_field(content_hash))
+        self.assertAlmostEqual(float(touched), time.time(), delta=60)
+
+    def test_reference_added_during_collection_keeps_blob(self):
+        content_hash = self.store_unreferenced({'titulo': 'Disputado'})
+        self.age(content_hash, 7200)
+        redis_client = product_memory.redis_client
+        original_mget = redis_client.mget
+
+        def mget_with_concurrent_write(*args, **kwargs):
+            # Outro processo volta a referenciar o blob depois da listagem dos candidatos
+            self.blob_store.store({content_hash: {'titulo': 'Disputado'}})
+            self.blob_store.adjust_references({content_hash: 1})
+            return original_mget(*args, **kwargs)
+
+        redis_client.mget = mget_with_concurrent_write
+        try:
+            removed = self.blob_store.collect_garbage(grace_period=3600)
+        finally:
+            redis_client.mget = original_mget
+
+        self.assertEqual(removed, 0)
+        self.assertEqual(self.blob_store.fetch([content_hash]), {content_hash: {'titulo': 'Disputado'}})
+
+
+class MembershipFilterTests(SimpleTestCase):
+    """Reconstrução do filtro de Bloom da memória fora do caminho da consulta."""
+
+    def setUp(self):
+        self._original_filter = product_memory._membership_filter
+        self._original_built_at = product_memory._membership_built_at
+        self.release_build = threading.Event()
+        self.build_finished = threading.Event()
+
+        def slow_build():
+            self.release_build.wait(5)
+            membership = BloomFilter(capacity=1000)
+            membership.update(['product_memory:existente'])
+            return membership
+
+        self._original_build = product_memory._build_membership_filter
+        product_memory._build_membership_filter = slow_build
+        product_memory._membership_filter = None
+        product_memory._membership_built_at = 0.0
+
+    def tearDown(self):
+        self.release_build.set()
+        self.wait_rebuild()
+        del product_memory._build_membership_filter
+        product_memory._membership_filter = self._original_filter
+        product_memory._membership_built_at = self._original_built_at
+
+    def wait_rebuild(self):
+        # A thread libera o lock ao terminar
+        self.assertTrue(product_memory._membership_lock.acquire(timeout=5))
+        product_memory._membership_lock.release()
+
+    def test_lookup_does_not_wait_for_rebuild(self):
+        started = time.monotonic()
+        self.assertIsNone(product_memory._get_membership_filter())
+        self.assertLess(time.monotonic() - started, 1)
+
+        product_memory._add_membership('product_memory:gravado_durante')
+        self.release_build.set()
+        self.wait_rebuild()
+
+        membership = product_memory._get_membership_filter()
+        self.assertIn('product_memory:existente', membership)
+        self.assertIn('product_memory:gravado_durante', membership)
+        self.assertNotIn('product_memory:ausente', membership)
+
+    def test_expired_filter_is_served_while_rebuilding(self):
+        previous = BloomFilter(capacity=1000)
+        product_memory._membership_filter = previous
+
+        self.assertIs(product_memory._get_membership_filter(), previous)
+
+        self.release_build.set()
+        self.wait_rebuild()
+        self.assertIsNot(product_memory._get_membership_filter(), previous)
+
+
+class VariationFamilyTests(SimpleTestCase):
+    """Derivação do conteúdo dos filhos de uma família de variação."""
+
+    pai = {'sku': 'CAM01', 'titulo': 'Camiseta', 'cor': 'Azul', 'tamanho': 'P', 'peso_produto': '2'}
+    filho = {'sku': 'CAM01-M', 'titulo': 'Camiseta', 'cor': 'Vermelho', 'tamanho': 'M', 'peso_produto': '3'}
+
+    def test_short_size_only_replaced_at_the_end_of_title(self):
+        conteudo = utils.derivar_conteudo_variacao({'titulo': 'Camiseta P&B Azul Tamanho P'}, self.pai, self.filho)
+
+        self.assertEqual(conteudo['titulo'], 'Camiseta P&B Vermelho Tamanho M')
+
+    def test_numbers_in_title_are_not_treated_as_weight(self):
+        conteudo = utils.derivar_conteudo_variacao({'titulo': 'Kit 2 Camisetas Azul P'}, self.pai, self.filho)
+
+        self.assertEqual(conteudo['titulo'], 'Kit 2 Camisetas Vermelho M')
+
+    def test_only_title_is_changed_in_main_content(self):
+        conteudo_pai = {
+            'titulo': 'Camiseta Azul P',
+            'descricao_produto': 'Tecido P2 com 2 camadas, tamanho P',
+            'bullet_points': [{'bullet_point': 'Cabe 2 pessoas'}],
+        }
+
+        conteudo = utils.derivar_conteudo_variacao(conteudo_pai, self.pai, self.filho)
+
+        self.assertEqual(conteudo['titulo'], 'Camiseta Vermelho M')
+        self.assertEqual(conteudo['descricao_produto'], conteudo_pai['descricao_produto'])
+        self.assertEqual(conteudo['bullet_points'], conteudo_pai['bullet_points'])
+        self.assertEqual(conteudo_pai['titulo'], 'Camiseta Azul P')
+
+    def test_missing_size_is_appended_to_title(self):
+        conteudo = utils.derivar_conteudo_variacao({'titulo': 'Camiseta Básica'}, self.pai, self.filho)
+
+        self.assertEqual(conteudo['titulo'], 'Camiseta Básica - Vermelho - M')
+
+    def test_only_variation_fields_are_replaced_in_choices(self):
+        escolhas = {
+            'color_name#1.value': 'Azul',
+            'size_name': 'P',
+            'included_components1': 'P',
+            'item_type_name': 'Camiseta Azul',
+            'number_of_items': '2',
+        }
+
+        derivadas = utils.derivar_campos_variacao(escolhas, self.pai, self.filho)
+
+        self.assertEqual(derivadas, {
+            'color_name#1.value': 'Vermelho',
+            'size_name': 'M',
+            'included_components1': 'P',
+            'item_type_name': 'Camiseta Azul',
+            'number_of_items': '2',
+        })
+
+
+class StagedUploadTests(SimpleTestCase):
+    """Planilha de produtos guardada no servidor no upload."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='beecatalog_test_')
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def upload(self, rows):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Planilha de produtos'])
+        for row in rows:
+            sheet.append(row)
+        path = os.path.join(self.temp_dir, 'produtos.xlsx')
+        workbook.save(path)
+        with open(path, 'rb') as planilha:
+            return self.client.post('/api/upload-planilha/', {'planilha': planilha})
+
+    def test_staged_products_use_form_shape(self):
+        """Produtos guardados têm os campos e a ordem do formulário (createNewProduct), sem vazios falsos."""
+        response = self.upload([
+            ['SKU:', 'NOME DO PRODUTO', 'PREÇO DE VENDA:', 'QUANTIDADE EM ESTOQUE PARA DBA', 'TEMA DE VARIAÇÃO PAI'],
+            ['CAM01', 'Camiseta', 49.9, 0, 'SizeColor'],
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        staged = staged_uploads.get_all(response.json()['dataset_id'])
+        self.assertEqual(list(staged[0]), PRODUCT_FIELDS + ['variacoes'])
+        self.assertEqual(staged[0]['preco'], 49.9)
+        self.assertEqual(staged[0]['quantidade'], '')
+        self.assertEqual(staged[0]['variacoes'], [])
+        self.assertEqual(response.json()['products'], staged)
+
+    def test_edited_product_is_normalized_like_staged(self):
+        editado = {'id': 1700000000000, 'sku': 'CAM01', 'titulo': 'Camiseta', 'ncm': None, 'variacoes': [{'sku': 'CAM01-P'}]}
+
+        normalizado = normalize_product(editado)
+
+        self.assertEqual(list(normalizado), PRODUCT_FIELDS + ['variacoes'])
+        self.assertEqual(normalizado['ncm'], '')
+        self.assertEqual(normalizado['variacoes'], [{'sku': 'CAM01-P'}])
+
+
+class SemanticCacheTests(SimpleTestCase):
+    """Índice de similaridade do cache da IA (Redis simulado com fakeredis)."""
+
+    vectors = {
+        'camiseta azul algodao': [1.0, 0.0, 0.0, 0.0],
+        'camiseta azul algodao p': [0.99, 0.1, 0.0, 0.0],
+        'furadeira eletrica': [0.0, 0.0, 1.0, 0.0],
+    }
+
+    def setUp(self):
+        ai_cache = SimpleNamespace(cache_prefix='ai_response_teste', redis_client=fakeredis.FakeRedis(), default_timeout=60)
+        self.semantic = SemanticCache(ai_cache)
+        self.semantic.enabled = True
+        self.semantic.threshold = 0.9
+        self.semantic._embed_function = lambda text: self.vectors[text]
+
+    def wait_rebuild(self):
+        self.assertTrue(self.semantic._rebuild_lock.acquire(timeout=5))
+        self.semantic._rebuild_lock.release()
+
+    def test_add_does_not_duplicate_indexed_context(self):
+        self.semantic.add('Camiseta azul algodão', {'titulo': 'A'})
+        self.semantic.add('camiseta AZUL algodao', {'titulo': 'B'})
+
+        self.assertEqual(self.semantic._index.ntotal, 1)
+        self.assertEqual(self.semantic.get_stats()['indexed_entries'], 1)
+
+    def test_index_is_built_in_background_from_redis(self):
+        # Entradas gravadas por outro processo: este ainda não tem índice
+        other = SemanticCache(self.semantic.cache)
+        other.enabled = True
+        other._embed_function = self.semantic._embed_function
+        other.add('Camiseta azul algodão', {'titulo': 'Camiseta Azul'})
+        other.add('Furadeira elétrica', {'titulo': 'Furadeira'})
+
+        self.assertIsNone(self.semantic.lookup('Camiseta azul algodão P'))
+        self.wait_rebuild()
+
+        response, score, _ = self.semantic.lookup('Camiseta azul algodão P')
+        self.assertEqual(response, {'titulo': 'Camiseta Azul'})
+        self.assertGreater(score, 0.9)
+        self.assertEqual(self.semantic._index.ntotal, 2)
+
+    def test_reset_discards_running_rebuild(self):
+        self.semantic.add('Furadeira elétrica', {'titulo': 'Furadeira'})
+        release_build = threading.Event()
+        build_index = self.semantic._build_index
+
+        def slow_build():
+            release_build.wait(5)
+            return build_index()
+
+        self.semantic._build_index = slow_build
+        self.semantic._schedule_rebuild()
+        self.semantic.reset()
+        release_build.set()
+        self.wait_rebuild()
+
+        self.assertIsNone(self.semantic._index)
+
+
+def legacy_upload_rows(df):
+    """Mapeamento linha a linha da planilha de produtos (implementação anterior a map_upload_frame)."""
+    produtos = []
+    for linha in df.fillna('').to_dict('records'):
+        sku_original = str(linha.get("SKU:", "")).strip()
+        if not sku_original:
+            continue
+        sku = utils.processar_string_produto_pai(sku_original)
+        titulo = str(linha.get("NOME DO PRODUTO", "")).strip()
+        if not titulo:
+            tipo_marca = str(linha.get("TIPO DE MARCA", "")).strip()
+            marca = str(linha.get("MARCA:", "")).strip()
+            nome_base = marca if tipo_marca == "Marca" else tipo_marca
+            titulo = f"{nome_base} {sku}" if nome_base else sku
+        produtos.append({
+            "titulo": titulo,
+            "sku": sku,
+            "tipo_marca": str(linha.get("TIPO DE MARCA", "")).strip(),
+            "nome_marca": str(linha.get("MARCA:", "")).strip(),
+            "preco": linha.get("PREÇO DE VENDA:", ""),
+            "fba_dba": str(linha.get("LOGÍSTICA", "")).strip(),
+            "id_produto": str(linha.get("EAN:", "")).strip(),
+            "ncm": str(linha.get("NCM:", "")).strip(),
+            "quantidade": linha.get("QUANTIDADE EM ESTOQUE PARA DBA", ""),
+            "tipo_id_produto": str(linha.get("TIPO DE ID DO PRODUTO", "")).strip(),
+            "peso_pacote": linha.get("PESO DO PACOTE: (Em gramas)", ""),
+            "c_l_a_pacote": str(linha.get("COMPRIMENTO X  LARGURA X ALTURA  (DO PACOTE)", "")).strip(),
+            "peso_produto": str(linha.get("PESO DO PRODUTO: (Em gramas) ", "")),
+            "c_l_a_produto": str(linha.get("COMPRIMENTO X  LARGURA X ALTURA (DO PRODUTO)", "")).strip(),
+            "ajuste": str(linha.get("O PRODUTO É AJUSTÁVEL?", "")).strip(),
+            "tema_variacao_pai": str(linha.get("TEMA DE VARIAÇÃO PAI", "")).strip()
+        })
+    return produtos
+
+
+class VectorizedMappingTests(SimpleTestCase):
+    """Mapeamentos vetorizados equivalentes às implementações linha a linha."""
+
+    def test_build_product_frame_matches_row_to_product_data(self):
+        df = pd.DataFrame({
+            'SKU': ['A1', ' B2 ', None, None, 'E5', 'F6'],
+            'Título': ['Produto A', 'Produto B', 'Produto C', None, '  ', 'Produto F'],
+            'Marca': ['Marca A', None, 'Marca C', 'Só marca', None, 'nan'],
+            'Preço': ['R$ 10,50', '1.234,56', 'sob consulta', '5', None, '7.25'],
+            'Palavras_chave': ['casa, jardim', 'um; dois', 'único', None, 'a;b, c', None],
+            'Características': ['leve; forte', 'um, dois', None, None, 'x', 'y ;z'],
+        }, dtype=object)
+        df = spreadsheet_importer.clean_and_validate_data(df)
+        mapping = spreadsheet_importer.map_columns(df)
+
+        frame = spreadsheet_importer.build_product_frame(df, mapping)
+        products = spreadsheet_importer.frame_to_products(frame)
+
+        for (_, row), identifier, product in zip(df.iterrows(), frame['_identifier'], products):
+            expected = spreadsheet_importer.row_to_product_data(row, mapping)
+            if expected is None:
+                self.assertTrue(pd.isna(identifier))
+                continue
+            self.assertEqual(product, expected)
+            if expected.get('sku'):
+                self.assertEqual(identifier, f"sku_{expected['sku']}")
+            else:
+                self.assertEqual(identifier, f"titulo_{expected['title'][:100]}")
+
+    def test_map_upload_frame_matches_row_mapping(self):
+        df = pd.DataFrame({
+            'SKU:': ['Produto pai: CAM01 Variações: P, M', 'CAM02', None, '  ', 'CAM03'],
+            'NOME DO PRODUTO': [None, 'Camiseta Lisa', 'Sem SKU', None, ''],
+            'TIPO DE MARCA': ['Marca', 'Genérico', None, None, 'Genérico'],
+            'MARCA:': ['Bee', None, None, None, 'Outra'],
+            'PREÇO DE VENDA:': [49.9, None, 10, None, 0],
+            'QUANTIDADE EM ESTOQUE PARA DBA': [3, 0, None, None, None],
+            'PESO DO PRODUTO: (Em gramas) ': [200, None, None, None, '1,5 kg'],
+            'EAN:': [' 789 ', None, None, None, None],
+        })
+
+        self.assertEqual(map_upload_frame(df), legacy_upload_rows(df))
+
+
+class ImportCountingTests(IsolatedMemoryMixin, TestCase):
+    """Contagens da importação: novos, atualizados, inalterados e ignorados."""
+
+    def write_csv(self, rows, name='produtos.csv'):
+        path = os.path.join(self.temp_dir, name)
+        pd.DataFrame(rows, columns=['sku', 'titulo', 'marca', 'preco']).to_csv(path, index=False)
+        return path
+
+    rows = [
+        ['P1', 'Produto 1', 'Marca', '10'],
+        ['P2', 'Produto 2', 'Marca', '20'],
+        ['P1', 'Produto 1 repetido', 'Marca', '11'],
+        [None, None, 'Sem identificador', '5'],
+        [None, 'Produto 5', None, None],
+        ['P6', 'Produto 6', 'Marca', '60'],
+        ['P7', 'Produto 7', 'Marca', '70'],
+    ]
+
+    @staticmethod
+    def counts(stats):
+        return {field: stats[field] for field in ('total_rows', 'imported', 'updated', 'unchanged', 'skipped', 'errors')}
+
+    def test_unchanged_updated_and_skipped_counts(self):
+        path = self.write_csv(self.rows)
+
+        first = spreadsheet_importer.import_to_memory(path, batch_size=3)
+        self.assertEqual(self.counts(first), {
+            'total_rows': 7, 'imported': 5, 'updated': 0, 'unchanged': 0, 'skipped': 2, 'errors': 0
+        })
+
+        changed = [list(row) for row in self.rows]
+        changed[1][3] = '25'
+        second = spreadsheet_importer.import_to_memory(self.write_csv(changed, 'alterada.csv'), batch_size=3)
+        self.assertEqual(self.counts(second), {
+            'total_rows': 7, 'imported': 0, 'updated': 1, 'unchanged': 4, 'skipped': 2, 'errors': 0
+        })
+        self.assertEqual(product_memory.get_product_data('sku_P2')['product_data']['price'], 25.0)
+        # Identificador repetido: vale a primeira linha
+        self.assertEqual(product_memory.get_product_data('sku_P1')['product_data']['title'], 'Produto 1')
+
+    def test_resumed_import_matches_uninterrupted_run(self):
+        path = self.write_csv(self.rows)
+        uninterrupted = self.counts(spreadsheet_importer.import_to_memory(path, batch_size=2))
+        self.assertTrue(product_memory.clear_all_memory())
+        self._reset_caches()
+
+        checkpoint_path = os.path.join(self.temp_dir, 'importacao.checkpoint.json')
+
+        def interrupt(progress):
+            if progress['processed_rows'] >= 4:
+                raise RuntimeError('interrompida')
+
+        with self.assertRaises(RuntimeError):
+            spreadsheet_importer.import_to_memory(path, batch_size=2, checkpoint_path=checkpoint_path,
+                                                  progress_callback=interrupt)
+        self.assertTrue(os.path.exists(checkpoint_path))
+
+        resumed = spreadsheet_importer.import_to_memory(path, batch_size=2, checkpoint_path=checkpoint_path)
+
+        self.assertEqual(self.counts(resumed), uninterrupted)
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+
+class KeysetPaginationTests(IsolatedMemoryMixin, TestCase):
+    """Paginação por cursor com empates em created_at."""
+
+    def setUp(self):
+        super().setUp()
+        identifiers = [f"sku_P{index:02d}" for index in range(11)]
+        product_memory.save_products_bulk([
+            (identifier, {'sku': identifier[4:], 'title': f"Produto {identifier[4:]}"}, {})
+            for identifier in identifiers
+        ])
+        # Três grupos com o mesmo created_at, maiores que uma página
+        base = timezone.now().replace(microsecond=0)
+        for position, identifier in enumerate(identifiers):
+            RememberedProduct.objects.filter(product_identifier=identifier).update(
+                created_at=base - timedelta(seconds=position // 4)
+            )
+        self.expected = list(
+            RememberedProduct.objects.order_by('-created_at', '-product_identifier')
+            .values_list('product_identifier', flat=True)
+        )
+        self.assertEqual(len(self.expected), len(identifiers))
+
+    def walk(self, limit):
+        pages, cursor = [], ''
+        while True:
+            page = product_memory.query_products_page(cursor=cursor, limit=limit, summary=True)
+            pages.append(page)
+            if not page['next_cursor']:
+                return pages
+            cursor = page['next_cursor']
+
+    def test_next_cursors_visit_every_record_once(self):
+        for limit in (1, 3, 5):
+            pages = self.walk(limit)
+            identifiers = [record['identifier'] for page in pages for record in page['records']]
+            self.assertEqual(identifiers, self.expected)
+            self.assertEqual(pages[0]['total_items'], len(self.expected))
+
+    def test_prev_cursor_returns_the_previous_page(self):
+        pages = self.walk(3)
+        for previous, current in zip(pages, pages[1:]):
+            page = product_memory.query_products_page(cursor=current['prev_cursor'], limit=3, summary=True)
+            self.assertEqual(page['records'], previous['records'])
+        self.assertIsNone(pages[0]['prev_cursor'])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            product_memory.query_products_page(cursor='invalido')
+
+
+class ShardedRedisTests(SimpleTestCase):
+    """Distribuição das chaves entre os nós e leitura durante o resharding."""
+
+    old_urls = ['redis://shard-a/0', 'redis://shard-b/0']
+    new_urls = ['redis://shard-a/0', 'redis://shard-b/0', 'redis://shard-c/0']
+
+    def setUp(self):
+        servers = {}
+
+        def from_url(url):
+            return fakeredis.FakeRedis(server=servers.setdefault(url, fakeredis.FakeServer()))
+
+        patcher = mock.patch.object(redis_shards.redis, 'from_url', side_effect=from_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.keys = [f"product_memory:sku_{index}" for index in range(300)]
+
+    def test_ring_placement_is_stable_and_balanced(self):
+        ring = redis_shards.HashRing(self.old_urls)
+        placement = {key: ring.get_node(key) for key in self.keys}
+
+        self.assertEqual(placement, {key: redis_shards.HashRing(self.old_urls).get_node(key) for key in self.keys})
+        self.assertEqual(ring.get_node(self.keys[0].encode('utf-8')), placement[self.keys[0]])
+        for url in self.old_urls:
+            self.assertGreater(list(placement.values()).count(url), len(self.keys) // 4)
+
+        # Um nó novo só recebe chaves: nenhuma troca entre os nós antigos
+        grown = redis_shards.HashRing(self.new_urls)
+        moved = [key for key in self.keys if grown.get_node(key) != placement[key]]
+        self.assertTrue(all(grown.get_node(key) == self.new_urls[2] for key in moved))
+        self.assertLess(len(moved), len(self.keys) // 2)
+
+    def test_commands_go_to_the_owner_node(self):
+        client = redis_shards.ShardedRedis(self.old_urls)
+        pipeline = client.pipeline()
+        for key in self.keys:
+            pipeline.set(key, key)
+        pipeline.execute()
+
+        for key in self.keys[:20]:
+            owner = client.ring.get_node(key)
+            self.assertEqual(client.clients[owner].get(key), key.encode('utf-8'))
+            for url in self.old_urls:
+                if url != owner:
+                    self.assertIsNone(client.clients[url].get(key))
+        self.assertEqual(client.mget(self.keys), [key.encode('utf-8') for key in self.keys])
+        self.assertEqual(client.exists(*self.keys), len(self.keys))
+
+    def test_reads_fall_back_to_previous_ring_until_resharded(self):
+        old_client = redis_shards.ShardedRedis(self.old_urls)
+        for key in self.keys:
+            old_client.setex(key, 3600, key)
+
+        client = redis_shards.ShardedRedis(self.new_urls, previous_urls=self.old_urls)
+        moved = [key for key in self.keys if client.ring.get_node(key) != old_client.ring.get_node(key)]
+        self.assertTrue(moved)
+
+        # Antes do resharding, as chaves fora do lugar ainda são lidas no dono antigo
+        self.assertIsNone(client.client_for(moved[0]).get(moved[0]))
+        self.assertEqual(client.get(moved[0]), moved[0].encode('utf-8'))
+        self.assertEqual(client.mget(self.keys), [key.encode('utf-8') for key in self.keys])
+
+        self.assertEqual(client.reshard('product_memory:*', batch_size=50), len(moved))
+        self.assertEqual(client.reshard('product_memory:*', batch_size=50), 0)
+        for key in moved:
+            self.assertEqual(client.client_for(key).get(key), key.encode('utf-8'))
+            self.assertGreater(client.client_for(key).ttl(key), 0)
+            self.assertIsNone(old_client.client_for(key).get(key))
+        self.assertEqual(client.mget(self.keys), [key.encode('utf-8') for key in self.keys])
+
+    def test_delete_removes_copies_left_on_previous_node(self):
+        old_client = redis_shards.ShardedRedis(self.old_urls)
+        client = redis_shards.ShardedRedis(self.new_urls, previous_urls=self.old_urls)
+        key = next(key for key in self.keys if client.ring.get_node(key) != old_client.ring.get_node(key))
+        old_client.set(key, 'antigo')
+
+        self.assertEqual(client.delete(key), 1)
+        self.assertIsNone(client.get(key))
+
+
+class ClearIACacheViewTests(SimpleTestCase):
+    """A limpeza do cache da IA é enfileirada e acompanhada pelo job_id."""
+
+    def test_returns_accepted_with_job_id(self):
+        with mock.patch.object(utils, 'limpar_cache_ia'), \
+                mock.patch('api.views.clear_ai_cache_task') as task:
+            task.delay.return_value = SimpleNamespace(id='job-123')
+            response = self.client.post('/api/limpar-cache-ia/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job_id'], 'job-123')
+        self.assertEqual(response.json()['status'], 'PENDING')
+        task.delay.assert_called_once_with()
+
+
+class StatisticsCountersTests(IsolatedMemoryMixin, TestCase):
+    """Contadores das estatísticas no Redis e sua reconciliação."""
+
+    def setUp(self):
+        super().setUp()
+        product_memory.redis_client = fakeredis.FakeRedis()
+
+    def save(self, *skus):
+        product_memory.save_products_bulk([(f"sku_{sku}", {'sku': sku, 'title': f"Produto {sku}"}, {}) for sku in skus])
+
+    def test_counters_recreated_after_redis_flush_are_reconciled(self):
+        self.save('A', 'B', 'C')
+        self.assertEqual(product_memory.get_statistics()['total_products'], 3)
+
+        # Restart do Redis: a próxima gravação recria o hash só com o seu incremento
+        product_memory.redis_client.flushall()
+        self.save('D')
+        self.assertNotIn(b'reconciled_at', product_memory.redis_client.hgetall(product_memory.stats_key))
+
+        self.assertEqual(product_memory.get_statistics()['total_products'], 4)
+        self.assertEqual(product_memory.query_products_page(limit=2)['total_items'], 4)
+
+        self.save('E')
+        self.assertEqual(product_memory.get_statistics()['total_products'], 5)
+
+    def test_detailed_stats_count_redis_products(self):
+        self.save('A', 'B')
+        product_memory.redis_client.set('outra_chave', '1')
+
+        with mock.patch.object(product_memory.redis_client, 'keys', side_effect=AssertionError('KEYS')):
+            stats = product_memory.get_memory_stats(detailed=True)
+
+        self.assertEqual(stats['redis_products'], 2)
+        self.assertEqual(stats['database_products'], 2)
+
+
+class BackupStoreTests(SimpleTestCase):
+    """Gravação em segundo plano do backup local e leitura pela sobreposição da fila."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='beecatalog_test_')
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.store = BackupStore(os.path.join(self.temp_dir, 'backup.sqlite3'), flush_interval=0.05)
+        self.addCleanup(self.store.flush)
+
+    def block_writer(self):
+        """Segura a thread de gravação no próximo lote até o evento ser liberado."""
+        started, release = threading.Event(), threading.Event()
+        apply = self.store._apply
+
+        def blocked_apply(connection, batch):
+            started.set()
+            release.wait(5)
+            apply(connection, batch)
+
+        patcher = mock.patch.object(self.store, '_apply', side_effect=blocked_apply)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(release.set)
+        return started, release
+
+    def stored_rows(self, table='records', path=None):
+        connection = sqlite3.connect(path or self.store.path)
+        try:
+            return dict(connection.execute(f"SELECT key, data FROM {table}").fetchall())
+        finally:
+            connection.close()
+
+    def test_get_reads_pending_writes_before_and_after_flush(self):
+        started, release = self.block_writer()
+        self.store.put_many('records', {'a': {'valor': 1}, 'b': {'valor': 2}})
+        self.assertTrue(started.wait(5))
+
+        self.assertEqual(self.stored_rows(), {})
+        self.assertEqual(self.store.get('records', 'a'), {'valor': 1})
+        self.assertEqual(self.store.get_many('records', ['a', 'b', 'c']), {'a': {'valor': 1}, 'b': {'valor': 2}})
+
+        release.set()
+        self.store.flush()
+
+        self.assertEqual(self.store._pending, {})
+        self.assertEqual(set(self.stored_rows()), {'a', 'b'})
+        self.assertEqual(self.store.get('records', 'a'), {'valor': 1})
+
+    def test_pending_delete_hides_stored_value(self):
+        self.store.put_many('records', {'a': {'valor': 1}})
+        self.store.flush()
+
+        started, release = self.block_writer()
+        self.store.delete('records', 'a')
+        self.assertTrue(started.wait(5))
+
+        self.assertIn('a', self.stored_rows())
+        self.assertIsNone(self.store.get('records', 'a'))
+        release.set()
+        self.store.flush()
+        self.assertNotIn('a', self.stored_rows())
+
+    def test_newer_write_survives_release_of_older_batch(self):
+        started, release = self.block_writer()
+        self.store.put_many('records', {'a': {'versao': 1}})
+        self.assertTrue(started.wait(5))
+        self.store.put_many('records', {'a': {'versao': 2}})
+
+        release.set()
+        self.store.flush()
+
+        self.assertEqual(self.store.get('records', 'a'), {'versao': 2})
+        self.assertEqual(self.store.count('records'), 1)
+
+    def test_iter_batches_in_key_order_across_pending_writes(self):
+        self.store.put_many('records', {f"k{index:02d}": index for index in range(0, 10, 2)})
+        self.store.flush()
+        started, release = self.block_writer()
+        self.store.put_many('records', {f"k{index:02d}": index for index in range(1, 10, 2)})
+        self.assertTrue(started.wait(5))
+
+        release.set()
+        batches = list(self.store.iter_batches('records', batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        self.assertEqual([key for batch in batches for key, _ in batch], [f"k{index:02d}" for index in range(10)])
+        self.assertEqual([value for batch in batches for _, value in batch], list(range(10)))
+
+        after = list(self.store.iter_batches('records', batch_size=4, after_key='k06'))
+        self.assertEqual([key for batch in after for key, _ in batch], ['k07', 'k08', 'k09'])
+
+    def test_fork_discards_parent_queue_and_writer(self):
+        started, release = self.block_writer()
+        self.store.put_many('records', {'a': 1, 'b': 2})
+        self.assertTrue(started.wait(5))
+        parent_writer = self.store._writer
+
+        # Processo filho: pid diferente do registrado na criação
+        with mock.patch.object(os, 'getpid', return_value=self.store._pid + 1):
+            self.store.flush()
+            self.assertIsNone(self.store.get('records', 'a'))
+            self.assertEqual(self.store._pending, {})
+            release.set()
+            self.store.put_many('records', {'c': 3})
+            self.store.flush()
+            self.assertIsNot(self.store._writer, parent_writer)
+            self.assertEqual(self.store.get('records', 'c'), 3)
+
+    def test_flush_is_registered_at_exit(self):
+        with mock.patch('api.backup_store.atexit.register') as register:
+            store = BackupStore(os.path.join(self.temp_dir, 'outro.sqlite3'))
+        register.assert_called_once_with(store.flush)
+
+        store.put_many('blobs', {f"h{index}": {'conteudo': index} for index in range(50)})
+        store.flush()
+        self.assertEqual(len(self.stored_rows('blobs', store.path)), 50)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class LocalCacheTests(SimpleTestCase):
+    """Cache L1: invalidação entre processos, desvio sem barramento e limites."""
+
+    def make_bus(self, redis_client=None):
+        """Barramento de um 'processo'; sem cliente, como em DEBUG (processo único)."""
+        with override_settings(DEBUG=redis_client is None), \
+                mock.patch.object(local_cache.redis, 'from_url', return_value=redis_client):
+            return local_cache.CacheInvalidationBus()
+
+    def make_cache(self, bus, **kwargs):
+        with mock.patch.object(local_cache, 'invalidation_bus', bus):
+            return local_cache.LocalCache('produtos', **kwargs)
+
+    def using(self, bus):
+        return mock.patch.object(local_cache, 'invalidation_bus', bus)
+
+    def test_invalidation_reaches_other_processes(self):
+        server = fakeredis.FakeServer()
+        bus_a = self.make_bus(fakeredis.FakeRedis(server=server))
+        bus_b = self.make_bus(fakeredis.FakeRedis(server=server))
+        cache_a, cache_b = self.make_cache(bus_a), self.make_cache(bus_b)
+        invalidated = []
+        cache_b.add_invalidation_listener(invalidated.extend)
+        self.assertTrue(wait_until(lambda: bus_a.is_healthy() and bus_b.is_healthy()))
+
+        with self.using(bus_a):
+            self.assertTrue(cache_a.set('sku_1', {'titulo': 'antigo'}))
+        with self.using(bus_b):
+            self.assertTrue(cache_b.set('sku_1', {'titulo': 'antigo'}))
+            self.assertTrue(cache_b.set('sku_2', {'titulo': 'outro'}))
+
+        with self.using(bus_a):
+            cache_a.invalidate('sku_1')
+        self.assertTrue(wait_until(lambda: invalidated == ['sku_1']))
+        with self.using(bus_b):
+            self.assertIsNone(cache_b.get('sku_1'))
+            self.assertEqual(cache_b.get('sku_2'), {'titulo': 'outro'})
+
+            cache_b.invalidate_all()
+        with self.using(bus_a):
+            self.assertTrue(wait_until(lambda: not cache_a._entries))
+            self.assertIsNone(cache_a.get('sku_1'))
+
+    def test_cache_is_bypassed_while_bus_is_unhealthy(self):
+        connected, disconnect = threading.Event(), threading.Event()
+
+        def listen():
+            connected.set()
+            disconnect.wait(5)
+            raise ConnectionError('conexão perdida')
+            yield
+
+        redis_client = mock.Mock()
+        redis_client.pubsub.return_value.listen.side_effect = listen
+        bus = self.make_bus(redis_client)
+        cache = self.make_cache(bus)
+
+        with self.using(bus):
+            self.assertTrue(wait_until(bus.is_healthy))
+            self.assertTrue(connected.wait(5))
+            self.assertTrue(cache.set('sku_1', {'titulo': 'x'}))
+            self.assertEqual(cache.get('sku_1'), {'titulo': 'x'})
+
+            # Queda da assinatura: mensagens podem ter sido perdidas
+            redis_client.pubsub.side_effect = ConnectionError('Redis indisponível')
+            disconnect.set()
+            self.assertTrue(wait_until(lambda: not bus.is_healthy()))
+
+            self.assertEqual(cache.get_stats()['entries'], 0)
+            self.assertFalse(cache.set('sku_1', {'titulo': 'y'}))
+            cache._entries['sku_1'] = (time.monotonic() + 60, b'"obsoleto"')
+            self.assertIsNone(cache.get('sku_1'))
+            self.assertFalse(cache.get_stats()['invalidation_channel_active'])
+
+    def test_entry_bound_evicts_least_recently_used(self):
+        bus = self.make_bus()
+        cache = self.make_cache(bus, max_entries=3)
+        with self.using(bus):
+            for key in ('a', 'b', 'c'):
+                cache.set(key, key)
+            cache.get('a')
+            cache.set('d', 'd')
+
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual([cache.get(key) for key in ('a', 'c', 'd')], ['a', 'c', 'd'])
+            self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_byte_bound_counts_serialized_size(self):
+        bus = self.make_bus()
+        cache = self.make_cache(bus, max_bytes=100)
+        value = 'x' * 38  # 40 bytes em JSON
+        with self.using(bus):
+            self.assertFalse(cache.set('grande', 'x' * 200))
+            cache.set('a', value)
+            cache.set('b', value)
+            self.assertEqual(cache.get_stats()['bytes'], 80)
+
+            cache.set('c', value)
+            self.assertEqual(cache.get_stats()['bytes'], 80)
+            self.assertIsNone(cache.get('a'))
+
+            cache.set('b', 'y')
+            cache.delete('c')
+            self.assertEqual(cache.get_stats()['bytes'], 3)
+            self.assertEqual(cache.get_stats()['entries'], 1)
+
+    def test_expired_entries_and_copies(self):
+        bus = self.make_bus()
+        cache = self.make_cache(bus)
+        with self.using(bus):
+            cache.set('a', {'lista': [1]}, timeout=60)
+            cache.get('a')['lista'].append(2)
+            self.assertEqual(cache.get('a'), {'lista': [1]})
+
+            with mock.patch.object(local_cache.time, 'monotonic', return_value=time.monotonic() + 61):
+                self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get_stats()['bytes'], 0)
+
+
+class MemoryHydrationTests(IsolatedMemoryMixin, TestCase):
+    """Hidratação do Redis a partir da camada durável."""
+
+    identifiers = [f"sku_H{index}" for index in range(7)]
+
+    def setUp(self):
+        super().setUp()
+        product_memory.save_products_bulk([
+            (identifier, {'sku': identifier[4:], 'title': f"Produto {identifier[4:]}"}, {})
+            for identifier in self.identifiers
+        ])
+        product_memory.backup_store.flush()
+        # Empates em created_at: a posição do checkpoint depende também do identificador
+        RememberedProduct.objects.update(created_at=timezone.now())
+
+        self.redis = fakeredis.FakeRedis()
+        product_memory.redis_client = self.redis
+        patcher = mock.patch.object(memory_hydration, 'CHECKPOINT_PATH', os.path.join(self.temp_dir, 'checkpoint.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored_identifiers(self):
+        keys = self.redis.keys(f"{product_memory.memory_prefix}:*")
+        return sorted(json.loads(self.redis.get(key))['product_identifier'] for key in keys)
+
+    def interrupted_run(self, source):
+        def interrupt(progress):
+            if progress['processed'] >= 4:
+                raise RuntimeError('interrompida')
+
+        with self.assertRaises(RuntimeError):
+            memory_hydration.hydrate_memory(source=source, batch_size=2, progress_callback=interrupt)
+        self.assertTrue(os.path.exists(memory_hydration.CHECKPOINT_PATH))
+        self.assertEqual(len(self.stored_identifiers()), 4)
+
+    def test_resume_from_checkpoint(self):
+        for source in ('database', 'backup'):
+            with self.subTest(source=source):
+                self.redis.flushall()
+                self.interrupted_run(source)
+                self.assertTrue(memory_hydration.needs_hydration())
+
+                with mock.patch.object(memory_hydration, '_load_batch', wraps=memory_hydration._load_batch) as load_batch:
+                    progress = memory_hydration.hydrate_memory(source=source, batch_size=2)
+
+                self.assertEqual(load_batch.call_count, 2)
+                self.assertEqual(
+                    {field: progress[field] for field in ('total', 'processed', 'loaded', 'skipped')},
+                    {'total': 7, 'processed': 7, 'loaded': 7, 'skipped': 0}
+                )
+                self.assertEqual(self.stored_identifiers(), sorted(self.identifiers))
+                self.assertFalse(os.path.exists(memory_hydration.CHECKPOINT_PATH))
+                self.assertFalse(memory_hydration.needs_hydration())
+
+    def test_checkpoint_of_other_source_or_without_resume_is_ignored(self):
+        self.interrupted_run('database')
+
+        progress = memory_hydration.hydrate_memory(source='backup', batch_size=2)
+        self.assertEqual((progress['processed'], progress['skipped']), (7, 4))
+
+        self.redis.flushall()
+        self.interrupted_run('database')
+        progress = memory_hydration.hydrate_memory(source='database', batch_size=2, resume=False)
+        self.assertEqual((progress['processed'], progress['loaded'], progress['skipped']), (7, 3, 4))
+
+    def test_newer_keys_are_not_overwritten(self):
+        memory_key = product_memory._generate_product_key('sku_H3')
+        newer = {'product_identifier': 'sku_H3', 'product_data': {'title': 'Gravado durante a hidratação'}}
+        self.redis.set(memory_key, json.dumps(newer))
+
+        progress = memory_hydration.hydrate_memory(source='database', batch_size=3)
+
+        self.assertEqual((progress['loaded'], progress['skipped']), (6, 1))
+        self.assertEqual(json.loads(self.redis.get(memory_key)), newer)
+        self.assertGreater(self.redis.ttl(product_memory._generate_product_key('sku_H0')), 0)
+
+    def test_lock_allows_a_single_hydration(self):
+        self.redis.set(memory_hydration.HYDRATION_LOCK_KEY, 1234)
+        self.assertIsNone(memory_hydration.hydrate_memory_if_needed(batch_size=2))
+        self.assertEqual(self.stored_identifiers(), [])
+
+        self.redis.delete(memory_hydration.HYDRATION_LOCK_KEY)
+        progress = memory_hydration.hydrate_memory_if_needed(batch_size=2)
+        self.assertEqual(progress['loaded'], 7)
+        self.assertIsNotNone(self.redis.get(memory_hydration.HYDRATED_MARKER_KEY))
+        self.assertFalse(self.redis.exists(memory_hydration.HYDRATION_LOCK_KEY))
+        self.assertEqual(int(self.redis.hget(product_memory.stats_key, 'total')), 7)
+
+        # Marcador presente: nada a fazer
+        self.assertIsNone(memory_hydration.hydrate_memory_if_needed(batch_size=2))
+
+    def test_lock_is_released_when_hydration_fails(self):
+        with mock.patch.object(memory_hydration, 'hydrate_memory', side_effect=RuntimeError('falhou')):
+            with self.assertRaises(RuntimeError):
+                memory_hydration.hydrate_memory_if_needed()
+        self.assertFalse(self.redis.exists(memory_hydration.HYDRATION_LOCK_KEY))
+        self.assertTrue(memory_hydration.needs_hydration())
+
+    def test_without_redis(self):
+        product_memory.redis_client = None
+        self.assertFalse(memory_hydration.needs_hydration())
+        with self.assertRaises(RuntimeError):
+            memory_hydration.hydrate_memory()
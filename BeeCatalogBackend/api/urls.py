@@ -5,13 +5,16 @@ from .views import (
     TaskStatusView, 
     ScrapeImagesView,
     OrganizadorIAView,
-    ClearIACacheView
+    ClearIACacheView,
+    ImageUploadUrlsView
 )
 
 urlpatterns = [
     path('upload-planilha/', SpreadsheetUploadView.as_view(), name='upload-planilha'),
+    path('upload-planilha/<str:dataset_id>/', SpreadsheetUploadView.as_view(), name='upload-planilha-pagina'),
     path('scrape-images/', ScrapeImagesView.as_view(), name='scrape-images'),
     path('gerar-planilha/', SpreadsheetGenerateView.as_view(), name='gerar-planilha'),
+    path('upload-imagens/', ImageUploadUrlsView.as_view(), name='upload-imagens'),
     path('organizador-ia/', OrganizadorIAView.as_view(), name='organizador_ia'),
     path('task-status/<str:task_id>/', TaskStatusView.as_view(), name='task-status'),
     path('limpar-cache-ia/', ClearIACacheView.as_view(), name='limpar-cache-ia'),
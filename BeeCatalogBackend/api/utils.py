@@ -40,6 +40,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.datastructures import MultiValueDictKeyError
 
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from openpyxl import load_workbook
 from openpyxl.utils.cell import range_boundaries
@@ -63,6 +64,8 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME', 'sa-east-1')
+# Endpoint compatível com S3 (ex.: MinIO local em http://localhost:9000); vazio usa a AWS
+AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL') or None
 
 GEMINI_FLASH_INPUT_COST_PER_K_TOKENS = 0.00035
 GEMINI_FLASH_OUTPUT_COST_PER_K_TOKENS = 0.00045
@@ -71,7 +74,8 @@ s3 = boto3.client(
     's3',
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_S3_REGION_NAME
+    region_name=AWS_S3_REGION_NAME,
+    endpoint_url=AWS_S3_ENDPOINT_URL
 )
 
 THROTTLE_SECONDS = 0.2
@@ -219,8 +223,18 @@ RE_DIRECT = re.compile(r"^=?\s*([A-Za-z0-9_.\-]+)\s*$")
 RE_INDIRECT_SUFFIX = re.compile(r'&\s*"([A-Za-z0-9_\.]+)"')
 
 @lru_cache(maxsize=None)
-def get_s3_client():
-    return boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_S3_REGION_NAME)
+def get_s3_client(max_pool_connections: int = 10):
+    # Assinatura v4 (exigida pelas URLs pré-assinadas fora de us-east-1 e pelo MinIO)
+    return boto3.client(
+        's3', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_S3_REGION_NAME,
+        endpoint_url=AWS_S3_ENDPOINT_URL,
+        config=BotoConfig(signature_version='s3v4', max_pool_connections=max_pool_connections)
+    )
+
+def s3_object_url(key: str) -> str:
+    if AWS_S3_ENDPOINT_URL:
+        return f"{AWS_S3_ENDPOINT_URL.rstrip('/')}/{AWS_STORAGE_BUCKET_NAME}/{key}"
+    return f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com/{key}"
 
 @lru_cache(maxsize=None)
 def get_model(temperature=0.2):
@@ -1250,6 +1264,148 @@ def extrair_sku_pai(sku):
         return sku.split('-')[0]
     return sku
 
+# Atributos que diferenciam os filhos de uma família de variação
+CAMPOS_VARIACAO = ['cor', 'color', 'tamanho', 'size', 'modelo', 'estilo',
+                   'c_l_a_produto', 'c_l_a_pacote', 'peso_produto', 'peso_pacote']
+
+def _valor_variacao(product, campo):
+    valor = str(product.get(campo) or '').strip()
+    return '' if valor.lower() in ['nan', 'none'] else valor
+
+def _padrao_valor_variacao(valor):
+    # Palavra inteira; tamanhos curtos ("P", "M") só com a mesma caixa para não pegar abreviações
+    return re.compile(rf'(?<!\w){re.escape(valor)}(?!\w)', re.IGNORECASE if len(valor) > 2 else 0)
+
+def _titulo_base_familia(product):
+    """Título sem os valores de variação, para não agrupar produtos diferentes com o mesmo prefixo de SKU"""
+    titulo = str(product.get('titulo') or '').lower()
+    for campo in CAMPOS_VARIACAO:
+        valor = _valor_variacao(product, campo).lower()
+        if valor:
+            titulo = _padrao_valor_variacao(valor).sub(' ', titulo)
+    return ' '.join(re.sub(r'[^\w\s]', ' ', titulo).split())
+
+def mapear_familias_variacao(products) -> Dict[str, int]:
+    """
+    Agrupa os produtos em famílias de variação pelo SKU pai.
+
+    Os produtos de uma família compartilham o SKU pai e o título sem os
+    valores de variação; o representante é o produto cujo SKU é o próprio
+    SKU pai (ou o primeiro da família). Só ele passa pelas etapas de IA.
+
+    Returns:
+        Dicionário índice do filho (str) -> índice do representante
+    """
+    familias = defaultdict(list)
+    for i, product in enumerate(products):
+        sku = str(product.get('sku') or '').strip()
+        if sku:
+            familias[(extrair_sku_pai(sku), _titulo_base_familia(product))].append(i)
+
+    filhos = {}
+    for (sku_pai, _), indices in familias.items():
+        if len(indices) < 2 or not any(tem_atributos_variacao(products[i]) for i in indices):
+            continue
+        representante = next((i for i in indices if str(products[i].get('sku')).strip() == sku_pai), indices[0])
+        for i in indices:
+            if i != representante:
+                filhos[str(i)] = representante
+    return filhos
+
+# Atributos trocados no título do filho; dimensões e pesos ficam de fora por
+# serem números que colidem com o restante do texto ("Kit 2", "100% algodão")
+CAMPOS_VARIACAO_TITULO = ['cor', 'color', 'tamanho', 'size', 'modelo', 'estilo']
+
+# Campos da planilha (cabeçalho da linha 5, sem o sufixo "#1.value") que
+# recebem cada atributo; nas opções e chunks herdados do representante, só
+# eles têm o valor do pai trocado pelo do filho
+CAMPOS_PLANILHA_VARIACAO = {
+    'cor': ['color_name', 'color_map', 'color'],
+    'color': ['color_name', 'color_map', 'color'],
+    'tamanho': ['size_name', 'size_map', 'size'],
+    'size': ['size_name', 'size_map', 'size'],
+    'modelo': ['model_name', 'model'],
+    'estilo': ['style_name', 'style'],
+}
+
+# Chunks com dados próprios de cada produto (preço, estoque, condição): os
+# filhos de uma família passam por eles em vez de herdar os do representante
+CHUNKS_POR_PRODUTO = ['Oferta (BR) - (Vender na Amazon)']
+
+def substituir_valores_variacao(conteudo, substituicoes):
+    """Aplica as substituições (valor do pai -> valor do filho) em todos os textos do conteúdo"""
+    if isinstance(conteudo, str):
+        for padrao, novo_valor in substituicoes:
+            conteudo = padrao.sub(lambda _: novo_valor, conteudo)
+        return conteudo
+    if isinstance(conteudo, dict):
+        return {chave: substituir_valores_variacao(valor, substituicoes) for chave, valor in conteudo.items()}
+    if isinstance(conteudo, list):
+        return [substituir_valores_variacao(valor, substituicoes) for valor in conteudo]
+    return conteudo
+
+def substituicoes_variacao(produto_pai, produto_filho, campos=None):
+    """Pares (padrão do valor do pai, valor do filho) dos atributos de variação que mudam"""
+    substituicoes = []
+    for campo in campos or CAMPOS_VARIACAO:
+        valor_pai = _valor_variacao(produto_pai, campo)
+        valor_filho = _valor_variacao(produto_filho, campo)
+        if valor_pai and valor_filho and valor_pai.lower() != valor_filho.lower():
+            substituicoes.append((_padrao_valor_variacao(valor_pai), valor_filho))
+    return substituicoes
+
+def _substituir_no_titulo(titulo, substituicoes):
+    for padrao, novo_valor in substituicoes:
+        ocorrencias = list(padrao.finditer(titulo))
+        if not ocorrencias:
+            continue
+        valor_pai = ocorrencias[0].group(0)
+        if len(valor_pai) <= 2 or valor_pai.replace(',', '').replace('.', '').isdigit():
+            # Tamanhos curtos e números ("P", "38") também aparecem em outras
+            # palavras do título; o atributo de variação costuma vir no final
+            ocorrencias = ocorrencias[-1:]
+        for ocorrencia in reversed(ocorrencias):
+            titulo = titulo[:ocorrencia.start()] + novo_valor + titulo[ocorrencia.end():]
+    return titulo
+
+def derivar_conteudo_variacao(conteudo_pai: dict, produto_pai: dict, produto_filho: dict) -> dict:
+    """
+    Deriva o conteúdo principal de um filho a partir do conteúdo gerado para o
+    representante da família, sem nova chamada à IA. Só o título muda: a cor,
+    o tamanho, o modelo e o estilo do pai são trocados pelos do filho e, se
+    a cor ou o tamanho do filho não aparecerem, são acrescentados ao final.
+    """
+    conteudo = dict(conteudo_pai)
+    titulo = conteudo.get('titulo')
+    if isinstance(titulo, str) and titulo:
+        titulo = _substituir_no_titulo(
+            titulo, substituicoes_variacao(produto_pai, produto_filho, CAMPOS_VARIACAO_TITULO)
+        )
+        for campo in ['cor', 'color', 'tamanho', 'size']:
+            valor = _valor_variacao(produto_filho, campo)
+            if valor and not _padrao_valor_variacao(valor).search(titulo):
+                titulo = f"{titulo} - {valor}"
+        conteudo['titulo'] = titulo
+    return conteudo
+
+def derivar_campos_variacao(dados: dict, produto_pai: dict, produto_filho: dict) -> dict:
+    """
+    Deriva as escolhas de um filho (opções ou dados de um chunk) a partir
+    das do representante: os campos de variação (cor, tamanho, modelo,
+    estilo) recebem o valor do filho e os demais são herdados sem alteração.
+    """
+    substituicoes_por_campo = defaultdict(list)
+    for atributo, campos_planilha in CAMPOS_PLANILHA_VARIACAO.items():
+        substituicoes = substituicoes_variacao(produto_pai, produto_filho, [atributo])
+        for campo_planilha in campos_planilha:
+            substituicoes_por_campo[campo_planilha].extend(substituicoes)
+
+    derivados = {}
+    for campo, valor in dados.items():
+        substituicoes = substituicoes_por_campo.get(str(campo).split('#')[0].strip().lower())
+        derivados[campo] = substituir_valores_variacao(valor, substituicoes) if substituicoes else valor
+    return derivados
+
 def preencher_campos_peso(ws, cabecalhos, bruto_peso_value, unit_map, row):
     def normalizar_numero_interno(bruto):
         try: return float(str(bruto).replace(',', '.'))
@@ -1,13 +1,10 @@
 import json
 import uuid
-import mimetypes
 import base64
 import os
 import glob
-from datetime import timedelta
 from django.conf import settings
 from django.http import HttpResponse, JsonResponse
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
@@ -20,8 +17,12 @@ import pandas as pd
 
 from . import utils
 from . import tasks
-from .tasks import generate_spreadsheet_task, scrape_images_task, organizador_ia_task
-from .models import UploadedImage
+from .tasks import generate_spreadsheet_task, scrape_images_task, organizador_ia_task, clear_ai_cache_task
+from .s3_uploads import (
+    add_image_url, create_presigned_uploads, image_key_prefix, image_uploader,
+    parse_image_field, register_uploaded_images
+)
+from .staged_uploads import map_upload_frame, normalize_product, staged_uploads
 from backbeecatalog.celery import app as celery_app 
 
 class ScrapeImagesView(APIView):
@@ -39,71 +40,111 @@ class ScrapeImagesView(APIView):
             return Response({'error': f'Erro ao iniciar a tarefa de extração: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class SpreadsheetUploadView(APIView):
+    """
+    Recebe a planilha de produtos e a guarda no servidor (staged_uploads).
+
+    POST devolve o identificador do conjunto (dataset_id) e a primeira
+    página de produtos; GET upload-planilha/<dataset_id>/?page=N&limit=M lê
+    as páginas seguintes (limit padrão: 100, máximo: 500).
+    """
     parser_classes = [MultiPartParser]
+
+    @staticmethod
+    def _page_payload(products, meta, page, limit):
+        total = meta['total']
+        return {
+            'dataset_id': meta['dataset_id'],
+            'products': products,
+            'pagination': {
+                'current_page': page,
+                'total_pages': (total + limit - 1) // limit,
+                'total_items': total,
+                'items_per_page': limit,
+                'has_next': page * limit < total,
+                'has_previous': page > 1
+            }
+        }
+
+    @staticmethod
+    def _page_params(request):
+        page = max(int(request.GET.get('page', 1)), 1)
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 500)
+        return page, limit
+
     def post(self, request, *args, **kwargs):
         file_obj = request.FILES.get('planilha')
         if not file_obj:
             return Response({'error': 'Nenhum arquivo de planilha enviado.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            _, limit = self._page_params(request)
+        except ValueError:
+            return Response({'error': 'Parâmetros page e limit devem ser números.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             df = pd.read_excel(file_obj, skiprows=1, engine='openpyxl')
-            
-            df_selecionado = df.head(20)
-
-            registros = df_selecionado.fillna('').to_dict("records")
-            lista_produtos = []
-            for linha in registros:
-                sku_original = str(linha.get("SKU:", "")).strip()
-                if not sku_original:
-                    continue
-
-                processed_sku = utils.processar_string_produto_pai(sku_original)
-                
-                titulo = str(linha.get("NOME DO PRODUTO", "")).strip()
-                if not titulo:
-                    tipo_marca = str(linha.get("TIPO DE MARCA", "")).strip()
-                    marca = str(linha.get("MARCA:", "")).strip()
-                    nome_base = marca if tipo_marca == "Marca" else tipo_marca
-                    titulo = f"{nome_base} {processed_sku}" if nome_base else processed_sku
-
-                produto = {
-                    "titulo": titulo,
-                    "sku": processed_sku,
-                    "tipo_marca": str(linha.get("TIPO DE MARCA", "")).strip(),
-                    "nome_marca": str(linha.get("MARCA:", "")).strip(),
-                    "preco": linha.get("PREÇO DE VENDA:", ""),
-                    "fba_dba": str(linha.get("LOGÍSTICA", "")).strip(),
-                    "id_produto": str(linha.get("EAN:", "")).strip(),
-                    "ncm": str(linha.get("NCM:", "")).strip(),
-                    "quantidade": linha.get("QUANTIDADE EM ESTOQUE PARA DBA", ""),
-                    "tipo_id_produto": str(linha.get("TIPO DE ID DO PRODUTO", "")).strip(),
-                    "peso_pacote": linha.get("PESO DO PACOTE: (Em gramas)", ""),
-                    "c_l_a_pacote": str(linha.get("COMPRIMENTO X  LARGURA X ALTURA  (DO PACOTE)", "")).strip(),
-                    "peso_produto": str(linha.get("PESO DO PRODUTO: (Em gramas) ", "")),
-                    "c_l_a_produto": str(linha.get("COMPRIMENTO X  LARGURA X ALTURA (DO PRODUTO)", "")).strip(),
-                    "ajuste": str(linha.get("O PRODUTO É AJUSTÁVEL?", "")).strip(),
-                    "tema_variacao_pai": str(linha.get("TEMA DE VARIAÇÃO PAI", "")).strip()
-                }
-                lista_produtos.append(produto)
-            return Response(lista_produtos, status=status.HTTP_200_OK)
+            # Guardados no formato do formulário, como chegam na geração
+            lista_produtos = [normalize_product(product) for product in map_upload_frame(df)]
+            meta = staged_uploads.create(lista_produtos, file_name=file_obj.name)
+            return Response(self._page_payload(lista_produtos[:limit], meta, 1, limit), status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': f'Erro ao processar a planilha: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def get(self, request, dataset_id, *args, **kwargs):
+        try:
+            page, limit = self._page_params(request)
+        except ValueError:
+            return Response({'error': 'Parâmetros page e limit devem ser números.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = staged_uploads.get_page(dataset_id, page, limit)
+        if result is None:
+            return Response({'error': 'Planilha não encontrada ou expirada. Envie a planilha novamente.'}, status=status.HTTP_404_NOT_FOUND)
+        products, meta = result
+        return Response(self._page_payload(products, meta, page, limit), status=status.HTTP_200_OK)
+
 class SpreadsheetGenerateView(APIView):
     parser_classes = [MultiPartParser]
     def post(self, request, *args, **kwargs):
         products_data_str = request.data.get('products_data')
+        dataset_id = request.data.get('dataset_id')
         amazon_template_file = request.FILES.get('amazon_template')
 
-        if not products_data_str:
+        if not products_data_str and not dataset_id:
             return Response({'error': 'Dados dos produtos não encontrados.'}, status=status.HTTP_400_BAD_REQUEST)
         if not amazon_template_file:
             return Response({'error': 'Modelo de planilha da Amazon não enviado.'}, status=status.HTTP_400_BAD_REQUEST)
             
-        try:
-            products_data = json.loads(products_data_str)
-        except json.JSONDecodeError:
-            return Response({'error': 'JSON de dados dos produtos inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        if products_data_str:
+            try:
+                products_data = json.loads(products_data_str)
+            except json.JSONDecodeError:
+                return Response({'error': 'JSON de dados dos produtos inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            # Produtos da planilha guardada no upload; product_overrides traz
+            # só os produtos editados no frontend ({"índice": produto})
+            products_data = staged_uploads.get_all(dataset_id)
+            if products_data is None:
+                return Response({'error': 'Planilha não encontrada ou expirada. Envie a planilha novamente.'}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                overrides = json.loads(request.data.get('product_overrides') or '{}')
+                for index, product in overrides.items():
+                    index = int(index)
+                    if not 0 <= index < len(products_data):
+                        raise ValueError(index)
+                    products_data[index] = normalize_product(product)
+            except (json.JSONDecodeError, AttributeError, ValueError):
+                return Response({'error': 'JSON de produtos editados inválido.'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Chaves dos objetos enviados direto ao S3 ({"imagem_p0_principal": "produto_0/principal/..."});
+        # cada chave precisa estar sob o prefixo gerado para o seu campo
+        try:
+            image_keys = []
+            for field, key in json.loads(request.data.get('image_keys') or '{}').items():
+                parsed = parse_image_field(field)
+                if parsed is None or not str(key).startswith(image_key_prefix(*parsed)):
+                    raise ValueError(field)
+                image_keys.append((parsed, key))
+        except (json.JSONDecodeError, AttributeError, ValueError):
+            return Response({'error': 'Chaves das imagens inválidas.'}, status=status.HTTP_400_BAD_REQUEST)
+
         temp_dir = os.path.join(settings.BASE_DIR, "temp_files")
         os.makedirs(temp_dir, exist_ok=True)
         temp_template_path = os.path.join(temp_dir, f"input_{uuid.uuid4()}.xlsm")
@@ -113,37 +154,26 @@ class SpreadsheetGenerateView(APIView):
                 destination.write(chunk)
 
         image_urls_map = {}
-        s3_client = utils.get_s3_client()
-        for key, uploaded_file in request.FILES.items():
-            if not key.startswith('imagem_'): continue
-            try:
-                parts = key.split('_')
-                product_index = int(parts[1].replace('p', ''))
-                image_type = parts[2]
-            except (IndexError, ValueError):
-                continue
+        uploaded_urls = []
+        # Imagens já enviadas pelo navegador com URLs pré-assinadas
+        for (product_index, image_type), key in image_keys:
+            url = utils.s3_object_url(key)
+            add_image_url(image_urls_map, product_index, image_type, url)
+            uploaded_urls.append(url)
 
-            if str(product_index) not in image_urls_map:
-                image_urls_map[str(product_index)] = {'principal': '', 'amostra': '', 'extra': []}
-            
-            s3_filename = f"produto_{product_index}/{image_type}/{uuid.uuid4()}_{uploaded_file.name}"
-            content_type, _ = mimetypes.guess_type(uploaded_file.name, strict=False)
-            if content_type is None: content_type = 'application/octet-stream'
-            
+        # Imagens enviadas no próprio formulário (clientes antigos): uma vez por conteúdo, em paralelo
+        image_files = [(parse_image_field(key), uploaded_file) for key, uploaded_file in request.FILES.items()]
+        image_files = [(parsed, uploaded_file) for parsed, uploaded_file in image_files if parsed]
+        if image_files:
             try:
-                s3_client.upload_fileobj(
-                    uploaded_file, utils.AWS_STORAGE_BUCKET_NAME, s3_filename,
-                    ExtraArgs={'ContentType': content_type, 'ACL': 'public-read'}
-                )
-                s3_url = f"https://{utils.AWS_STORAGE_BUCKET_NAME}.s3.{utils.AWS_S3_REGION_NAME}.amazonaws.com/{s3_filename}"
-                UploadedImage.objects.create(url=s3_url, expires_at=timezone.now() + timedelta(hours=12))
-                
-                if image_type == 'extra':
-                    image_urls_map[str(product_index)]['extra'].append(s3_url)
-                else:
-                    image_urls_map[str(product_index)][image_type] = s3_url
+                urls, _ = image_uploader.upload([(uploaded_file, uploaded_file.name) for _, uploaded_file in image_files])
             except Exception as e:
-                return Response({'error': f'Erro no upload da imagem {uploaded_file.name}: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for ((product_index, image_type), _), s3_url in zip(image_files, urls):
+                add_image_url(image_urls_map, product_index, image_type, s3_url)
+                uploaded_urls.append(s3_url)
+
+        register_uploaded_images(uploaded_urls)
         
         maestra_task = generate_spreadsheet_task.delay(products_data, image_urls_map, temp_template_path)
         
@@ -175,6 +205,27 @@ class SpreadsheetGenerateView(APIView):
                 status=status.HTTP_202_ACCEPTED
             )
 
+class ImageUploadUrlsView(APIView):
+    """
+    URLs pré-assinadas para o navegador enviar as imagens dos produtos
+    direto ao S3; a geração da planilha recebe só as chaves (image_keys).
+
+    Corpo: {"files": [{"field": "imagem_p0_principal", "name": "foto.jpg", "content_type": "image/jpeg"}]}
+    """
+    parser_classes = [JSONParser]
+
+    def post(self, request, *args, **kwargs):
+        files = request.data.get('files')
+        if not isinstance(files, list) or not files:
+            return Response({'error': 'Nenhuma imagem informada.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            uploads = create_presigned_uploads(files)
+        except (ValueError, AttributeError) as e:
+            return Response({'error': str(e) or 'Lista de imagens inválida.'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': f'Erro ao gerar URLs de upload: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'uploads': uploads}, status=status.HTTP_200_OK)
+
 class OrganizadorIAView(APIView):
     parser_classes = [MultiPartParser]
 
@@ -261,9 +312,14 @@ class ClearIACacheView(APIView):
             utils.get_main_ia_chain.cache_clear()
             utils.get_vectorstore.cache_clear()
             
+            # Respostas da IA em cache no Redis: limpeza em segundo plano
+            task = clear_ai_cache_task.delay()
+            
+            # A limpeza do Redis ainda está na fila; o progresso é consultado em task-status/<job_id>/
             return Response({
-                'status': 'SUCCESS',
-                'message': 'Cache da IA limpo com sucesso. Melhorias aplicadas.',
+                'status': 'PENDING',
+                'message': 'Limpeza do cache da IA iniciada. Melhorias aplicadas.',
+                'job_id': task.id,
                 'melhorias_ativas': {
                     'deteccao_categoria': True,
                     'prompts_especificos': True,
@@ -272,7 +328,7 @@ class ClearIACacheView(APIView):
                     'priorizacao_campos': True
                 },
                 'instrucoes': 'Agora as planilhas serão geradas com melhor qualidade e campos mais relevantes baseados na categoria do produto.'
-            }, status=status.HTTP_200_OK)
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({
                 'status': 'FAILURE',
@@ -3,7 +3,7 @@
 import os
 import logging
 from celery import Celery
-from celery.signals import setup_logging
+from celery.signals import setup_logging, worker_ready
 from dotenv import load_dotenv
 
 # Carrega variáveis de ambiente do arquivo .env
@@ -49,6 +49,13 @@ def config_loggers(*args, **kwargs):
     from django.conf import settings
     dictConfig(settings.LOGGING)
 
+# Hidratação da memória de produtos no Redis ao subir o worker (opcional)
+@worker_ready.connect
+def hydrate_product_memory(sender=None, **kwargs):
+    from django.conf import settings
+    if getattr(settings, 'PRODUCT_MEMORY_HYDRATE_ON_STARTUP', False):
+        sender.app.send_task('api.tasks.hydrate_memory_task')
+
 # Auto-discover tasks
 app.autodiscover_tasks()
 
@@ -59,6 +66,7 @@ app.conf.task_routes = {
     'api.tasks.organizador_ia_task': {'queue': 'ai'},
     'api.tasks.generate_main_content_task': {'queue': 'ai'},
     'api.tasks.process_chunk_task': {'queue': 'ai'},
+    'api.tasks.import_spreadsheet_task': {'queue': 'import'},
 }
 
 # Definição das filas
@@ -80,6 +88,10 @@ app.conf.task_queues = {
         'exchange': 'ai',
         'routing_key': 'ai',
     },
+    'import': {
+        'exchange': 'import',
+        'routing_key': 'import',
+    },
 }
 
 @app.task(bind=True)
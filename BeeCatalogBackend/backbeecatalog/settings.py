@@ -170,6 +170,55 @@ else:
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', REDIS_URL)
 
+# Particionamento da memória de produtos e do cache da IA entre nós Redis
+# (hash consistente), separados do Redis do broker. URLs separadas por vírgula;
+# vazio mantém tudo em REDIS_URL. Ao mudar os nós, coloque a lista antiga em
+# *_PREVIOUS_URLS e rode `manage.py reshard_redis` para mover as chaves sem flush
+PRODUCT_MEMORY_REDIS_URLS = os.getenv('PRODUCT_MEMORY_REDIS_URLS', '')
+PRODUCT_MEMORY_REDIS_PREVIOUS_URLS = os.getenv('PRODUCT_MEMORY_REDIS_PREVIOUS_URLS', '')
+AI_CACHE_REDIS_URLS = os.getenv('AI_CACHE_REDIS_URLS', '')
+AI_CACHE_REDIS_PREVIOUS_URLS = os.getenv('AI_CACHE_REDIS_PREVIOUS_URLS', '')
+REDIS_SHARD_REPLICAS = int(os.getenv('REDIS_SHARD_REPLICAS', 160))  # pontos virtuais por nó
+
+# Cache L1 em memória do processo (na frente do cache Django/Redis)
+# Invalidação entre processos via Redis pub/sub em escritas e remoções
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 5000))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv('LOCAL_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64MB
+LOCAL_CACHE_TIMEOUT = int(os.getenv('LOCAL_CACHE_TIMEOUT', 300))  # 5 minutos
+
+# Camada opcional de similaridade do cache da IA: reaproveita o anúncio gerado
+# para um contexto de produto quase idêntico (similaridade de cosseno >= limiar)
+AI_SEMANTIC_CACHE_ENABLED = os.getenv('AI_SEMANTIC_CACHE_ENABLED', 'False').lower() == 'true'
+AI_SEMANTIC_CACHE_THRESHOLD = float(os.getenv('AI_SEMANTIC_CACHE_THRESHOLD', 0.95))
+AI_SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('AI_SEMANTIC_CACHE_MAX_ENTRIES', 50000))
+AI_SEMANTIC_CACHE_REBUILD_INTERVAL = int(os.getenv('AI_SEMANTIC_CACHE_REBUILD_INTERVAL', 600))  # 10 minutos
+
+# Cache negativo da memória de produtos (ausências lembradas + filtro de Bloom)
+PRODUCT_MEMORY_NEGATIVE_TIMEOUT = int(os.getenv('PRODUCT_MEMORY_NEGATIVE_TIMEOUT', 60))
+PRODUCT_MEMORY_BLOOM_REBUILD_INTERVAL = int(os.getenv('PRODUCT_MEMORY_BLOOM_REBUILD_INTERVAL', 600))
+
+# Memória de produtos persistida no banco (modelo RememberedProduct); o Redis
+# vira cache de leitura na frente dele. False mantém o modo legado (Redis + arquivos)
+PRODUCT_MEMORY_DB_ENABLED = os.getenv('PRODUCT_MEMORY_DB_ENABLED', 'True').lower() == 'true'
+
+# Backup local da memória de produtos: arquivo SQLite (WAL) gravado em lotes
+# por uma thread em segundo plano e compactado periodicamente
+PRODUCT_MEMORY_BACKUP_PATH = os.getenv('PRODUCT_MEMORY_BACKUP_PATH', os.path.join(BASE_DIR, 'memory', 'backup.sqlite3'))
+PRODUCT_MEMORY_BACKUP_BATCH_SIZE = int(os.getenv('PRODUCT_MEMORY_BACKUP_BATCH_SIZE', 500))
+PRODUCT_MEMORY_BACKUP_COMPACTION_INTERVAL = int(os.getenv('PRODUCT_MEMORY_BACKUP_COMPACTION_INTERVAL', 3600))  # 1 hora
+
+# Hidratação do Redis na inicialização dos workers Celery quando a memória de
+# produtos se perdeu (flush/failover); também disponível em `manage.py hydrate_memory`
+PRODUCT_MEMORY_HYDRATE_ON_STARTUP = os.getenv('PRODUCT_MEMORY_HYDRATE_ON_STARTUP', 'False').lower() == 'true'
+PRODUCT_MEMORY_HYDRATE_BATCH_SIZE = int(os.getenv('PRODUCT_MEMORY_HYDRATE_BATCH_SIZE', 500))
+PRODUCT_MEMORY_HYDRATE_RATE_LIMIT = int(os.getenv('PRODUCT_MEMORY_HYDRATE_RATE_LIMIT', 0))  # registros/s, 0 = sem limite
+
+# Geração de planilhas: produtos da mesma família de variação (SKU pai) passam
+# pela IA uma única vez; os filhos são derivados trocando cor/tamanho/modelo/estilo
+# no título e nos campos de variação (o chunk de oferta é gerado para cada filho).
+# Desativado por padrão: ative após conferir as planilhas geradas para o catálogo
+VARIATION_FAMILY_GROUPING = os.getenv('VARIATION_FAMILY_GROUPING', 'False').lower() == 'true'
+
 # Celery Task Routes - Filas Dedicadas
 CELERY_TASK_ROUTES = {
     'api.tasks.generate_spreadsheet_task': {'queue': 'spreadsheet'},
@@ -177,6 +226,38 @@ CELERY_TASK_ROUTES = {
     'api.tasks.organizador_ia_task': {'queue': 'ai'},
     'api.tasks.generate_main_content_task': {'queue': 'ai'},
     'api.tasks.process_chunk_task': {'queue': 'ai'},
+    'api.tasks.import_spreadsheet_task': {'queue': 'import'},
+}
+
+# Reconciliação periódica dos contadores de estatísticas da memória (Celery beat)
+MEMORY_STATS_RECONCILE_INTERVAL = int(os.getenv('MEMORY_STATS_RECONCILE_INTERVAL', 3600))  # 1 hora
+
+# Coleta de lixo dos blobs de conteúdo gerado sem referências; blobs alterados
+# há menos de PRODUCT_MEMORY_BLOB_GC_GRACE segundos são preservados
+PRODUCT_MEMORY_BLOB_GC_INTERVAL = int(os.getenv('PRODUCT_MEMORY_BLOB_GC_INTERVAL', 86400))  # 1 dia
+PRODUCT_MEMORY_BLOB_GC_GRACE = int(os.getenv('PRODUCT_MEMORY_BLOB_GC_GRACE', 3600))  # 1 hora
+
+# Planilhas de produtos enviadas (upload-planilha), guardadas no cache até a geração
+STAGED_UPLOAD_TIMEOUT = int(os.getenv('STAGED_UPLOAD_TIMEOUT', 6 * 3600))  # 6 horas
+STAGED_UPLOAD_PART_SIZE = int(os.getenv('STAGED_UPLOAD_PART_SIZE', 500))  # produtos por chave do cache
+
+# Validade das URLs pré-assinadas para o navegador enviar as imagens direto ao S3 (upload-imagens)
+S3_PRESIGNED_UPLOAD_EXPIRES = int(os.getenv('S3_PRESIGNED_UPLOAD_EXPIRES', 900))  # 15 minutos
+
+# Imagens enviadas pelo backend: chave pelo hash do conteúdo (sem reenviar repetidas),
+# envios paralelos e multipart acima do limite
+S3_UPLOAD_MAX_WORKERS = int(os.getenv('S3_UPLOAD_MAX_WORKERS', 8))
+S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))  # 8 MB
+
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-memory-statistics': {
+        'task': 'api.tasks.reconcile_memory_statistics_task',
+        'schedule': MEMORY_STATS_RECONCILE_INTERVAL,
+    },
+    'collect-content-blobs': {
+        'task': 'api.tasks.collect_content_blobs_task',
+        'schedule': PRODUCT_MEMORY_BLOB_GC_INTERVAL,
+    },
 }
 
 # Celery Configuration (common settings)
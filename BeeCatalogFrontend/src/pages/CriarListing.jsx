@@ -17,6 +17,9 @@ const createNewProduct = (initialData = {}, index = 0) => ({
     imagens: initialData.imagens || { principal: null, amostra: null, extra: [] }
 });
 
+// Produto como é enviado na geração (sem os arquivos de imagem)
+const serializeProduct = (product) => { const { imagens, ...rest } = product; return JSON.stringify(rest); };
+
 const downloadBase64File = (base64Data, fileName) => {
     try {
         // Verifica se base64Data é válido
@@ -245,6 +248,8 @@ function CriarListing() {
     const [loadingMessage, setLoadingMessage] = useState('');
     const [loadingProgress, setLoadingProgress] = useState(0);
     const [pollingIntervalId, setPollingIntervalId] = useState(null);
+    // Planilha guardada no servidor: identificador e produtos como foram carregados
+    const [stagedUpload, setStagedUpload] = useState(null);
     
     const location = useLocation();
     const navigate = useNavigate();
@@ -254,6 +259,7 @@ function CriarListing() {
         if (location.state && location.state.products) {
             const productsFromState = location.state.products.map((p, index) => createNewProduct(p, index));
             setProducts(productsFromState);
+            setStagedUpload(null);
             navigate(location.pathname, { replace: true, state: {} });
         }
     }, [location, navigate]);
@@ -334,14 +340,27 @@ function CriarListing() {
             setLoadingProgress(60);
             
             const response = await api.post('/upload-planilha/', formData, { 
-                headers: { 'Content-Type': 'multipart/form-data' } 
+                headers: { 'Content-Type': 'multipart/form-data' },
+                params: { limit: 500 }
             });
             
+            // Demais páginas da planilha guardada no servidor
+            const { dataset_id, pagination } = response.data;
+            let loadedProducts = response.data.products;
+            for (let page = 2; page <= pagination.total_pages; page++) {
+                setLoadingMessage(`Carregando produtos (${loadedProducts.length}/${pagination.total_items})...`);
+                const pageResponse = await api.get(`/upload-planilha/${dataset_id}/`, {
+                    params: { page, limit: pagination.items_per_page }
+                });
+                loadedProducts = loadedProducts.concat(pageResponse.data.products);
+            }
+            
             setLoadingMessage('Finalizando carregamento...');
             setLoadingProgress(90);
             
-            const productsFromApi = response.data.map((p, index) => createNewProduct(p, index));
+            const productsFromApi = loadedProducts.map((p, index) => createNewProduct(p, index));
             setProducts(productsFromApi.length > 0 ? productsFromApi : [createNewProduct()]);
+            setStagedUpload(productsFromApi.length > 0 ? { datasetId: dataset_id, snapshots: productsFromApi.map(serializeProduct) } : null);
             
             setLoadingProgress(100);
             showSuccess(`${productsFromApi.length} produtos carregados com sucesso!`, 'Planilha Processada');
@@ -447,23 +466,58 @@ function CriarListing() {
         setLoadingProgress(10);
         
         const formData = new FormData();
-        const productsDataOnly = products.map(p => { const { imagens, ...rest } = p; return rest; });
-        formData.append('products_data', JSON.stringify(productsDataOnly));
+        if (stagedUpload && stagedUpload.snapshots.length === products.length) {
+            // Planilha já está no servidor: envia só o identificador e os produtos editados
+            const overrides = {};
+            products.forEach((p, index) => {
+                const serialized = serializeProduct(p);
+                if (serialized !== stagedUpload.snapshots[index]) overrides[index] = JSON.parse(serialized);
+            });
+            formData.append('dataset_id', stagedUpload.datasetId);
+            formData.append('product_overrides', JSON.stringify(overrides));
+        } else {
+            const productsDataOnly = products.map(p => { const { imagens, ...rest } = p; return rest; });
+            formData.append('products_data', JSON.stringify(productsDataOnly));
+        }
         formData.append('amazon_template', amazonTemplate);
 
         setLoadingMessage('Processando imagens...');
         setLoadingProgress(30);
         
-        // Adicionar imagens
+        // Imagens por campo; vão direto ao S3 e o formulário leva só as chaves
+        const imageFiles = [];
         products.forEach((p, productIndex) => {
-            if (p.imagens.principal) formData.append(`imagem_p${productIndex}_principal`, p.imagens.principal);
-            if (p.imagens.amostra) formData.append(`imagem_p${productIndex}_amostra`, p.imagens.amostra);
+            if (p.imagens.principal) imageFiles.push({ field: `imagem_p${productIndex}_principal`, file: p.imagens.principal });
+            if (p.imagens.amostra) imageFiles.push({ field: `imagem_p${productIndex}_amostra`, file: p.imagens.amostra });
             p.imagens.extra.forEach((img, extraIndex) => { 
-                if (img.file) formData.append(`imagem_p${productIndex}_extra_${extraIndex}`, img.file); 
+                if (img.file) imageFiles.push({ field: `imagem_p${productIndex}_extra_${extraIndex}`, file: img.file }); 
             });
         });
 
         try {
+            if (imageFiles.length > 0) {
+                setLoadingMessage(`Enviando ${imageFiles.length} imagens...`);
+                const { data } = await api.post('/upload-imagens/', {
+                    files: imageFiles.map(({ field, file }) => ({ field, name: file.name, content_type: file.type }))
+                });
+                
+                // Envio pelas URLs pré-assinadas, até 4 imagens ao mesmo tempo
+                const filesByField = Object.fromEntries(imageFiles.map(({ field, file }) => [field, file]));
+                const pending = [...data.uploads];
+                const uploadNext = async () => {
+                    while (pending.length > 0) {
+                        const upload = pending.shift();
+                        const result = await fetch(upload.url, { method: 'PUT', headers: upload.headers, body: filesByField[upload.field] });
+                        if (!result.ok) throw new Error(`Falha no envio da imagem ${filesByField[upload.field].name} (${result.status})`);
+                    }
+                };
+                await Promise.all(Array.from({ length: Math.min(4, pending.length) }, uploadNext));
+                
+                const imageKeys = {};
+                data.uploads.forEach(upload => { imageKeys[upload.field] = upload.key; });
+                formData.append('image_keys', JSON.stringify(imageKeys));
+            }
+            
             setLoadingMessage('Enviando dados para o servidor...');
             setLoadingProgress(50);
             